@@ -0,0 +1,431 @@
+"""
+Benchmark suite for the chunkers used by the indexing scripts.
+
+This script:
+1. Generates synthetic Markdown corpora shaped like the 'docs/' chapters
+   (front matter, headings, paragraphs, lists and code fences), from 100 KB to 1 GB
+2. Runs Context7Client.chunk_text, Context7Client.iter_chunks and LangChain's
+   RecursiveCharacterTextSplitter (as configured in index_textbook.chunk_documents)
+3. Measures throughput, peak memory and the chunk length distribution
+4. Saves the results as JSON, optionally comparing them with a baseline run
+
+Example:
+    python bench_chunkers.py --sizes 100KB,10MB,1GB --output results.json --baseline previous.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; max_rss_bytes is then left out
+    resource = None
+
+from context7 import Context7Client
+
+try:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+except ImportError:
+    RecursiveCharacterTextSplitter = None
+
+_SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(B|KB|MB|GB)?$', re.I)
+_UNITS = {'B': 1, 'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30}
+
+DEFAULT_SIZES = '100KB,1MB,10MB'
+
+_TOPICS = ['ROS 2 nodes', 'URDF models', 'digital twins', 'Gazebo worlds', 'Isaac Sim scenes',
+           'bipedal locomotion', 'whole-body control', 'visual SLAM', 'grasp planning',
+           'reinforcement learning policies', 'sensor fusion', 'speech interfaces']
+_VERBS = ['describes', 'connects', 'simulates', 'stabilizes', 'estimates', 'publishes',
+          'coordinates', 'constrains', 'predicts', 'transforms']
+_OBJECTS = ['joint trajectories', 'the zero moment point', 'LiDAR scans', 'IMU readings',
+            'camera frames', 'actuator torques', 'contact forces', 'the robot state',
+            'navigation goals', 'language commands']
+_CODE = ['import rclpy', 'from rclpy.node import Node', '', 'class {name}(Node):',
+         '    def __init__(self):', "        super().__init__('{node}')",
+         "        self.publisher = self.create_publisher(Twist, '/cmd_vel', 10)",
+         '        self.timer = self.create_timer(0.1, self.step)', '',
+         '    def step(self):', '        msg = Twist()', '        msg.linear.x = {speed}',
+         '        self.publisher.publish(msg)']
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a size such as '100KB' or '1GB' into a number of bytes.
+
+    Args:
+        value: Size with an optional B/KB/MB/GB suffix (binary multiples)
+
+    Returns:
+        Number of bytes
+    """
+    match = _SIZE_RE.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _UNITS[(match.group(2) or 'B').upper()])
+
+
+def format_size(size: int) -> str:
+    """
+    Format a number of bytes with the largest unit that divides it evenly.
+    """
+    for unit in ('GB', 'MB', 'KB'):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def _sentence(rng: random.Random) -> str:
+    """
+    Build one sentence of robotics prose.
+    """
+    sentence = f"{rng.choice(_TOPICS).capitalize()} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}"
+    if rng.random() < 0.5:
+        sentence += f" while {rng.choice(_TOPICS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}"
+    return sentence + rng.choice('..........!?')
+
+
+def _paragraph(rng: random.Random) -> str:
+    """
+    Build a paragraph of two to eight sentences.
+    """
+    return ' '.join(_sentence(rng) for _ in range(rng.randint(2, 8)))
+
+
+def _chapter(rng: random.Random, number: int) -> str:
+    """
+    Build one chapter in the layout of the textbook's Markdown files.
+    """
+    title = f"Chapter {number}: {rng.choice(_TOPICS).title()}"
+    parts = [f'---\ntitle: "{title}"\nsidebar_position: {number}\n---\n', f"## {title}\n", _paragraph(rng) + '\n']
+
+    for section in range(1, rng.randint(4, 9)):
+        parts.append(f"### {section}. {rng.choice(_TOPICS).title()} and {rng.choice(_OBJECTS).title()}\n")
+        for _ in range(rng.randint(1, 4)):
+            kind = rng.random()
+            if kind < 0.55:
+                parts.append(_paragraph(rng) + '\n')
+            elif kind < 0.85:
+                bullet = '*   ' if rng.random() < 0.5 else None
+                parts.append('\n'.join(f"{bullet or f'{i}.  '}**{rng.choice(_TOPICS).title()}:** {_sentence(rng)}"
+                                       for i in range(1, rng.randint(3, 7))) + '\n')
+            else:
+                code = '\n'.join(_CODE).format(name=f"Controller{number}{section}", node=f"node_{section}",
+                                               speed=round(rng.random(), 2))
+                parts.append(f"```python\n{code}\n```\n")
+
+    return '\n'.join(parts) + '\n'
+
+
+def generate_corpus(size: int, seed: int = 0) -> Iterable[str]:
+    """
+    Generate a synthetic Markdown corpus of exactly ``size`` UTF-8 bytes.
+
+    Args:
+        size: Number of bytes to generate (the text is ASCII, so also characters)
+        seed: Seed for the random generator, making the corpus reproducible
+
+    Yields:
+        Pieces of the corpus, one chapter at a time
+    """
+    rng = random.Random(seed)
+    remaining = size
+    number = 1
+    while remaining > 0:
+        chapter = _chapter(rng, number)[:remaining]
+        remaining -= len(chapter)
+        number += 1
+        yield chapter
+
+
+def corpus_path(size: int, seed: int = 0, cache_dir: str = None) -> str:
+    """
+    Return the path of a cached corpus file, writing it first if needed.
+
+    Args:
+        size: Corpus size in bytes
+        seed: Corpus seed
+        cache_dir: Directory holding generated corpora (defaults to the temp directory)
+
+    Returns:
+        Path to the corpus file
+    """
+    cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'context7-bench')
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"corpus-{format_size(size)}-seed{seed}.md")
+
+    if not os.path.exists(path) or os.path.getsize(path) != size:
+        partial = path + '.tmp'
+        with open(partial, 'w', encoding='utf-8', newline='\n') as f:
+            for piece in generate_corpus(size, seed):
+                f.write(piece)
+        os.replace(partial, path)
+
+    return path
+
+
+def chunk_length_stats(lengths: List[int], chunk_size: int) -> Dict[str, Any]:
+    """
+    Summarize the distribution of chunk lengths.
+
+    Args:
+        lengths: Length of every chunk in characters
+        chunk_size: Target chunk size, used for the histogram bins
+
+    Returns:
+        Dictionary with the chunk count, percentiles and a histogram of lengths
+        in tenths of ``chunk_size`` (the last bin counts oversized chunks)
+    """
+    if not lengths:
+        return {'count': 0}
+
+    values = np.asarray(lengths)
+    edges = np.append(np.linspace(0, chunk_size, 11), np.inf)
+    histogram, _ = np.histogram(values, bins=edges)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'min': int(values.min()),
+        'p50': float(p50),
+        'p90': float(p90),
+        'p99': float(p99),
+        'max': int(values.max()),
+        'histogram': histogram.tolist()
+    }
+
+
+def build_chunkers(chunk_size: int, overlap: int) -> Dict[str, Callable[[str], List[int]]]:
+    """
+    Build the chunkers under test.
+
+    Each chunker takes the corpus text and the path of the corpus file and
+    returns the length of every chunk; reading the file is part of the
+    measurement only for the streaming chunker.
+
+    Args:
+        chunk_size: Chunk size in characters
+        overlap: Overlap between chunks in characters
+
+    Returns:
+        Mapping of chunker name to chunker function
+    """
+    ctx7 = Context7Client()
+    chunkers = {
+        'context7.chunk_text': lambda text, path: [len(chunk) for chunk in ctx7.chunk_text(text, chunk_size, overlap)],
+        'context7.iter_chunks': lambda text, path: [len(chunk['content'])
+                                                    for chunk in ctx7.iter_chunks(path, chunk_size, overlap)],
+    }
+
+    if RecursiveCharacterTextSplitter is not None:
+        # Same settings as index_textbook.chunk_documents
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap, length_function=len)
+        chunkers['langchain.RecursiveCharacterTextSplitter'] = lambda text, path: [
+            len(chunk) for chunk in splitter.split_text(text)]
+
+    return chunkers
+
+
+def run_chunker(chunker: Callable, text: Optional[str], path: str, repeat: int, measure_memory: bool) -> Dict[str, Any]:
+    """
+    Time a chunker on one corpus and optionally record its peak memory.
+
+    Args:
+        chunker: Function from ``build_chunkers``
+        text: The corpus text, or None for chunkers that read the file themselves
+        path: Path of the corpus file
+        repeat: Number of timed runs; the fastest is reported
+        measure_memory: Run once more under tracemalloc to record peak allocations
+
+    Returns:
+        Dictionary with the best time, all times, chunk lengths and peak memory
+    """
+    times = []
+    lengths = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        lengths = chunker(text, path)
+        times.append(time.perf_counter() - started)
+
+    peak = None
+    if measure_memory:
+        # tracemalloc slows allocation down, so memory is measured in a separate run
+        tracemalloc.start()
+        chunker(text, path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {'seconds': min(times), 'all_seconds': times, 'lengths': lengths, 'peak_memory_bytes': peak}
+
+
+def _git_commit() -> Optional[str]:
+    """
+    Return the commit being benchmarked, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: List[int], chunk_size: int = 1000, overlap: int = 100, repeat: int = 3,
+                   measure_memory: bool = True, chunker_names: List[str] = None, seed: int = 0,
+                   cache_dir: str = None) -> Dict[str, Any]:
+    """
+    Run every chunker on every corpus size.
+
+    Args:
+        sizes: Corpus sizes in bytes
+        chunk_size: Chunk size in characters
+        overlap: Overlap between chunks in characters
+        repeat: Number of timed runs per chunker and size
+        measure_memory: Record peak memory with tracemalloc
+        chunker_names: Names of the chunkers to run (defaults to all available)
+        seed: Corpus seed
+        cache_dir: Directory holding generated corpora
+
+    Returns:
+        Machine-readable results, including the environment and git commit
+    """
+    chunkers = build_chunkers(chunk_size, overlap)
+    if chunker_names:
+        unknown = set(chunker_names) - set(chunkers)
+        if unknown:
+            raise ValueError(f"Unknown or unavailable chunkers: {', '.join(sorted(unknown))}")
+        chunkers = {name: chunkers[name] for name in chunker_names}
+    if RecursiveCharacterTextSplitter is None:
+        print("LangChain text splitters are not installed; skipping RecursiveCharacterTextSplitter")
+
+    results = []
+    for size in sizes:
+        path = corpus_path(size, seed, cache_dir)
+        text = None
+        if any(not name.endswith('iter_chunks') for name in chunkers):
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+
+        for name, chunker in chunkers.items():
+            print(f"Running {name} on {format_size(size)}...")
+            run = run_chunker(chunker, text, path, repeat, measure_memory)
+            result = {
+                'chunker': name,
+                'corpus_bytes': size,
+                'seconds': run['seconds'],
+                'all_seconds': run['all_seconds'],
+                'mb_per_second': size / (1 << 20) / run['seconds'] if run['seconds'] else None,
+                'peak_memory_bytes': run['peak_memory_bytes'],
+                'chunks': chunk_length_stats(run['lengths'], chunk_size)
+            }
+            results.append(result)
+            print(f"  {result['mb_per_second']:.2f} MB/s, {result['chunks']['count']} chunks"
+                  + (f", peak {run['peak_memory_bytes'] / (1 << 20):.1f} MB" if measure_memory else ''))
+
+        del text
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'settings': {'chunk_size': chunk_size, 'overlap': overlap, 'repeat': repeat, 'seed': seed},
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None,
+        'results': results
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.1) -> List[str]:
+    """
+    Compare a benchmark run with a baseline run.
+
+    Args:
+        current: Results from ``run_benchmarks``
+        baseline: Results of an earlier run, e.g. from the previous commit
+        tolerance: Relative throughput loss or memory growth tolerated before
+            a result counts as a regression
+
+    Returns:
+        Descriptions of the regressions found
+    """
+    previous = {(r['chunker'], r['corpus_bytes']): r for r in baseline.get('results', [])}
+    regressions = []
+
+    for result in current['results']:
+        before = previous.get((result['chunker'], result['corpus_bytes']))
+        if before is None:
+            continue
+
+        label = f"{result['chunker']} @ {format_size(result['corpus_bytes'])}"
+        if before['mb_per_second'] and result['mb_per_second'] < before['mb_per_second'] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {before['mb_per_second']:.2f} -> "
+                               f"{result['mb_per_second']:.2f} MB/s")
+        if before.get('peak_memory_bytes') and result.get('peak_memory_bytes') \
+                and result['peak_memory_bytes'] > before['peak_memory_bytes'] * (1 + tolerance):
+            regressions.append(f"{label}: peak memory {before['peak_memory_bytes']} -> "
+                               f"{result['peak_memory_bytes']} bytes")
+        if before['chunks'].get('count') != result['chunks'].get('count'):
+            print(f"{label}: chunk count changed {before['chunks'].get('count')} -> {result['chunks'].get('count')}")
+
+    return regressions
+
+
+def main():
+    """
+    Parse command line arguments, run the benchmarks and save the results.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the text chunkers on synthetic Markdown corpora")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"Comma-separated corpus sizes, e.g. 100KB,1MB,1GB (default: {DEFAULT_SIZES})")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--overlap', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per chunker; the fastest is reported")
+    parser.add_argument('--chunkers', help="Comma-separated chunker names (default: all available)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak memory run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache-dir', help="Directory for generated corpora")
+    parser.add_argument('--output', default='bench_chunkers.json', help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        [parse_size(size) for size in args.sizes.split(',')],
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        repeat=args.repeat,
+        measure_memory=not args.no_memory,
+        chunker_names=args.chunkers.split(',') if args.chunkers else None,
+        seed=args.seed,
+        cache_dir=args.cache_dir
+    )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Durable checkpoints for long indexing runs.
+
+This module provides the Checkpoint class which periodically writes the
+progress of an indexer (completed chunk IDs, the target collection, ...)
+to a JSON file, so that a crashed run can be continued with ``--resume``
+instead of starting over.
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Seconds between checkpoints written during a run
+CHECKPOINT_INTERVAL = float(os.getenv("INDEX_CHECKPOINT_INTERVAL", 30))
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint:
+    """
+    JSON file holding the progress of an indexing run.
+
+    A checkpoint is only valid for the settings the run was started with;
+    ``load`` ignores a checkpoint whose settings differ.
+    """
+
+    def __init__(self, path: str, settings: Dict[str, Any] = None, interval: float = CHECKPOINT_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the Checkpoint.
+
+        Args:
+            path (str): File the checkpoint is written to
+            settings (Dict[str, Any]): Settings of the run
+            interval (float): Minimum number of seconds between checkpoints (see ``due``)
+            clock: Monotonic clock in seconds
+        """
+        self.path = path
+        self.settings = dict(settings or {})
+        self.interval = interval
+        self._clock = clock
+        self._saved = clock()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the saved progress.
+
+        Returns:
+            Optional[Dict[str, Any]]: The state passed to the last ``save``, or
+            None if there is no checkpoint for the current settings
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get('version') != CHECKPOINT_VERSION or data.get('settings') != self.settings:
+            return None
+        return data.get('state')
+
+    def due(self) -> bool:
+        """
+        Whether ``interval`` seconds have passed since the last checkpoint.
+        """
+        return self._clock() - self._saved >= self.interval
+
+    def save(self, state: Dict[str, Any]):
+        """
+        Write the progress durably: to disk, atomically, so a crash leaves
+        either the previous or the new checkpoint.
+
+        Args:
+            state (Dict[str, Any]): JSON-serializable progress of the run
+        """
+        partial = self.path + '.tmp'
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({'version': CHECKPOINT_VERSION, 'settings': self.settings, 'state': state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, self.path)
+        self._saved = self._clock()
+
+    def clear(self):
+        """
+        Delete the checkpoint once the run has finished.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -5,8 +5,370 @@ This module provides the Context7Client class which implements methods for
 chunking text and formatting context for RAG applications.
 """
 
+import codecs
+import functools
+import itertools
+import mmap
+import os
 import re
-from typing import List, Dict, Any
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Sequence, TextIO, Tuple, Union
+
+import numpy as np
+
+# A chunk expressed as half-open ``(start, end)`` offsets into its source text
+Span = Tuple[int, int]
+
+# Bump whenever a change to the chunking rules moves chunk boundaries; it is
+# part of the point IDs, so chunks from different versions never collide
+CHUNKER_VERSION = "1"
+
+# A sentence starts at a non-space, non-terminator character and runs up to and
+# including the next run of terminators (or the end of the text)
+_SENTENCE_RE = re.compile(r'[^\s.!?][^.!?]*[.!?]*')
+# The rest of a sentence from one of its words on, which may be (part of) its
+# final run of terminators
+_SENTENCE_REST_RE = re.compile(r'[.!?]+|[^\s.!?][^.!?]*[.!?]*')
+_WORD_RE = re.compile(r'\S+')
+_SPACE_RE = re.compile(r'\s+')
+_TERMINATORS = '.!?'
+# Word pieces of up to six characters and individual punctuation marks
+_TOKEN_RE = re.compile(r'\w{1,6}|[^\w\s]')
+
+# Number of bytes (or characters, for text-mode files) read per window by iter_chunks
+DEFAULT_WINDOW_SIZE = 256 * 1024
+
+# Below this many characters in total, starting worker processes costs more than chunking
+PARALLEL_MIN_CHARS = 1 << 20
+
+# Content-defined chunking: the gear hash at a candidate boundary covers at most
+# this many trailing characters, and the gear table maps a character to a random
+# 64-bit value (fixed seed, so boundaries are reproducible everywhere)
+_GEAR_WINDOW = 64
+_GEAR = np.frombuffer(np.random.RandomState(0x6C7).bytes(256 * 8), dtype='<u8').astype(np.uint64)
+
+# Markdown/MDX line patterns, matched in place against ``text`` with pos/endpos
+_FRONT_MATTER_RE = re.compile(r'---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|$)', re.S)
+_FENCE_RE = re.compile(r' {0,3}(`{3,}|~{3,})')
+_HEADING_RE = re.compile(r' {0,3}(#{1,6})[ \t]+(.*?)[ \t#]*\r?$')
+_LIST_ITEM_RE = re.compile(r' {0,3}(?:[-*+]|\d{1,9}[.)])(?:[ \t]|\r?$)')
+_BLANK_RE = re.compile(r'[ \t\r]*$')
+
+# One row of a ChunkTable: 28 bytes per chunk instead of a dict with duplicated metadata
+_CHUNK_ROW_DTYPE = np.dtype([
+    ('doc', np.int32),
+    ('start', np.int64),
+    ('length', np.int32),
+    ('token_count', np.int32),
+    ('heading', np.int32),
+    ('ordinal', np.int32)
+])
+
+# A Markdown block: (kind, start, end, heading path), kind being one of
+# 'heading', 'paragraph', 'item' or 'code'
+Block = Tuple[str, int, int, Tuple[str, ...]]
+
+
+def _overlap_start(text: str, start: int, floor: int, overlap: int) -> int:
+    """
+    Move a chunk start back by ``overlap`` characters without crossing ``floor``.
+
+    The new start is snapped forward to the next word boundary so overlapping
+    chunks never begin in the middle of a word.
+
+    Args:
+        text (str): The text the offsets refer to
+        start (int): The start offset of the chunk
+        floor (int): The lowest offset the chunk may be extended to
+        overlap (int): The overlap between chunks in characters
+
+    Returns:
+        int: The start offset of the chunk including its overlap
+    """
+    if overlap <= 0 or start <= floor:
+        return start
+
+    new_start = max(floor, start - overlap)
+    if new_start > floor and not text[new_start - 1].isspace():
+        space = _SPACE_RE.search(text, new_start, start)
+        if space:
+            new_start = space.end()
+
+    space = _SPACE_RE.match(text, new_start, start)
+    if space:
+        new_start = space.end()
+
+    return new_start
+
+
+def _read_blocks(source: Union[str, os.PathLike, BinaryIO, TextIO], window_size: int,
+                 encoding: str) -> Iterator[str]:
+    """
+    Read a path or file object as a sequence of decoded text blocks.
+
+    Paths are memory-mapped so the OS pages the file in and out as needed;
+    file objects are read ``window_size`` units at a time. Multi-byte
+    characters split across windows are reassembled by an incremental decoder.
+
+    Args:
+        source: A file path, or a binary or text file object
+        window_size (int): Number of bytes (or characters) to read per block
+        encoding (str): Encoding used to decode binary input
+
+    Yields:
+        str: Consecutive blocks of decoded text
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be memory-mapped
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                yield from _read_blocks(view, window_size, encoding)
+        return
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        block = source.read(window_size)
+        if not block:
+            break
+        if isinstance(block, bytes):
+            block = decoder.decode(block)
+        if block:
+            yield block
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def parse_front_matter(text: str) -> Tuple[Dict[str, str], int]:
+    """
+    Parse a leading ``---`` delimited front matter block of ``key: value`` lines.
+
+    Args:
+        text (str): Markdown or MDX source
+
+    Returns:
+        Tuple[Dict[str, str], int]: The front matter fields and the offset at
+        which the document body starts (0 if there is no front matter)
+    """
+    match = _FRONT_MATTER_RE.match(text)
+    if not match:
+        return {}, 0
+
+    fields = {}
+    for line in match.group(1).splitlines():
+        if ':' in line:
+            key, value = line.split(':', 1)
+            fields[key.strip()] = value.strip().strip('"\'')
+
+    return fields, match.end()
+
+
+def _markdown_blocks(text: str, pos: int = 0) -> List[Block]:
+    """
+    Split Markdown into headings, paragraphs, list items and fenced code in one pass.
+
+    Args:
+        text (str): Markdown or MDX source
+        pos (int): Offset to start parsing from (e.g. after the front matter)
+
+    Returns:
+        List[Block]: Blocks in document order, each tagged with its heading path
+    """
+    blocks = []
+    headings = []
+    path = ()
+    kind = None
+    block_start = block_end = 0
+    fence = None
+
+    line_start = pos
+    length = len(text)
+
+    while line_start < length:
+        line_end = text.find('\n', line_start)
+        if line_end == -1:
+            line_end = length
+        next_line = line_end + 1
+
+        if fence is not None:
+            # Everything up to the matching closing fence belongs to the code block
+            closing = _FENCE_RE.match(text, line_start, line_end)
+            if (closing and closing.group(1)[0] == fence[0] and len(closing.group(1)) >= len(fence)
+                    and _BLANK_RE.match(text, closing.end(), line_end)):
+                blocks.append(('code', block_start, line_end, path))
+                fence = None
+                kind = None
+            line_start = next_line
+            continue
+
+        if _BLANK_RE.match(text, line_start, line_end):
+            if kind is not None:
+                blocks.append((kind, block_start, block_end, path))
+                kind = None
+            line_start = next_line
+            continue
+
+        opening = _FENCE_RE.match(text, line_start, line_end)
+        heading = None if opening else _HEADING_RE.match(text, line_start, line_end)
+        item = None if opening or heading else _LIST_ITEM_RE.match(text, line_start, line_end)
+
+        if kind is not None and (opening or heading or item):
+            blocks.append((kind, block_start, block_end, path))
+            kind = None
+
+        if opening:
+            fence = opening.group(1)
+            block_start = line_start
+        elif heading:
+            level = len(heading.group(1))
+            headings = [entry for entry in headings if entry[0] < level] + [(level, heading.group(2))]
+            path = tuple(title for _, title in headings)
+            blocks.append(('heading', line_start, line_end, path))
+        elif item:
+            kind, block_start, block_end = 'item', line_start, line_end
+        elif kind is None:
+            kind, block_start, block_end = 'paragraph', line_start, line_end
+        else:
+            # Continuation line of the current paragraph or list item
+            block_end = line_end
+
+        line_start = next_line
+
+    if fence is not None:
+        # Unterminated fence: keep the rest of the document as code
+        blocks.append(('code', block_start, length, path))
+    elif kind is not None:
+        blocks.append((kind, block_start, block_end, path))
+
+    return blocks
+
+
+def _merge_content(first: str, second: str, overlap: int) -> Optional[str]:
+    """
+    Join two consecutive chunks of the same source, sending shared text once.
+
+    ``overlap`` is ``first.end - second.start`` in the unit of the offsets,
+    which may be characters or bytes. A gap of up to two units (a line break
+    or blank line) is filled with newlines.
+
+    Args:
+        first (str): Content of the earlier chunk
+        second (str): Content of the later chunk
+        overlap (int): Size of the overlap between the two chunks
+
+    Returns:
+        Optional[str]: The merged content, or None if the chunks are too far
+        apart or their contents do not actually overlap by ``overlap``
+    """
+    if overlap < -2:
+        return None
+    if overlap <= 0:
+        return first + '\n' * -overlap + second
+    if overlap >= len(second.encode('utf-8')):
+        # The second chunk lies entirely inside the first one
+        return first if second in first else None
+
+    if first[-overlap:] == second[:overlap]:
+        return first + second[overlap:]
+
+    first_bytes, second_bytes = first.encode('utf-8'), second.encode('utf-8')
+    if first_bytes[-overlap:] == second_bytes[:overlap]:
+        return first + second_bytes[overlap:].decode('utf-8', errors='ignore')
+
+    return None
+
+
+def _common_path(first: Tuple[str, ...], second: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Return the longest common prefix of two heading paths.
+    """
+    common = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        common += 1
+    return first[:common]
+
+
+# Context7Client built once per worker process of a chunking pool
+_worker_client = None
+
+
+def _gear_fractions(text: str, spans: Sequence[Span]) -> np.ndarray:
+    """
+    Hash the end of each span with a FastCDC-style gear hash.
+
+    The gear hash ``h = (h << 1) + GEAR[c]`` forgets a character after 64
+    steps, so its value at an offset only depends on the text just before it;
+    here it is evaluated directly at every span end, over the last
+    ``_GEAR_WINDOW`` characters that still lie inside the span.
+
+    Args:
+        text (str): The text the spans refer to
+        spans (Sequence[Span]): ``(start, end)`` offsets whose ends are hashed
+
+    Returns:
+        np.ndarray: One hash per span, scaled to a fraction in ``[0, 1)``
+    """
+    if not spans:
+        return np.zeros(0)
+
+    bounds = np.array(spans, dtype=np.int64)
+    first = bounds[:, 0].min()
+    codes = np.frombuffer(text[first:bounds[:, 1].max()].encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+    # Fold the code point into one byte so every script reaches all of the table
+    codes = _GEAR[(codes ^ (codes >> np.uint64(8)) ^ (codes >> np.uint64(16))) & np.uint64(0xFF)]
+
+    hashes = np.zeros(len(bounds), dtype=np.uint64)
+    for back in range(_GEAR_WINDOW):
+        position = bounds[:, 1] - 1 - back
+        inside = position >= bounds[:, 0]
+        hashes[inside] += codes[position[inside] - first] << np.uint64(back)
+
+    return (hashes >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _init_worker(tokenizer: Any, chunk_unit: str, token_cache_size: int, boundaries: str):
+    """
+    Build the per-process Context7Client used by ``_chunk_worker``.
+    """
+    global _worker_client
+    _worker_client = Context7Client(tokenizer, chunk_unit, token_cache_size, boundaries)
+
+
+def _chunk_worker(task: Tuple[str, int, int, bool]) -> Tuple[array, Any]:
+    """
+    Chunk one document inside a worker process.
+    """
+    return _worker_client._chunk_offsets(*task)
+
+
+class RegexTokenizer:
+    """
+    A dependency-free local tokenizer approximating subword tokenization.
+
+    Words are split into pieces of at most six characters and every
+    punctuation mark is a token of its own, which tracks the token counts of
+    typical subword tokenizers on English prose closely enough for budgeting.
+    Any object with an ``encode(text)`` method returning a sequence of tokens
+    (e.g. a tiktoken or Hugging Face tokenizer) can be used in its place.
+    """
+
+    def encode(self, text: str) -> List[str]:
+        """
+        Split text into tokens.
+
+        Args:
+            text (str): The text to tokenize
+
+        Returns:
+            List[str]: The tokens of ``text``
+        """
+        return _TOKEN_RE.findall(text)
 
 
 class Context7Client:
@@ -14,11 +376,121 @@ class Context7Client:
     A client for handling context operations in RAG applications.
     """
 
-    def __init__(self):
+    def __init__(self, tokenizer: Any = None, chunk_unit: str = 'chars', token_cache_size: int = 65536,
+                 boundaries: str = 'greedy'):
         """
         Initialize the Context7Client.
+
+        Args:
+            tokenizer: Object with an ``encode(text)`` method used to count
+                tokens; defaults to a ``RegexTokenizer``
+            chunk_unit (str): Unit of ``chunk_size`` and ``overlap``, either
+                ``'chars'`` or ``'tokens'``
+            token_cache_size (int): Number of token counts kept in the LRU cache
+            boundaries (str): How sentences are grouped into chunks: ``'greedy'``
+                packs each chunk as full as possible, ``'content'`` places
+                content-defined boundaries that only move near an edit
+        """
+        if chunk_unit not in ('chars', 'tokens'):
+            raise ValueError("chunk_unit must be 'chars' or 'tokens'")
+        if boundaries not in ('greedy', 'content'):
+            raise ValueError("boundaries must be 'greedy' or 'content'")
+
+        self.tokenizer = tokenizer if tokenizer is not None else RegexTokenizer()
+        self.chunk_unit = chunk_unit
+        self.boundaries = boundaries
+        # Sentences, words and boilerplate recur constantly, so their counts are cached
+        self._cached_count = functools.lru_cache(maxsize=token_cache_size)(self._count)
+
+    def count_tokens(self, text: str) -> int:
         """
-        pass
+        Count the tokens in a piece of text, using the LRU cache.
+
+        Args:
+            text (str): The text to measure
+
+        Returns:
+            int: Number of tokens produced by the configured tokenizer
+        """
+        return self._cached_count(text)
+
+    def _count(self, text: str) -> int:
+        """
+        Count the tokens in a piece of text without touching the cache.
+        """
+        return len(self.tokenizer.encode(text))
+
+    def _size(self, text: str, start: int, end: int) -> int:
+        """
+        Measure ``text[start:end]`` in the configured ``chunk_unit``.
+        """
+        if self.chunk_unit == 'chars':
+            return end - start
+        return self.count_tokens(text[start:end])
+
+    def _overlap(self, text: str, start: int, floor: int, overlap: int) -> int:
+        """
+        Move a chunk start back by ``overlap`` units without crossing ``floor``.
+
+        Args:
+            text (str): The text the offsets refer to
+            start (int): The start offset of the chunk
+            floor (int): The lowest offset the chunk may be extended to
+            overlap (int): The overlap between chunks in ``chunk_unit``
+
+        Returns:
+            int: The start offset of the chunk including its overlap
+        """
+        if self.chunk_unit == 'chars':
+            return _overlap_start(text, start, floor, overlap)
+        if overlap <= 0 or start <= floor:
+            return start
+
+        # Walk whole words back from the chunk start until the token budget is spent
+        new_start = start
+        for word in reversed(list(_WORD_RE.finditer(text, floor, start))):
+            overlap -= self.count_tokens(word.group())
+            if overlap < 0:
+                break
+            new_start = word.start()
+
+        return new_start
+
+    def chunk_spans(self, text: str, chunk_size: int = 1000, overlap: int = 100) -> List[Span]:
+        """
+        Split text into overlapping chunks expressed as offsets into the text.
+
+        Sentence and word boundaries are found in a single pass over the text
+        and no intermediate strings are built, so the cost is linear in the
+        length of the input. Each chunk is packed with whole sentences up to
+        ``chunk_size``; sentences longer than that are split on words, and
+        words longer than that are split hard. Overlap is applied by moving a
+        chunk's start back into the previous chunk, snapped to a word boundary.
+
+        Args:
+            text (str): The input text to chunk
+            chunk_size (int): The target size of each chunk in ``chunk_unit``
+            overlap (int): The overlap between chunks in ``chunk_unit``
+
+        Returns:
+            List[Span]: A list of ``(start, end)`` offsets into ``text``
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        if not text:
+            return []
+
+        spans = []
+        previous_start = None
+
+        for start, end in self._core_spans(text, chunk_size):
+            if previous_start is None:
+                spans.append((start, end))
+            else:
+                spans.append((self._overlap(text, start, previous_start, overlap), end))
+            previous_start = start
+
+        return spans
 
     def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
         """
@@ -26,80 +498,523 @@ class Context7Client:
 
         Args:
             text (str): The input text to chunk
-            chunk_size (int): The target size of each chunk in characters
-            overlap (int): The overlap between chunks in characters
+            chunk_size (int): The target size of each chunk in ``chunk_unit``
+            overlap (int): The overlap between chunks in ``chunk_unit``
 
         Returns:
             List[str]: A list of text chunks
         """
-        if not text:
-            return []
+        return [text[start:end] for start, end in self.chunk_spans(text, chunk_size, overlap)]
 
-        # Split text into sentences to preserve semantic boundaries
-        sentences = re.split(r'[.!?]+', text)
-        
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            # Add extra punctuation back for better context
-            sentence_with_punct = sentence.strip() + "."
-            
-            # If adding the sentence would exceed chunk size
-            if len(current_chunk) + len(sentence_with_punct) > chunk_size:
-                # If current chunk is not empty, save it
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                
-                # If the sentence itself is larger than chunk_size, split it by words
-                if len(sentence_with_punct) > chunk_size:
-                    words = sentence_with_punct.split()
-                    temp_chunk = ""
-                    
-                    for word in words:
-                        if len(temp_chunk) + len(word) + 1 <= chunk_size:
-                            temp_chunk += word + " "
-                        else:
-                            if temp_chunk.strip():
-                                chunks.append(temp_chunk.strip())
-                            # Start a new temp chunk with overlap from the previous chunk if possible
-                            temp_chunk = word + " "
-                    
-                    if temp_chunk.strip():
-                        current_chunk = temp_chunk
-                else:
-                    # Start a new chunk with the sentence
-                    current_chunk = sentence_with_punct
+    def iter_chunks(self, source: Union[str, os.PathLike, BinaryIO, TextIO], chunk_size: int = 1000,
+                    overlap: int = 100, window_size: int = DEFAULT_WINDOW_SIZE,
+                    encoding: str = 'utf-8') -> Iterator[Dict[str, Any]]:
+        """
+        Stream chunks out of a file without loading the whole document.
+
+        The source is read through a bounded window and chunked with the same
+        rules as ``chunk_spans``. Every chunk that cannot change when more text
+        arrives is yielded immediately; only the last, possibly incomplete
+        chunk of each window (plus its overlap) is carried into the next one,
+        so memory stays flat regardless of document size. With content-defined
+        boundaries, the chunks ending less than ``chunk_size`` before the end
+        of the window are carried over too, since a cut depends on the text
+        after it.
+
+        Args:
+            source: A file path, or a binary or text file object
+            chunk_size (int): The target size of each chunk in ``chunk_unit``
+            overlap (int): The overlap between chunks in ``chunk_unit``
+            window_size (int): Number of bytes (or characters) read at a time
+            encoding (str): Encoding of the source, used to decode binary input
+                and to compute byte offsets
+
+        Yields:
+            Dict[str, Any]: Chunks with ``content``, the ``start``/``end`` byte
+            offsets of that content in the encoded source and its ``token_count``
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+
+        buffer = ""
+        # Offset in buffer to resume packing from, and the byte offset of buffer[cursor]
+        pos = 0
+        cursor = 0
+        cursor_offset = 0
+        previous_start = None
+        # Whether pos is the start of a held chunk, possibly inside a sentence
+        resume = False
+
+        blocks = _read_blocks(source, window_size, encoding)
+        block = next(blocks, None)
+
+        while block is not None:
+            buffer += block
+            block = next(blocks, None)
+
+            cores = list(self._core_spans(buffer, chunk_size, pos, resume=resume))
+            held = []
+            if cores and block is not None:
+                # The last chunk may still grow once the next window arrives
+                held.append(cores.pop())
+                # A content-defined cut also depends on the piece after it, which is
+                # only settled once more than chunk_size of text follows its start
+                while (self.boundaries == 'content' and cores
+                       and self._size(buffer, held[0][0], len(buffer)) <= chunk_size):
+                    held.insert(0, cores.pop())
+
+            for start, end in cores:
+                chunk_start = start if previous_start is None else self._overlap(buffer, start, previous_start,
+                                                                                 overlap)
+                cursor_offset += len(buffer[cursor:chunk_start].encode(encoding))
+                cursor = chunk_start
+
+                content = buffer[chunk_start:end]
+                yield {
+                    'content': content,
+                    'start': cursor_offset,
+                    'end': cursor_offset + len(content.encode(encoding)),
+                    'token_count': self._count(content)
+                }
+                previous_start = start
+
+            if not held:
+                continue
+
+            # Keep the held chunk plus enough preceding text to rebuild its overlap
+            if previous_start is None:
+                keep_from = held[0][0]
+            elif self.chunk_unit == 'chars':
+                keep_from = max(previous_start, held[0][0] - overlap - 1)
             else:
-                # Add sentence to current chunk
-                current_chunk += " " + sentence_with_punct
-
-        # Add the last chunk if it has content
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-
-        # Apply overlap between chunks if specified
-        if overlap > 0 and len(chunks) > 1:
-            chunks_with_overlap = []
-            for i in range(len(chunks)):
-                if i == 0:
-                    chunks_with_overlap.append(chunks[i])
-                else:
-                    # Calculate overlap by taking the last 'overlap' characters from the previous chunk
-                    prev_chunk_end = chunks[i-1][-overlap:]
-                    new_chunk = prev_chunk_end + " " + chunks[i]
-                    chunks_with_overlap.append(new_chunk)
-            
-            chunks = chunks_with_overlap
+                keep_from = previous_start
+            cursor_offset += len(buffer[cursor:keep_from].encode(encoding))
+            buffer = buffer[keep_from:]
+            cursor = 0
+            pos = held[0][0] - keep_from
+            resume = True
+            if previous_start is not None:
+                previous_start -= keep_from
 
+    def chunk_markdown(self, text: str, chunk_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Split Markdown/MDX into chunks that follow the document structure.
+
+        Front matter, headings, paragraphs, list items and fenced code are
+        parsed in a single pass. Whole sections are packed together while they
+        fit in ``chunk_size``; otherwise blocks are packed one at a time, and a
+        heading always shares a chunk with the block that follows it. Code
+        fences are never cut at sentence punctuation; a fence that does not
+        fit is split on line boundaries and an oversized paragraph falls back
+        to sentence packing.
+
+        Args:
+            text (str): Markdown or MDX source
+            chunk_size (int): The target size of each chunk in ``chunk_unit``
+
+        Returns:
+            List[Dict[str, Any]]: Chunks with ``content``, ``start``/``end``
+            character offsets into ``text``, the ``heading_path`` (list of
+            heading titles) the chunk belongs to and its ``token_count``
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+
+        _, body_start = parse_front_matter(text)
+
+        # Group blocks into sections, each starting at a heading
+        sections = []
+        for block in _markdown_blocks(text, body_start):
+            if block[0] == 'heading' or not sections:
+                sections.append([block])
+            else:
+                sections[-1].append(block)
+
+        chunks = []
+        chunk_start = chunk_end = None
+        chunk_len = 0
+        chunk_path = ()
+        # Whether the current chunk holds nothing but a heading line
+        heading_only = False
+
+        def emit(start, end, path):
+            content = text[start:end]
+            chunks.append({
+                'content': content,
+                'start': start,
+                'end': end,
+                'heading_path': list(path),
+                'token_count': self._count(content)
+            })
+
+        for blocks in sections:
+            section_end = blocks[-1][2]
+            section_path = blocks[-1][3]
+
+            # Merge the whole section into the current chunk if it fits
+            if chunk_start is not None:
+                grown = chunk_len + self._size(text, chunk_end, section_end)
+                if grown <= chunk_size:
+                    chunk_end, chunk_len = section_end, grown
+                    chunk_path = _common_path(chunk_path, section_path)
+                    heading_only = False
+                    continue
+
+            # Otherwise keep packing into the current chunk only if the section's
+            # heading can bring its first block along, so headings are never orphaned
+            lead_end = blocks[1][2] if blocks[0][0] == 'heading' and len(blocks) > 1 else blocks[0][2]
+            if chunk_start is not None and chunk_len + self._size(text, chunk_end, lead_end) <= chunk_size:
+                chunk_path = _common_path(chunk_path, section_path)
+            elif chunk_start is not None:
+                emit(chunk_start, chunk_end, chunk_path)
+                chunk_start = None
+
+            for kind, start, end, path in blocks:
+                if chunk_start is not None:
+                    grown = chunk_len + self._size(text, chunk_end, end)
+                    if grown <= chunk_size:
+                        chunk_end, chunk_len = end, grown
+                        heading_only = False
+                        continue
+
+                # A lone heading is split together with the block that follows it
+                split_start = start
+                if heading_only:
+                    split_start = chunk_start
+                elif chunk_start is not None:
+                    emit(chunk_start, chunk_end, chunk_path)
+
+                chunk_start = None
+                chunk_path = path
+
+                block_len = self._size(text, start, end) if split_start == start else None
+                if block_len is not None and block_len <= chunk_size:
+                    chunk_start, chunk_end, chunk_len = start, end, block_len
+                    heading_only = kind == 'heading'
+                    continue
+
+                pieces = self._split_block(text, kind, split_start, end, chunk_size)
+                for piece_start, piece_end in pieces[:-1]:
+                    emit(piece_start, piece_end, path)
+                # The tail of the block may still share a chunk with what follows
+                chunk_start, chunk_end = pieces[-1]
+                chunk_len = self._size(text, chunk_start, chunk_end)
+                heading_only = False
+
+        if chunk_start is not None:
+            emit(chunk_start, chunk_end, chunk_path)
         return chunks
 
-    def format_context(self, docs: List[Dict[str, Any]]) -> str:
+    def process_pool(self, workers: int = None, mp_context: Any = None) -> ProcessPoolExecutor:
+        """
+        Start a process pool whose workers chunk with this client's settings.
+
+        The pool can be passed to ``chunk_many`` by any number of threads, so
+        a long-running caller pays for starting the workers only once.
+
+        Args:
+            workers (int): Number of worker processes (defaults to the CPU count)
+            mp_context: ``multiprocessing`` context the workers are started with
+
+        Returns:
+            ProcessPoolExecutor: The pool; the caller shuts it down
+        """
+        initargs = (self.tokenizer, self.chunk_unit, self._cached_count.cache_info().maxsize, self.boundaries)
+        return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=mp_context,
+                                   initializer=_init_worker, initargs=initargs)
+
+    def chunk_many(self, documents: List[str], chunk_size: int = 1000, overlap: int = 100,
+                   markdown: bool = False, workers: int = None,
+                   parallel_threshold: int = PARALLEL_MIN_CHARS,
+                   pool: ProcessPoolExecutor = None) -> List[List[Dict[str, Any]]]:
+        """
+        Chunk a batch of documents in parallel across a process pool.
+
+        Documents are spread over a ``ProcessPoolExecutor``; each worker sends
+        back a flat ``array`` of ``(start, end, token_count)`` triples (plus a
+        small table of heading paths in Markdown mode) instead of pickled chunk
+        strings, and the text is sliced here. Results are returned in input
+        order. Small batches are chunked serially, since starting the pool
+        would cost more than it saves, unless a running ``pool`` is given.
+
+        Args:
+            documents (List[str]): The texts to chunk
+            chunk_size (int): The target size of each chunk in ``chunk_unit``
+            overlap (int): The overlap between chunks in ``chunk_unit``
+                (not used in Markdown mode)
+            markdown (bool): Use ``chunk_markdown`` instead of ``chunk_spans``
+            workers (int): Number of worker processes (defaults to the CPU count)
+            parallel_threshold (int): Minimum total number of characters
+                before a process pool is used
+            pool (ProcessPoolExecutor): Pool from ``process_pool`` that every
+                document is sent to, instead of starting one per call
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each document, its chunks in the
+            same form as ``chunk_markdown`` (``heading_path`` only in Markdown mode)
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(documents))
+        tasks = [(text, chunk_size, overlap, markdown) for text in documents]
+
+        if pool is not None:
+            results = list(pool.map(_chunk_worker, tasks))
+        elif workers <= 1 or sum(len(text) for text in documents) < parallel_threshold:
+            results = [self._chunk_offsets(*task) for task in tasks]
+        else:
+            with self.process_pool(workers) as pool:
+                results = list(pool.map(_chunk_worker, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+        batches = []
+        for text, (offsets, headings) in zip(documents, results):
+            chunks = []
+            for i in range(0, len(offsets), 3):
+                start, end, token_count = offsets[i:i + 3]
+                chunk = {'content': text[start:end], 'start': start, 'end': end, 'token_count': token_count}
+                if headings is not None:
+                    paths, path_ids = headings
+                    chunk['heading_path'] = list(paths[path_ids[i // 3]])
+                chunks.append(chunk)
+            batches.append(chunks)
+
+        return batches
+
+    def _chunk_offsets(self, text: str, chunk_size: int, overlap: int, markdown: bool) -> Tuple[array, Any]:
+        """
+        Chunk a document into a compact offset array for ``chunk_many``.
+
+        Args:
+            text (str): The text to chunk
+            chunk_size (int): The target size of each chunk in ``chunk_unit``
+            overlap (int): The overlap between chunks in ``chunk_unit``
+            markdown (bool): Use ``chunk_markdown`` instead of ``chunk_spans``
+
+        Returns:
+            Tuple[array, Any]: Flat ``(start, end, token_count)`` triples, and in
+            Markdown mode the distinct heading paths with one index per chunk
+        """
+        offsets = array('q')
+
+        if not markdown:
+            for start, end in self.chunk_spans(text, chunk_size, overlap):
+                offsets.extend((start, end, self._count(text[start:end])))
+            return offsets, None
+
+        paths = {}
+        path_ids = array('l')
+        for chunk in self.chunk_markdown(text, chunk_size):
+            offsets.extend((chunk['start'], chunk['end'], chunk['token_count']))
+            path_ids.append(paths.setdefault(tuple(chunk['heading_path']), len(paths)))
+
+        return offsets, (list(paths), path_ids)
+
+    def _split_block(self, text: str, kind: str, start: int, end: int, chunk_size: int) -> List[Span]:
+        """
+        Split a single Markdown block that is larger than ``chunk_size``.
+
+        Code is split on line boundaries only; prose is packed by sentence.
+
+        Args:
+            text (str): Markdown or MDX source
+            kind (str): The block kind from ``_markdown_blocks``
+            start (int): Start offset of the block
+            end (int): End offset of the block
+            chunk_size (int): The maximum size of each piece in ``chunk_unit``
+
+        Returns:
+            List[Span]: Non-overlapping pieces covering the block
+        """
+        if kind != 'code':
+            return list(self._core_spans(text, chunk_size, start, end))
+
+        pieces = []
+        piece_start = piece_end = None
+        piece_len = 0
+        line_start = start
+
+        while line_start < end:
+            line_end = text.find('\n', line_start, end)
+            line_end = end if line_end == -1 else line_end
+
+            if piece_start is not None:
+                grown = piece_len + self._size(text, piece_end, line_end)
+                if grown <= chunk_size:
+                    piece_end, piece_len = line_end, grown
+                    line_start = line_end + 1
+                    continue
+                pieces.append((piece_start, piece_end))
+
+            piece_start, piece_end = line_start, line_end
+            piece_len = self._size(text, line_start, line_end)
+
+            # A single line longer than chunk_size has to be cut
+            while piece_len > chunk_size:
+                pieces.append((piece_start, piece_start + chunk_size))
+                piece_start += chunk_size
+                piece_len = self._size(text, piece_start, piece_end)
+
+            line_start = line_end + 1
+
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end))
+        return pieces
+
+    def _core_spans(self, text: str, chunk_size: int, pos: int = 0, endpos: int = None,
+                    resume: bool = False) -> Iterator[Span]:
+        """
+        Pack sentences between ``pos`` and ``endpos`` into non-overlapping spans.
+
+        Dispatches on ``boundaries`` to ``_greedy_spans`` or ``_content_spans``.
+        """
+        if endpos is None:
+            endpos = len(text)
+        if self.boundaries == 'content':
+            return self._content_spans(text, chunk_size, pos, endpos, resume)
+        return self._greedy_spans(text, chunk_size, pos, endpos, resume=resume)
+
+    def _content_spans(self, text: str, chunk_size: int, pos: int, endpos: int,
+                       resume: bool = False) -> Iterator[Span]:
+        """
+        Pack sentences into spans whose boundaries are chosen by content.
+
+        Candidate boundaries are sentence ends (and the pieces of sentences
+        longer than ``chunk_size``). A chunk is cut after a candidate when the
+        gear hash of the text just before it falls under a threshold
+        proportional to the size the candidate added. No cut is made below
+        ``chunk_size / 4``; as in FastCDC's normalized chunking, cuts are then
+        unlikely up to ``chunk_size / 2`` and likely above it, so chunks
+        average about half of ``chunk_size``, and a chunk is always cut before
+        it would exceed ``chunk_size``.
+        Because each decision only looks at nearby text, an edit moves the
+        boundaries around it and the following chunks line up again after it.
+
+        Args:
+            text (str): The input text to chunk
+            chunk_size (int): The maximum size of each span in ``chunk_unit``
+            pos (int): Offset in ``text`` to start packing from
+            endpos (int): Offset in ``text`` to stop packing at
+            resume (bool): ``pos`` is the start of an earlier chunk (see ``_greedy_spans``)
+
+        Yields:
+            Span: ``(start, end)`` offsets of each packed chunk
+        """
+        pieces = list(self._greedy_spans(text, chunk_size, pos, endpos, sentences=True, resume=resume))
+
+        min_size = chunk_size // 4
+        avg_size = chunk_size // 2
+        spread = max(1, avg_size - min_size)
+
+        chunk_start = chunk_end = None
+        chunk_len = 0
+
+        for (start, end), fraction in zip(pieces, _gear_fractions(text, pieces)):
+            if chunk_start is not None:
+                grown = chunk_len + self._size(text, chunk_end, end)
+                if grown <= chunk_size:
+                    added = grown - chunk_len
+                    chunk_end, chunk_len = end, grown
+                else:
+                    yield chunk_start, chunk_end
+                    chunk_start = None
+
+            if chunk_start is None:
+                chunk_start, chunk_end = start, end
+                chunk_len = added = self._size(text, start, end)
+
+            if chunk_len >= min_size:
+                rate = 0.5 / spread if chunk_len < avg_size else 2.0 / spread
+                if fraction < added * rate:
+                    yield chunk_start, chunk_end
+                    chunk_start = None
+
+        if chunk_start is not None:
+            yield chunk_start, chunk_end
+
+    def _greedy_spans(self, text: str, chunk_size: int, pos: int, endpos: int,
+                      sentences: bool = False, resume: bool = False) -> Iterator[Span]:
+        """
+        Greedily pack sentences between ``pos`` and ``endpos`` into non-overlapping spans.
+
+        Args:
+            text (str): The input text to chunk
+            chunk_size (int): The maximum size of each span in ``chunk_unit``
+            pos (int): Offset in ``text`` to start packing from
+            endpos (int): Offset in ``text`` to stop packing at
+            sentences (bool): Yield every sentence (or piece of an oversized
+                sentence) on its own instead of packing them together
+            resume (bool): ``pos`` is the start of a chunk from an earlier pass,
+                which may be a word inside a sentence; the rest of that
+                sentence is parsed as one, even if it starts with terminators
+
+        Yields:
+            Span: ``(start, end)`` offsets of each packed chunk
+        """
+        chunk_start = chunk_end = None
+        chunk_len = 0
+
+        matches = _SENTENCE_RE.finditer(text, pos, endpos)
+        rest = _SENTENCE_REST_RE.match(text, pos, endpos) if resume else None
+        if rest is not None:
+            matches = itertools.chain([rest], _SENTENCE_RE.finditer(text, rest.end(), endpos))
+
+        for sentence in matches:
+            start, end = sentence.span()
+            if text[end - 1] not in _TERMINATORS:
+                # Only the final sentence can lack a terminator; drop its trailing whitespace
+                end = start + len(text[start:end].rstrip())
+
+            # Extend the current chunk if the whole sentence still fits
+            if chunk_start is not None:
+                grown = chunk_len + self._size(text, chunk_end, end)
+                if grown <= chunk_size and not sentences:
+                    chunk_end, chunk_len = end, grown
+                    continue
+                yield chunk_start, chunk_end
+                chunk_start = None
+
+            sentence_len = self._size(text, start, end)
+            if sentence_len <= chunk_size:
+                chunk_start, chunk_end, chunk_len = start, end, sentence_len
+                continue
+
+            # The sentence itself is larger than chunk_size, so split it by words
+            for word in _WORD_RE.finditer(text, start, end):
+                word_start, word_end = word.span()
+
+                if chunk_start is not None:
+                    grown = chunk_len + self._size(text, chunk_end, word_end)
+                    if grown <= chunk_size:
+                        chunk_end, chunk_len = word_end, grown
+                        continue
+                    yield chunk_start, chunk_end
+
+                # A word that alone exceeds chunk_size is cut every chunk_size
+                # characters, which also bounds its token count
+                word_len = self._size(text, word_start, word_end)
+                while word_len > chunk_size:
+                    yield word_start, word_start + chunk_size
+                    word_start += chunk_size
+                    word_len = self._size(text, word_start, word_end)
+
+                chunk_start, chunk_end, chunk_len = word_start, word_end, word_len
+
+        if chunk_start is not None:
+            yield chunk_start, chunk_end
+
+    def format_context(self, docs: List[Dict[str, Any]], token_budget: int = None,
+                       scores: List[float] = None) -> str:
         """
         Format retrieved documents into a structured prompt context.
 
+        Without a ``token_budget`` every document is included verbatim. With a
+        budget the documents are first packed by ``pack_context``.
+
         Args:
             docs (List[Dict[str, Any]]): A list of document dictionaries with content and metadata
+            token_budget (int): Maximum number of tokens the context may use
+            scores (List[float]): Relevance score of each document (defaults to
+                each document's ``score`` field, then to its rank)
 
         Returns:
             str: Formatted context string
@@ -107,24 +1022,356 @@ class Context7Client:
         if not docs:
             return "No relevant context found."
 
+        if token_budget is not None:
+            docs = self.pack_context(docs, token_budget, scores)
+            if not docs:
+                return "No relevant context found."
+
         formatted_contexts = []
         
         for i, doc in enumerate(docs):
-            content = doc.get('content', '') if isinstance(doc, dict) else str(doc)
-            
-            # Extract document metadata if available
-            source = doc.get('source', 'Unknown source') if isinstance(doc, dict) else 'Unknown source'
-            title = doc.get('title', 'Untitled') if isinstance(doc, dict) else 'Untitled'
-            
-            # Format the document with its metadata
-            formatted_doc = f"Document {i+1} (Source: {source}, Title: {title}):\n"
-            formatted_doc += f"{content}\n"
+            formatted_doc = self._format_header(doc, i + 1)
+            formatted_doc += f"{doc.get('content', '') if isinstance(doc, dict) else str(doc)}\n"
             formatted_doc += "---\n"
             
             formatted_contexts.append(formatted_doc)
         
         return "\n".join(formatted_contexts)
 
+    def pack_context(self, docs: List[Dict[str, Any]], token_budget: int,
+                     scores: List[float] = None) -> List[Dict[str, Any]]:
+        """
+        Select and merge retrieved chunks to fit a prompt token budget.
+
+        Chunks from the same source whose ``start``/``end`` offsets overlap or
+        are separated only by a line break or blank line are merged into one
+        span, so the overlap between neighbouring chunks is sent once. The
+        spans are then added greedily by score per token until the budget is
+        spent. A chunk's precomputed ``token_count`` is used when present.
+
+        Args:
+            docs (List[Dict[str, Any]]): A list of document dictionaries with content and metadata
+            token_budget (int): Maximum number of tokens, including document headers
+            scores (List[float]): Relevance score of each document (defaults to
+                each document's ``score`` field, then to its rank)
+
+        Returns:
+            List[Dict[str, Any]]: The selected documents, highest score first
+        """
+        spans = []
+        for i, doc in enumerate(docs):
+            if not isinstance(doc, dict):
+                doc = {'content': str(doc)}
+            score = scores[i] if scores is not None else doc.get('score')
+            if score is None:
+                score = len(docs) - i
+            token_count = doc.get('token_count')
+            if token_count is None:
+                token_count = self.count_tokens(doc.get('content', ''))
+            spans.append(dict(doc, score=score, token_count=token_count))
+
+        # Merge overlapping or adjacent chunks of the same source
+        positioned = sorted((span for span in spans if span.get('start') is not None and span.get('end') is not None),
+                            key=lambda span: (str(span.get('source')), span['start']))
+        merged = [span for span in spans if span.get('start') is None or span.get('end') is None]
+
+        for span in positioned:
+            previous = merged[-1] if merged and merged[-1].get('start') is not None else None
+            if previous is not None and previous.get('source') == span.get('source'):
+                content = _merge_content(previous['content'], span['content'], previous['end'] - span['start'])
+                if content is not None:
+                    shared = len(previous['content']) + len(span['content']) - len(content)
+                    shared_tokens = self.count_tokens(span['content'][:shared]) if shared > 0 else 0
+                    previous.update(
+                        content=content,
+                        end=max(previous['end'], span['end']),
+                        score=max(previous['score'], span['score']),
+                        token_count=previous['token_count'] + span['token_count'] - shared_tokens,
+                        heading_path=list(_common_path(tuple(previous.get('heading_path') or ()),
+                                                       tuple(span.get('heading_path') or ())))
+                    )
+                    continue
+            merged.append(span)
+
+        # Fill the budget greedily by score per token
+        header_tokens = self.count_tokens(self._format_header({}, 0)) + 1
+        ranked = sorted(merged, key=lambda span: span['score'] / (span['token_count'] + header_tokens), reverse=True)
+
+        selected = []
+        remaining = token_budget
+        for span in ranked:
+            cost = span['token_count'] + header_tokens
+            if cost <= remaining:
+                selected.append(span)
+                remaining -= cost
+
+        selected.sort(key=lambda span: span['score'], reverse=True)
+        return selected
+
+    def _format_header(self, doc: Dict[str, Any], number: int) -> str:
+        """
+        Build the header line that introduces a document in the context.
+        """
+        # Extract document metadata if available
+        source = doc.get('source', 'Unknown source') if isinstance(doc, dict) else 'Unknown source'
+        title = doc.get('title', 'Untitled') if isinstance(doc, dict) else 'Untitled'
+
+        heading_path = doc.get('heading_path') if isinstance(doc, dict) else None
+        section = f", Section: {' > '.join(heading_path)}" if heading_path else ""
+
+        return f"Document {number} (Source: {source}, Title: {title}{section}):\n"
+
+class ChunkRow:
+    """
+    A lightweight view of one row of a ChunkTable.
+
+    Rows support dictionary-style access (``row['content']``, ``row.get(...)``)
+    to the chunk fields ``content``, ``start``, ``end``, ``token_count``,
+    ``heading_path``, ``id``, ``original_id`` and ``aliases``, falling back to
+    the metadata of the document the chunk came from. Nothing is copied until
+    a field is read.
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: 'ChunkTable', row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def content(self) -> str:
+        return self.table.content(self.row)
+
+    @property
+    def document(self) -> Dict[str, Any]:
+        return self.table.document(self.row)
+
+    def __getitem__(self, key: str) -> Any:
+        table, row = self.table, self.row
+        record = table.rows[row]
+
+        if key == 'content':
+            return table.content(row)
+        if key == 'start':
+            return int(record['start'])
+        if key == 'end':
+            return int(record['start'] + record['length'])
+        if key == 'token_count':
+            return int(record['token_count'])
+        if key == 'heading_path':
+            return list(table.headings[record['heading']])
+        if key == 'aliases':
+            return table.aliases.get(row, [])
+
+        document = table.documents[record['doc']]
+        if key == 'id':
+            return f"{document.get('id')}_chunk_{record['ordinal']}"
+        if key == 'original_id':
+            return document.get('id')
+        return document[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in ChunkTable.CHUNK_FIELDS or key in self.document
+
+    def __repr__(self) -> str:
+        return f"ChunkRow({self['id']!r}, start={self['start']}, end={self['end']})"
+
+
+class ChunkTable:
+    """
+    A compact, column-oriented store for the chunks of many documents.
+
+    Each document's text is held once, together with its metadata, and every
+    chunk is a fixed-size record of offsets and counts in a NumPy structured
+    array. This replaces a list of per-chunk dictionaries in which the text
+    of overlapping chunks and the document metadata were duplicated.
+    """
+
+    CHUNK_FIELDS = ('content', 'start', 'end', 'token_count', 'heading_path', 'id', 'original_id', 'aliases')
+
+    def __init__(self):
+        """
+        Initialize an empty ChunkTable.
+        """
+        self.texts = []
+        self.encodings = []
+        self.documents = []
+        self.headings = [()]
+        self.aliases = {}
+        self._heading_ids = {(): 0}
+        self._rows = np.zeros(0, dtype=_CHUNK_ROW_DTYPE)
+        self._size = 0
+
+    @property
+    def rows(self) -> np.ndarray:
+        """
+        The structured array of chunk records (a view, not a copy).
+        """
+        return self._rows[:self._size]
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self.rows['start']
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self.rows['start'] + self.rows['length']
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.rows['length']
+
+    @property
+    def token_counts(self) -> np.ndarray:
+        return self.rows['token_count']
+
+    @property
+    def doc_ids(self) -> np.ndarray:
+        return self.rows['doc']
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row: int) -> ChunkRow:
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError("chunk row out of range")
+        return ChunkRow(self, row)
+
+    def __iter__(self) -> Iterator[ChunkRow]:
+        return (ChunkRow(self, row) for row in range(self._size))
+
+    def content(self, row: int) -> str:
+        """
+        Slice the text of one chunk out of its document buffer.
+
+        Args:
+            row (int): Row index of the chunk
+
+        Returns:
+            str: The chunk's content
+        """
+        record = self._rows[row]
+        doc = record['doc']
+        start = int(record['start'])
+        piece = self.texts[doc][start:start + int(record['length'])]
+        return piece if isinstance(piece, str) else piece.decode(self.encodings[doc])
+
+    def document(self, row: int) -> Dict[str, Any]:
+        """
+        Return the shared metadata of the document a chunk belongs to.
+        """
+        return self.documents[self._rows[row]['doc']]
+
+    def add_document(self, text: str, metadata: Dict[str, Any], chunks: Iterable[Dict[str, Any]]):
+        """
+        Add a document and its chunks, given as character offsets into ``text``.
+
+        Args:
+            text (str): Full text of the document
+            metadata (Dict[str, Any]): Document metadata shared by all its chunks
+            chunks (Iterable[Dict[str, Any]]): Chunks as returned by
+                ``chunk_markdown`` or ``chunk_many``
+        """
+        self._append(text, 'utf-8', metadata, list(chunks))
+
+    def add_stream(self, metadata: Dict[str, Any], chunks: Iterable[Dict[str, Any]], encoding: str = 'utf-8'):
+        """
+        Add a document from streamed chunks carrying byte offsets (see ``iter_chunks``).
+
+        The document buffer is rebuilt from the chunks themselves, so the text
+        shared by overlapping chunks is stored once and the source file never
+        has to be read a second time.
+
+        Args:
+            metadata (Dict[str, Any]): Document metadata shared by all its chunks
+            chunks (Iterable[Dict[str, Any]]): Chunks as yielded by ``iter_chunks``
+            encoding (str): Encoding the byte offsets refer to
+        """
+        buffer = bytearray()
+        records = []
+
+        for chunk in chunks:
+            start = chunk['start']
+            if start > len(buffer):
+                # Whitespace between chunks is never read back; pad it
+                buffer.extend(b' ' * (start - len(buffer)))
+            buffer[start:] = chunk['content'].encode(encoding)
+            # Keep only the offsets; the content now lives in the buffer
+            records.append({key: value for key, value in chunk.items() if key != 'content'})
+
+        self._append(bytes(buffer), encoding, metadata, records)
+
+    def take(self, rows: Sequence[int], aliases: Dict[int, List[Dict[str, Any]]] = None) -> 'ChunkTable':
+        """
+        Build a table holding only the selected rows.
+
+        Document buffers and metadata are shared with this table, not copied.
+
+        Args:
+            rows (Sequence[int]): Row indices to keep, in the order to keep them
+            aliases (Dict[int, List[Dict[str, Any]]]): Aliases of the new table,
+                keyed by row index in the new table (defaults to the aliases
+                the selected rows already have)
+
+        Returns:
+            ChunkTable: The selected rows
+        """
+        table = ChunkTable()
+        table.texts = self.texts
+        table.encodings = self.encodings
+        table.documents = self.documents
+        table.headings = self.headings
+        table._heading_ids = self._heading_ids
+        table._rows = self.rows[np.asarray(rows, dtype=np.int64)]
+        table._size = len(table._rows)
+        if aliases is None:
+            aliases = {new: self.aliases[old] for new, old in enumerate(rows) if old in self.aliases}
+        table.aliases = dict(aliases)
+        return table
+
+    def _append(self, text: Union[str, bytes], encoding: str, metadata: Dict[str, Any],
+                chunks: List[Dict[str, Any]]):
+        """
+        Store a document buffer and append one record per chunk.
+        """
+        doc = len(self.texts)
+        self.texts.append(text)
+        self.encodings.append(encoding)
+        self.documents.append(dict(metadata))
+
+        count = len(chunks)
+        if self._size + count > len(self._rows):
+            grown = np.zeros(max(2 * len(self._rows), self._size + count, 1024), dtype=_CHUNK_ROW_DTYPE)
+            grown[:self._size] = self.rows
+            self._rows = grown
+
+        heading_ids = []
+        for chunk in chunks:
+            heading = tuple(chunk.get('heading_path') or ())
+            heading_id = self._heading_ids.get(heading)
+            if heading_id is None:
+                heading_id = self._heading_ids[heading] = len(self.headings)
+                self.headings.append(heading)
+            heading_ids.append(heading_id)
+
+        block = self._rows[self._size:self._size + count]
+        block['doc'] = doc
+        block['ordinal'] = np.arange(count)
+        block['start'] = [chunk['start'] for chunk in chunks]
+        block['length'] = [chunk['end'] - chunk['start'] for chunk in chunks]
+        block['token_count'] = [chunk.get('token_count', 0) for chunk in chunks]
+        block['heading'] = heading_ids
+
+        self._size += count
+
 
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
     """
@@ -0,0 +1,178 @@
+"""
+Chunk de-duplication for the indexing pipeline.
+
+This module provides the ChunkDeduplicator class which detects exact
+duplicates (SHA-256 of the content) and near-duplicates (MinHash signatures
+with LSH banding) so that repeated text is embedded and stored only once.
+"""
+
+import hashlib
+import re
+import zlib
+from typing import List, Dict, Any, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context7 import ChunkTable
+
+# Mersenne prime used for the universal hash family; 32-bit shingle hashes
+# times 31-bit coefficients stay within uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD_RE = re.compile(r'\w+')
+
+
+def _lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Pick the number of LSH bands and rows per band for a similarity threshold.
+
+    Two signatures become candidates when all rows of at least one band match,
+    which happens with probability 1/2 at a similarity of about
+    ``(1 / bands) ** (1 / rows)``; the split closest to ``threshold`` wins.
+
+    Args:
+        threshold (float): Jaccard similarity above which texts are duplicates
+        num_perm (int): Number of MinHash permutations
+
+    Returns:
+        Tuple[int, int]: ``(bands, rows)`` with ``bands * rows <= num_perm``
+    """
+    best = None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class ChunkDeduplicator:
+    """
+    Incrementally detect exact and near-duplicate chunks.
+
+    Each text is registered with ``add``; the first occurrence of some content
+    becomes the representative and later duplicates are mapped onto it.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """
+        Initialize the ChunkDeduplicator.
+
+        Args:
+            threshold (float): Estimated Jaccard similarity of word shingles
+                at or above which two chunks are near-duplicates; values
+                above 1 disable near-duplicate detection
+            num_perm (int): Number of MinHash permutations per signature
+            shingle_size (int): Number of words per shingle
+            seed (int): Seed for the MinHash permutations
+        """
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_bands(min(threshold, 1.0), num_perm)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+
+        self._exact = {}
+        self._signatures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of a text's word shingles.
+
+        Args:
+            text (str): The text to sign
+
+        Returns:
+            np.ndarray: ``num_perm`` minimum hash values
+        """
+        words = _WORD_RE.findall(text.lower())
+        size = self.shingle_size
+        shingles = {' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        return ((hashes[:, None] * self._a + self._b) % _PRIME).min(axis=0)
+
+    def add(self, key: Hashable, text: str) -> Tuple[Optional[Hashable], str]:
+        """
+        Register a chunk and report whether it duplicates an earlier one.
+
+        Args:
+            key: Identifier of the chunk
+            text (str): Content of the chunk
+
+        Returns:
+            Tuple[Optional[Hashable], str]: The key of the representative chunk
+            and ``'exact'`` or ``'near'``, or ``(None, '')`` if the chunk is new
+            and has become a representative itself
+        """
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        if digest in self._exact:
+            return self._exact[digest], 'exact'
+        self._exact[digest] = key
+
+        if self.threshold > 1.0:
+            return None, ''
+
+        signature = self.signature(text)
+        band_keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        for bucket, band_key in zip(self._buckets, band_keys):
+            for candidate in bucket.get(band_key, ()):
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    self._exact[digest] = candidate
+                    return candidate, 'near'
+
+        self._signatures[key] = signature
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(key)
+
+        return None, ''
+
+
+def deduplicate_table(chunks: ChunkTable, deduplicator: ChunkDeduplicator, keys: Sequence[Hashable],
+                      alias_fields: Tuple[str, ...] = ('source', 'file_path', 'start', 'end')
+                      ) -> Tuple[ChunkTable, Dict[Hashable, List[Dict[str, Any]]], Dict[str, int]]:
+    """
+    Collapse the duplicate chunks of one table, also against earlier tables.
+
+    Used when chunks arrive a document at a time: the same deduplicator is
+    passed for every table, so a chunk repeating one from an earlier table is
+    dropped as well. Such duplicates cannot be attached to the earlier table
+    any more and are returned separately, keyed by their representative.
+
+    Args:
+        chunks (ChunkTable): The chunks of the next table
+        deduplicator (ChunkDeduplicator): Deduplicator shared by all tables
+        keys (Sequence[Hashable]): Key of each chunk, unique across tables
+            for chunks that are not exact duplicates
+        alias_fields (Tuple[str, ...]): Fields copied from a duplicate into its alias entry
+
+    Returns:
+        Tuple: The unique chunks of this table (each with its aliases within
+        the table), aliases of chunks from earlier tables by key, and the
+        number of ``exact`` and ``near`` duplicates removed
+    """
+    kept = []
+    rows_by_key = {}
+    aliases = {}
+    earlier = {}
+    removed = {'exact': 0, 'near': 0}
+
+    for row, (key, chunk) in enumerate(zip(keys, chunks)):
+        representative, kind = deduplicator.add(key, chunk['content'])
+        if representative is None:
+            rows_by_key[key] = len(kept)
+            kept.append(row)
+            continue
+
+        alias = {field: chunk[field] for field in alias_fields if field in chunk}
+        if representative in rows_by_key:
+            aliases.setdefault(rows_by_key[representative], []).append(alias)
+        else:
+            earlier.setdefault(representative, []).append(alias)
+        removed[kind] += 1
+
+    return chunks.take(kept, aliases), earlier, removed
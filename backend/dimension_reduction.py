@@ -0,0 +1,290 @@
+"""
+Reduced-dimension embeddings for smaller and faster indexes.
+
+Vectors can be shortened in two ways. Models trained Matryoshka-style
+(e.g. text-embedding-004) return a prefix of their full vector when asked
+for a smaller ``output_dimensionality``. For other models a PCA projection
+is fitted on a sample of the corpus at index time and saved with the
+index, so that queries can be projected the same way. Index memory and
+search cost scale with the dimension; ``recall_report`` measures what the
+reduction costs in retrieval quality.
+"""
+
+import functools
+import os
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from faiss_indexes import exact_neighbors, recall_at_k, sample_training_set
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:
+    _EmbeddingsBase = object
+
+# Values of the indexer's --reduce option
+REDUCTION_METHODS = ('none', 'matryoshka', 'pca')
+
+# Number of chunk vectors the PCA projection is fitted on
+PCA_SAMPLE_SIZE = int(os.getenv("PCA_SAMPLE_SIZE", 4096))
+
+# Directory the PCA projections of Qdrant collections are saved in, one per
+# collection version; shared by the indexer and the RAG API
+PROJECTION_DIR = os.getenv(
+    "EMBEDDING_PROJECTION_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "projections"))
+
+# Full output dimension of the embedding models, to tell truncated collections apart
+MODEL_DIMENSIONS = {
+    'embedding-001': 768,
+    'text-embedding-004': 768
+}
+
+# Gemini models that accept a smaller ``outputDimensionality``; the API rejects
+# it for the others (e.g. embedding-001), so they can only be reduced with PCA
+MATRYOSHKA_MODELS = ('text-embedding-004',)
+
+
+def normalize(vectors: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+    Scale each row to unit length, leaving zero rows alone.
+
+    Args:
+        vectors: Matrix of vectors, one per row
+        out: Array to write the result to, e.g. ``vectors`` itself to normalize in place
+
+    Returns:
+        np.ndarray: The normalized vectors
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, np.where(norms == 0, 1, norms), out=out)
+
+
+def truncate(vectors: Sequence[Sequence[float]], dimension: int) -> np.ndarray:
+    """
+    Keep the first ``dimension`` components of Matryoshka vectors, renormalized.
+    """
+    return normalize(np.asarray(vectors, dtype=np.float32)[:, :dimension])
+
+
+class PCAProjection:
+    """
+    Linear projection onto the principal axes of a sample of vectors.
+
+    The sample is not centered: the axes of the uncentered vectors are the
+    ones that best preserve dot products, which is what cosine search ranks
+    by. Projected vectors are normalized, so cosine similarity keeps its
+    meaning.
+    """
+
+    def __init__(self, components: np.ndarray):
+        """
+        Initialize the PCAProjection.
+
+        Args:
+            components (np.ndarray): Principal axes, one per output dimension
+        """
+        self.components = np.asarray(components, dtype=np.float32)
+
+    @property
+    def dimension(self) -> int:
+        """
+        Output dimension of the projection.
+        """
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors: Sequence[Sequence[float]], dimension: int, sample_size: int = PCA_SAMPLE_SIZE,
+            seed: int = 0) -> 'PCAProjection':
+        """
+        Fit a projection on a random sample of the vectors.
+
+        Args:
+            vectors: Full-dimensional vectors, one per row
+            dimension (int): Output dimension
+            sample_size (int): Maximum number of vectors the fit uses
+            seed (int): Seed of the sample
+
+        Returns:
+            PCAProjection: The fitted projection
+
+        Raises:
+            ValueError: If there are fewer vectors or input dimensions than ``dimension``
+        """
+        sample = normalize(sample_training_set(np.asarray(vectors, dtype=np.float32), sample_size, seed))
+        if dimension > min(sample.shape):
+            raise ValueError(f"Cannot fit {dimension} components on {sample.shape[0]} vectors "
+                             f"of dimension {sample.shape[1]}")
+
+        _, _, axes = np.linalg.svd(sample, full_matrices=False)
+        return cls(axes[:dimension])
+
+    def apply(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        """
+        Project vectors.
+
+        Args:
+            vectors: Full-dimensional vectors, one per row
+
+        Returns:
+            np.ndarray: Normalized float32 vectors of ``dimension`` components
+        """
+        return normalize(np.asarray(vectors, dtype=np.float32) @ self.components.T)
+
+    def save(self, path: str):
+        """
+        Write the projection to a ``.npz`` file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, components=self.components)
+
+    @classmethod
+    def load(cls, path: str) -> 'PCAProjection':
+        """
+        Read a projection written by ``save``.
+        """
+        with np.load(path) as data:
+            return cls(data['components'])
+
+
+def supports_matryoshka(backend: str, model: str) -> bool:
+    """
+    Whether an embedder can return Matryoshka vectors of a smaller dimension.
+
+    Local and hash embedders truncate their own vectors, so only Gemini
+    models are limited to ``MATRYOSHKA_MODELS``.
+    """
+    return backend != 'gemini' or model.split('/')[-1] in MATRYOSHKA_MODELS
+
+
+def projection_path(collection_name: str, directory: str = PROJECTION_DIR) -> str:
+    """
+    Return the file holding the PCA projection of a Qdrant collection version.
+    """
+    return os.path.join(directory, f"{collection_name}.npz")
+
+
+class ReducedEmbedder(_EmbeddingsBase):
+    """
+    Wrap an embedder so that its vectors come out reduced.
+
+    Chunks the wrapped embedder could not embed stay None.
+    """
+
+    def __init__(self, embedder: Any, reduce: Callable[[List[List[float]]], np.ndarray]):
+        """
+        Initialize the ReducedEmbedder.
+
+        Args:
+            embedder: Embedder producing full-dimensional vectors
+            reduce: Maps a list of vectors to their reduced form, e.g. ``PCAProjection.apply``
+        """
+        self.embedder = embedder
+        self.reduce = reduce
+
+    def embed_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        vectors = self.embedder.embed_documents(texts)
+        rows = [i for i, vector in enumerate(vectors) if vector is not None]
+        reduced = [None] * len(vectors)
+        if rows:
+            for i, vector in zip(rows, self.reduce([vectors[i] for i in rows])):
+                reduced[i] = vector.tolist()
+        return reduced
+
+    def embed_array(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        matrix, rows = self.embedder.embed_array(texts)
+        return (self.reduce(matrix) if rows else matrix), rows
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.reduce([self.embedder.embed_query(text)])[0].tolist()
+
+
+def prune_projections(client, directory: str = PROJECTION_DIR) -> List[str]:
+    """
+    Delete the saved projections of collections that no longer exist.
+
+    Args:
+        client: Qdrant client instance
+        directory: Directory of the saved PCA projections
+
+    Returns:
+        List[str]: Paths of the deleted files
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    deleted = []
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith('.npz') and not client.collection_exists(file_name[:-len('.npz')]):
+            os.remove(os.path.join(directory, file_name))
+            deleted.append(os.path.join(directory, file_name))
+    return deleted
+
+
+def recall_report(full: Sequence[Sequence[float]], reduced: Sequence[Sequence[float]], k: int = 10,
+                  queries: int = 200, seed: int = 0) -> float:
+    """
+    Measure how many of the nearest neighbours survive the reduction.
+
+    A sample of the vectors is used as queries; their k nearest neighbours
+    by cosine similarity among the reduced vectors are compared with those
+    among the full vectors.
+
+    Args:
+        full: Full-dimensional vectors
+        reduced: The same vectors reduced, in the same order
+        k: Number of neighbours compared
+        queries: Number of sample queries
+        seed: Seed of the query sample
+
+    Returns:
+        float: Recall@k of search over the reduced vectors
+    """
+    full = normalize(np.asarray(full, dtype=np.float32))
+    reduced = normalize(np.asarray(reduced, dtype=np.float32))
+    rows = np.sort(np.random.default_rng(seed).permutation(len(full))[:queries])
+
+    truth = exact_neighbors(full, full[rows], k)
+    found = exact_neighbors(reduced, reduced[rows], k)
+    recall = recall_at_k(found, truth)
+    print(f"Recall@{k} of {reduced.shape[1]}-dimensional vectors against {full.shape[1]} dimensions: "
+          f"{recall:.3f} over {len(rows)} sample queries")
+    return recall
+
+
+@functools.lru_cache(maxsize=4)
+def _load_projection(path: str, mtime: float) -> PCAProjection:
+    return PCAProjection.load(path)
+
+
+def query_reduction(client, alias: str, model: str, directory: str = PROJECTION_DIR,
+                    full_dimension: int = None) -> Tuple[Optional[int], Optional[PCAProjection]]:
+    """
+    Find out how queries against a Qdrant collection have to be reduced.
+
+    Args:
+        client: Qdrant client instance
+        alias: Alias (or name) of the collection searched
+        model: Name of the embedding model
+        directory: Directory of the saved PCA projections
+        full_dimension: Full output dimension of the model, for models not
+            in ``MODEL_DIMENSIONS`` (e.g. local ones)
+
+    Returns:
+        The ``output_dimensionality`` to request from the model (None for its
+        default), and the PCA projection saved with the collection, if any
+    """
+    from qdrant_collections import resolve_alias
+
+    collection_name = resolve_alias(client, alias) or alias
+    path = projection_path(collection_name, directory)
+    if os.path.exists(path):
+        # A failed rebuild's version number is reused, so the file is keyed by its mtime as well
+        return None, _load_projection(path, os.path.getmtime(path))
+
+    size = client.get_collection(collection_name).config.params.vectors.size
+    full_size = full_dimension or MODEL_DIMENSIONS.get(model.split('/')[-1], size)
+    return (size if size < full_size else None), None
@@ -0,0 +1,286 @@
+"""
+Persistent, content-addressed cache for embeddings.
+
+This module provides the EmbeddingCache class, an SQLite store of float32
+vectors keyed by model, task type, output dimension and a hash of the text,
+and the CachedEmbedder class which wraps any embedder so that text that has
+already been embedded is never sent to the embedding API again.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embeddings import DOCUMENT_TASK, QUERY_TASK
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:
+    _EmbeddingsBase = object
+
+# Shared by the indexers and the RAG API unless EMBEDDING_CACHE_PATH says otherwise
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.sqlite3"))
+DEFAULT_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 1 << 30))
+
+# SQLite limits the number of host parameters per statement
+_MAX_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    model TEXT NOT NULL,
+    task_type TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def cache_key(model: str, task_type: str, dimension: Optional[int], text: str) -> bytes:
+    """
+    Compute the cache key of a text for a given embedding configuration.
+
+    Args:
+        model (str): Name of the embedding model
+        task_type (str): Task type the vector was computed for
+        dimension (Optional[int]): Requested output dimension (None for the model default)
+        text (str): The embedded text
+
+    Returns:
+        bytes: SHA-256 digest identifying the vector
+    """
+    digest = hashlib.sha256(f"{model}\0{task_type}\0{dimension or 0}\0".encode('utf-8'))
+    digest.update(text.encode('utf-8'))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed store of embedding vectors with size-based LRU eviction.
+
+    Vectors are stored as packed float32 blobs. The cache is safe to share
+    between threads of one process and between processes (SQLite WAL mode).
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the EmbeddingCache.
+
+        Args:
+            path (str): SQLite database file (``':memory:'`` for a throwaway cache)
+            max_bytes (int): Total size of stored vectors above which the least
+                recently used entries are evicted (0 disables eviction)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up several vectors at once and mark them as recently used.
+
+        Args:
+            keys (Sequence[bytes]): Keys from ``cache_key``
+
+        Returns:
+            Dict[bytes, np.ndarray]: The float32 vectors that were found, by key
+        """
+        found = {}
+        now = time.time()
+        with self._lock, self._conn:
+            for batch in _batches(list(dict.fromkeys(keys)), _MAX_PARAMS):
+                marks = ','.join('?' * len(batch))
+                rows = self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", batch)
+                found.update((key, np.frombuffer(vector, dtype='<f4')) for key, vector in rows)
+                self._conn.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({marks})", [now, *batch])
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, str, str, Optional[int], Any]]):
+        """
+        Store several vectors at once, then evict old entries if the cache is too large.
+
+        Args:
+            items: ``(key, model, task_type, dimension, vector)`` tuples
+        """
+        now = time.time()
+        rows = [(key, model, task_type, dimension or 0, np.asarray(vector, dtype='<f4').tobytes(), now)
+                for key, model, task_type, dimension, vector in items]
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Delete least recently used entries until the vectors fit in ``max_bytes``.
+
+        Callers must hold the lock and an open transaction.
+        """
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Free an extra tenth so that eviction does not run on every insert
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            stale.append(key)
+            freed += size
+            if freed >= excess:
+                break
+
+        for batch in _batches(stale, _MAX_PARAMS):
+            self._conn.execute(f"DELETE FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch)
+
+    def size_bytes(self) -> int:
+        """
+        Return the total size of the stored vectors in bytes.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+
+def _batches(items: List[Any], size: int) -> Iterable[List[Any]]:
+    """
+    Split a list into consecutive batches of at most ``size`` items.
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class CachedEmbedder(_EmbeddingsBase):
+    """
+    Wrap an embedder so that vectors are read from and written to an EmbeddingCache.
+
+    The wrapped embedder only needs ``embed_documents`` and ``embed_query``,
+    so Gemini embedders and LangChain ``Embeddings`` work alike; the wrapper
+    offers the same two methods and can be used wherever the original was.
+    """
+
+    def __init__(self, embedder: Any, cache: EmbeddingCache = None, model: str = None,
+                 dimension: int = None, batch_size: int = 100):
+        """
+        Initialize the CachedEmbedder.
+
+        Args:
+            embedder: The embedder computing vectors on a cache miss
+            cache (EmbeddingCache): Cache to use (defaults to one at ``DEFAULT_CACHE_PATH``)
+            model (str): Model name for the cache key (defaults to ``embedder.model``)
+            dimension (int): Output dimension for the cache key (defaults to
+                ``embedder.output_dimensionality``)
+            batch_size (int): Number of missing texts passed to the embedder per
+                call; each batch is stored as soon as it is computed
+        """
+        self.embedder = embedder
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.model = model or getattr(embedder, 'model', type(embedder).__name__)
+        self.dimension = dimension or getattr(embedder, 'output_dimensionality', None)
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunks being indexed, computing only those not in the cache.
+
+        Args:
+            texts (List[str]): The chunk texts
+
+        Returns:
+            List[List[float]]: One vector per text, in input order (None where
+            the wrapped embedder returned None, which is not cached)
+        """
+        return self._embed(texts, DOCUMENT_TASK, self.embedder.embed_documents)
+
+    def embed_array(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Embed chunks being indexed into one contiguous float32 matrix.
+
+        Cached vectors are copied straight from their stored bytes, so no
+        Python float objects are created for them.
+
+        Args:
+            texts (List[str]): The chunk texts
+
+        Returns:
+            Tuple[np.ndarray, List[int]]: The vectors of the texts that could be
+            embedded, one row each, and the positions of those texts in ``texts``
+        """
+        keys, found = self._lookup(texts, DOCUMENT_TASK, self.embedder.embed_documents)
+        rows = [i for i, key in enumerate(keys) if key in found]
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32), rows
+
+        matrix = np.empty((len(rows), len(found[keys[rows[0]]])), dtype=np.float32)
+        for position, row in enumerate(rows):
+            matrix[position] = found[keys[row]]
+        return matrix, rows
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a search query, using the cache if it has been seen before.
+
+        Args:
+            text (str): The query text
+
+        Returns:
+            List[float]: The query vector
+        """
+        return self._embed([text], QUERY_TASK, lambda texts: [self.embedder.embed_query(texts[0])])[0]
+
+    def _embed(self, texts: List[str], task_type: str, compute) -> List[List[float]]:
+        """
+        Serve vectors from the cache and fill in the misses with ``compute``.
+        """
+        keys, found = self._lookup(texts, task_type, compute)
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def _lookup(self, texts: List[str], task_type: str, compute) -> Tuple[List[bytes], Dict[bytes, np.ndarray]]:
+        """
+        Find the cached vectors of the texts and compute the missing ones.
+
+        Returns:
+            The cache key of each text, and the float32 vectors found or computed, by key
+        """
+        keys = [cache_key(self.model, task_type, self.dimension, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # Duplicate texts within one call are computed once
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        for batch in _batches(missing, self.batch_size):
+            computed = [(key, vector) for (key, _), vector in zip(batch, compute([text for _, text in batch]))
+                        if vector is not None]
+            self.cache.put_many((key, self.model, task_type, self.dimension, vector) for key, vector in computed)
+            found.update((key, np.asarray(vector, dtype=np.float32)) for key, vector in computed)
+
+        return keys, found
@@ -0,0 +1,254 @@
+"""
+Batched, concurrent and quota-aware embedding.
+
+This module provides the EmbeddingEngine class which splits texts into
+batches, embeds several batches at once on a thread pool, throttles requests
+with token buckets sized to the model's requests-per-minute and
+tokens-per-minute quotas, retries failures with exponential backoff and
+records chunks that keep failing in a dead-letter list instead of
+inventing vectors for them.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from embeddings import EmbeddingError
+
+# Default quotas for the Gemini embedding API, overridable per deployment
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 1500))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 1000000))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of model tokens in a text (about four characters each).
+    """
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the TokenBucket.
+
+        Args:
+            per_minute (float): Tokens added per minute
+            capacity (float): Maximum number of stored tokens (defaults to one minute's worth)
+            clock: Monotonic clock in seconds
+            sleep: Function used to wait for tokens
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Take tokens from the bucket, waiting until enough are available.
+
+        Requests larger than the capacity are capped at the capacity so that
+        they wait for a full bucket instead of forever.
+
+        Args:
+            amount (float): Number of tokens to take
+
+        Returns:
+            float: Total number of seconds spent waiting
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class FailedEmbedding(NamedTuple):
+    """
+    A text that could not be embedded, kept for a later retry.
+    """
+    index: int
+    text: str
+    error: str
+    attempts: int
+
+
+class _Batch(NamedTuple):
+    indices: List[int]
+    texts: List[str]
+
+
+class EmbeddingEngine:
+    """
+    Embed many texts through any embedder with batching, concurrency and quotas.
+
+    The engine exposes ``embed_documents``/``embed_query`` itself, so it can be
+    wrapped by ``CachedEmbedder`` like any other embedder. A batch rejected
+    with a non-retryable error is retried in halves until the failing texts
+    are isolated; a batch that runs out of retries on retryable errors (quota,
+    server errors, timeouts) is not split, since its halves would only fail
+    the same way. Texts that fail get ``None`` instead of a vector and are
+    appended to ``dead_letter``.
+    """
+
+    def __init__(self, embedder: Any, batch_size: int = 100, max_workers: int = 4,
+                 requests_per_minute: Optional[int] = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: Optional[int] = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = 5, initial_backoff: float = 1.0, max_backoff: float = 60.0,
+                 count_tokens: Callable[[str], int] = estimate_tokens, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the EmbeddingEngine.
+
+        Args:
+            embedder: Embedder whose ``embed_documents`` accepts a batch of texts
+            batch_size (int): Maximum number of texts per request
+            max_workers (int): Number of batches embedded concurrently
+            requests_per_minute (Optional[int]): Request quota (None for no limit)
+            tokens_per_minute (Optional[int]): Token quota (None for no limit)
+            max_retries (int): Retries of a batch failing with retryable errors
+                before its texts are dead-lettered
+            initial_backoff (float): Delay before the first retry in seconds
+            max_backoff (float): Upper bound of the retry delay in seconds
+            count_tokens: Function estimating the tokens a text uses up in the quota
+            sleep: Function used for backoff and throttling delays
+        """
+        if batch_size <= 0 or max_workers <= 0:
+            raise ValueError("batch_size and max_workers must be positive integers")
+
+        self.embedder = embedder
+        self.model = getattr(embedder, 'model', type(embedder).__name__)
+        self.output_dimensionality = getattr(embedder, 'output_dimensionality', None)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.count_tokens = count_tokens
+        self._sleep = sleep
+        self._requests = TokenBucket(requests_per_minute, sleep=sleep) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, sleep=sleep) if tokens_per_minute else None
+
+        self.dead_letter: List[FailedEmbedding] = []
+        self.requests = 0
+        self.retries = 0
+        self._stats_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed chunks being indexed.
+
+        Args:
+            texts (List[str]): The chunk texts
+
+        Returns:
+            List[Optional[List[float]]]: One vector per text, or None for texts
+            that failed and were added to ``dead_letter``
+        """
+        vectors = [None] * len(texts)
+        pending = deque(_Batch(list(range(start, min(start + self.batch_size, len(texts)))),
+                               texts[start:start + self.batch_size])
+                        for start in range(0, len(texts), self.batch_size))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            while pending or running:
+                # Keep at most max_workers batches in flight so retries of a
+                # split batch do not queue up behind the whole corpus
+                while pending and len(running) < self.max_workers:
+                    batch = pending.popleft()
+                    running[pool.submit(self._embed_batch, batch.texts)] = batch
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = running.pop(future)
+                    result, error, attempts, retryable = future.result()
+                    if result is not None:
+                        for index, vector in zip(batch.indices, result):
+                            vectors[index] = vector
+                    elif len(batch.texts) > 1 and not retryable:
+                        # Isolate the rejected texts by retrying each half on its own
+                        middle = len(batch.texts) // 2
+                        pending.appendleft(_Batch(batch.indices[middle:], batch.texts[middle:]))
+                        pending.appendleft(_Batch(batch.indices[:middle], batch.texts[:middle]))
+                    else:
+                        self.dead_letter.extend(FailedEmbedding(index, text, error, attempts)
+                                                for index, text in zip(batch.indices, batch.texts))
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a search query with the same throttling and retries.
+
+        Raises:
+            EmbeddingError: If the query cannot be embedded
+        """
+        result, error, _, _ = self._call(lambda: self.embedder.embed_query(text), [text])
+        if result is None:
+            raise EmbeddingError(f"Query embedding failed: {error}")
+        return result
+
+    def _embed_batch(self, texts: List[str]):
+        """
+        Embed one batch, retrying it with backoff.
+        """
+        return self._call(lambda: self.embedder.embed_documents(texts), texts)
+
+    def _call(self, request: Callable[[], Any], texts: List[str]):
+        """
+        Run a request under the quotas, retrying retryable failures.
+
+        Returns:
+            Tuple: ``(result, None, attempts, False)`` on success, or
+            ``(None, error message, attempts, retryable)`` on a non-retryable
+            error or once retries are exhausted
+        """
+        tokens = sum(self.count_tokens(text) for text in texts)
+        attempt = 0
+        while True:
+            if self._requests:
+                self._requests.acquire(1)
+            if self._tokens:
+                self._tokens.acquire(tokens)
+
+            attempt += 1
+            with self._stats_lock:
+                self.requests += 1
+            try:
+                return request(), None, attempt, False
+            except Exception as e:
+                retryable = getattr(e, 'retryable', True)
+                if not retryable or attempt > self.max_retries:
+                    return None, str(e), attempt, retryable
+
+                delay = min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+                # Jitter keeps concurrent workers from retrying in lockstep
+                delay *= 0.5 + random.random() / 2
+                retry_after = getattr(e, 'retry_after', None)
+                if retry_after:
+                    delay = max(delay, retry_after)
+
+                with self._stats_lock:
+                    self.retries += 1
+                self._sleep(delay)
+
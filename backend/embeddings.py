@@ -0,0 +1,463 @@
+"""
+Embedding backends for the indexing scripts and the RAG API.
+
+Embedders follow the LangChain ``Embeddings`` interface: ``embed_documents``
+for chunks being indexed and ``embed_query`` for search queries. They also
+expose the ``model`` name and ``output_dimensionality`` so wrappers such as
+the embedding cache can tell vectors from different models apart.
+
+Three backends are available: the Gemini REST API, a local
+sentence-transformers model run on the CPU (with ONNX Runtime or PyTorch),
+which needs no network access or API quota, and deterministic hashed word
+features for offline tests and benchmarks. ``get_embedder`` picks one by name.
+"""
+
+import functools
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:
+    _EmbeddingsBase = object
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# Task types used by the Gemini embedding API for the two sides of retrieval
+DOCUMENT_TASK = "retrieval_document"
+QUERY_TASK = "retrieval_query"
+
+GEMINI_API_URL = os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com")
+
+# HTTP statuses worth retrying: quota exhaustion and transient server errors
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Names accepted by get_embedder, and the backend used when none is given
+EMBEDDING_BACKENDS = ('gemini', 'local', 'hash')
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
+
+# Model of each backend when none is given
+DEFAULT_MODELS = {
+    'gemini': "embedding-001",
+    'local': os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+    'hash': "hash-embedding"
+}
+
+# Inference runtime of local models: 'onnx' (ONNX Runtime) or 'torch'
+LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "onnx")
+
+# CPU threads a local model's forward pass uses
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", os.cpu_count() or 1))
+
+# Upper bound of a local batch in padded tokens (texts x longest text), so
+# that batches of short chunks are large and batches of long chunks small
+LOCAL_MAX_BATCH_TOKENS = int(os.getenv("LOCAL_MAX_BATCH_TOKENS", 16384))
+
+# Dimension of hash embeddings, the same as Gemini's so offline indexes have the shape of real ones
+HASH_EMBEDDING_DIMENSION = 768
+
+# Artificial delay of every hash embedding call in milliseconds, to imitate the latency of an API
+HASH_EMBEDDING_LATENCY_MS = float(os.getenv("HASH_EMBEDDING_LATENCY_MS", 0))
+
+
+class EmbeddingError(Exception):
+    """
+    An embedding request failed.
+
+    Attributes:
+        status: HTTP status code, or None if no response was received
+        retry_after: Seconds the server asked to wait before retrying, if any
+    """
+
+    def __init__(self, message: str, status: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        """
+        Whether repeating the same request may succeed.
+        """
+        return self.status is None or self.status in RETRYABLE_STATUSES
+
+
+class GeminiEmbedder:
+    """
+    Embed text with the Google Generative AI (Gemini) embedding REST API.
+
+    Documents are sent in batches through ``batchEmbedContents``, one HTTP
+    request per call to ``embed_documents``.
+    """
+
+    def __init__(self, api_key: str = None, model: str = "embedding-001", output_dimensionality: int = None,
+                 base_url: str = GEMINI_API_URL, timeout: float = 60.0):
+        """
+        Initialize the GeminiEmbedder.
+
+        Args:
+            api_key (str): API key for Google Generative AI (defaults to GEMINI_API_KEY)
+            model (str): Name of the Gemini embedding model
+            output_dimensionality (int): Requested vector size for models that
+                support truncated outputs (None keeps the model's default)
+            base_url (str): Root URL of the API, e.g. a local server in tests
+            timeout (float): Timeout of each HTTP request in seconds
+        """
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.model = model
+        self.output_dimensionality = output_dimensionality
+        self._model_path = model if model.startswith('models/') else f"models/{model}"
+        self._client = httpx.Client(base_url=base_url, timeout=timeout)
+
+    def _request(self, text: str, task_type: str) -> Dict[str, Any]:
+        """
+        Build the request body embedding one text.
+        """
+        request = {
+            'model': self._model_path,
+            'content': {'parts': [{'text': text}]},
+            'taskType': task_type.upper()
+        }
+        if self.output_dimensionality:
+            request['outputDimensionality'] = self.output_dimensionality
+        return request
+
+    def _post(self, method: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Call an API method, turning failures into EmbeddingError.
+        """
+        try:
+            response = self._client.post(f"/v1beta/{self._model_path}:{method}", json=body,
+                                         params={'key': self.api_key} if self.api_key else None)
+        except httpx.HTTPError as e:
+            raise EmbeddingError(f"{method} request failed: {e}") from e
+
+        if response.status_code != 200:
+            retry_after = response.headers.get('Retry-After', '')
+            raise EmbeddingError(f"{method} returned HTTP {response.status_code}: {response.text[:200]}",
+                                 status=response.status_code,
+                                 retry_after=float(retry_after) if retry_after.isdigit() else None)
+        return response.json()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunks that are being indexed, in a single batch request.
+
+        Args:
+            texts (List[str]): The chunk texts
+
+        Returns:
+            List[List[float]]: One vector per text
+        """
+        if not texts:
+            return []
+
+        result = self._post('batchEmbedContents',
+                            {'requests': [self._request(text, DOCUMENT_TASK) for text in texts]})
+        embeddings = result.get('embeddings', [])
+        if len(embeddings) != len(texts):
+            raise EmbeddingError(f"batchEmbedContents returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return [embedding['values'] for embedding in embeddings]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a search query.
+
+        Args:
+            text (str): The query text
+
+        Returns:
+            List[float]: The query vector
+        """
+        return self._post('embedContent', self._request(text, QUERY_TASK))['embedding']['values']
+
+    def close(self):
+        """
+        Close the underlying HTTP client.
+        """
+        self._client.close()
+
+
+
+def length_batches(lengths: Sequence[int], max_tokens: int, max_size: int = 256) -> List[List[int]]:
+    """
+    Group texts of similar length into batches under a padded-token budget.
+
+    Texts are sorted by length, so each batch is padded to a length close to
+    that of all its texts, and a batch grows until the number of texts times
+    the longest one would exceed ``max_tokens``.
+
+    Args:
+        lengths: Token count of each text
+        max_tokens: Maximum padded tokens per batch (a longer text gets a batch of its own)
+        max_size: Maximum number of texts per batch
+
+    Returns:
+        List[List[int]]: Positions of the texts in each batch, shortest texts first
+    """
+    batches = []
+    batch = []
+    for position in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # Sorted ascending, so the text being added is the longest of the batch
+        if batch and (len(batch) == max_size or (len(batch) + 1) * lengths[position] > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(position)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+@functools.lru_cache(maxsize=4)
+def _load_local_model(model: str, runtime: str, threads: int):
+    """
+    Load a sentence-transformers model for CPU inference, once per process.
+    """
+    if SentenceTransformer is None:
+        raise ImportError("Please install sentence-transformers to embed locally: "
+                          "pip install 'sentence-transformers[onnx]'")
+
+    if runtime == 'onnx':
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        return SentenceTransformer(model, device='cpu', backend='onnx',
+                                   model_kwargs={'provider': 'CPUExecutionProvider', 'session_options': options})
+
+    import torch
+
+    torch.set_num_threads(threads)
+    return SentenceTransformer(model, device='cpu')
+
+
+@functools.lru_cache(maxsize=None)
+def _model_lock(model: str) -> threading.Lock:
+    """
+    Return the lock serializing the forward passes of a local model.
+    """
+    return threading.Lock()
+
+
+class LocalEmbedder(_EmbeddingsBase):
+    """
+    Embed text with a sentence-transformers model on the CPU.
+
+    Texts are tokenized first and grouped by ``length_batches``, so little
+    compute goes into padding. Forward passes are serialized: the model
+    already spreads one pass over ``threads`` cores, and concurrent callers
+    (e.g. several pipeline workers) would only oversubscribe them. The model
+    is loaded once per process and shared by all LocalEmbedders using it.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODELS['local'], output_dimensionality: int = None,
+                 runtime: str = LOCAL_EMBEDDING_RUNTIME, threads: int = LOCAL_EMBEDDING_THREADS,
+                 max_batch_tokens: int = LOCAL_MAX_BATCH_TOKENS):
+        """
+        Initialize the LocalEmbedder.
+
+        Args:
+            model (str): Name or path of the sentence-transformers model
+            output_dimensionality (int): Number of leading components to keep,
+                for Matryoshka-trained models (None keeps the model's default)
+            runtime (str): 'onnx' for ONNX Runtime or 'torch' for PyTorch
+            threads (int): CPU threads per forward pass
+            max_batch_tokens (int): Maximum padded tokens per forward pass
+        """
+        if runtime not in ('onnx', 'torch'):
+            raise ValueError(f"Unknown runtime '{runtime}'; choose 'onnx' or 'torch'")
+
+        self.model = model
+        self.output_dimensionality = output_dimensionality
+        self.max_batch_tokens = max_batch_tokens
+        self._model = _load_local_model(model, runtime, threads)
+        self._lock = _model_lock(model)
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension of the vectors this embedder returns.
+        """
+        return self.output_dimensionality or self._model.get_sentence_embedding_dimension()
+
+    def _prompt_name(self, task_type: str) -> Optional[str]:
+        """
+        Return the model's prompt for a task (e.g. 'query: ' for E5 models), if it has one.
+        """
+        name = 'query' if task_type == QUERY_TASK else 'document'
+        return name if name in getattr(self._model, 'prompts', {}) else None
+
+    def _encode(self, texts: List[str], task_type: str) -> np.ndarray:
+        """
+        Embed texts into a matrix of normalized float32 vectors, in input order.
+        """
+        matrix = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return matrix
+
+        if len(texts) == 1:
+            # A single query needs no batching, and skipping the extra tokenization keeps it fast
+            batches = [[0]]
+        else:
+            lengths = [len(ids) for ids in self._model.tokenizer(texts, truncation=True,
+                                                                 max_length=self._model.max_seq_length)['input_ids']]
+            batches = length_batches(lengths, self.max_batch_tokens)
+
+        prompt_name = self._prompt_name(task_type)
+        for batch in batches:
+            with self._lock:
+                matrix[batch] = self._model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                                   prompt_name=prompt_name, truncate_dim=self.output_dimensionality,
+                                                   normalize_embeddings=True, convert_to_numpy=True)
+        return matrix
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunks that are being indexed.
+
+        Args:
+            texts (List[str]): The chunk texts
+
+        Returns:
+            List[List[float]]: One normalized vector per text
+        """
+        return self._encode(texts, DOCUMENT_TASK).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a search query.
+
+        Args:
+            text (str): The query text
+
+        Returns:
+            List[float]: The normalized query vector
+        """
+        return self._encode([text], QUERY_TASK)[0].tolist()
+
+    def close(self):
+        """
+        Nothing to release; the model stays loaded for other embedders.
+        """
+
+
+class HashEmbedder(_EmbeddingsBase):
+    """
+    Embed text deterministically by hashing its words into vector components.
+
+    Every word and pair of adjacent words adds +1 or -1 to a component
+    chosen by a stable hash, so texts sharing words get similar vectors and
+    a text gets the same vector in every process. Retrieval works well
+    enough for end-to-end runs without a model, network access or API key.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODELS['hash'], output_dimensionality: int = None,
+                 dimension: int = HASH_EMBEDDING_DIMENSION, latency: float = HASH_EMBEDDING_LATENCY_MS / 1000):
+        """
+        Initialize the HashEmbedder.
+
+        Args:
+            model (str): Name of the embedder, used in cache keys
+            output_dimensionality (int): Number of leading components to keep
+                (None keeps all of them)
+            dimension (int): Number of components hashed into
+            latency (float): Seconds each call waits before returning
+        """
+        self.model = model
+        self.output_dimensionality = output_dimensionality
+        self.full_dimension = dimension
+        self.latency = latency
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension of the vectors this embedder returns.
+        """
+        return self.output_dimensionality or self.full_dimension
+
+    def _vector(self, text: str) -> np.ndarray:
+        """
+        Hash the words of a text into a normalized float32 vector.
+        """
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        vector = np.zeros(self.full_dimension, dtype=np.float32)
+        for feature in features:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector[digest % self.full_dimension] += 1.0 if digest >> 63 else -1.0
+
+        vector = vector[:self.dimension]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunks that are being indexed.
+
+        Args:
+            texts (List[str]): The chunk texts
+
+        Returns:
+            List[List[float]]: One normalized vector per text
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a search query.
+
+        Args:
+            text (str): The query text
+
+        Returns:
+            List[float]: The normalized query vector
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        return self._vector(text).tolist()
+
+    def close(self):
+        """
+        Nothing to release.
+        """
+
+
+def get_embedder(backend: str = EMBEDDING_BACKEND, model: str = None, output_dimensionality: int = None,
+                 api_key: str = None):
+    """
+    Create the embedder of a backend.
+
+    Args:
+        backend (str): One of ``EMBEDDING_BACKENDS``
+        model (str): Name of the model (defaults to the backend's default model)
+        output_dimensionality (int): Reduced vector size (None for the model's full size)
+        api_key (str): API key of the Gemini backend (defaults to GEMINI_API_KEY)
+
+    Returns:
+        A GeminiEmbedder, LocalEmbedder or HashEmbedder
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'; choose from {', '.join(EMBEDDING_BACKENDS)}")
+
+    model = model or DEFAULT_MODELS[backend]
+    if backend == 'local':
+        return LocalEmbedder(model, output_dimensionality=output_dimensionality)
+    if backend == 'hash':
+        return HashEmbedder(model, output_dimensionality=output_dimensionality)
+    return GeminiEmbedder(api_key=api_key, model=model, output_dimensionality=output_dimensionality)
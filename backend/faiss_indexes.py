@@ -0,0 +1,315 @@
+"""
+Compressed and approximate FAISS index types for the LangChain FAISS stores.
+
+LangChain builds a flat index, which compares a query with every vector:
+exact, but memory and query time grow linearly with the corpus. This module
+rebuilds a store's index as IVFFlat, IVFPQ, HNSWFlat or SQ8. Quantizers are
+trained on a random sample of the vectors, ``nlist`` is sized from the
+number of vectors, and the search-time ``nprobe`` (or HNSW ``efSearch``) is
+tuned to the smallest value that reaches a target recall against exact
+search. FAISS stores ``nprobe`` and ``efSearch`` in the index file, so a
+plain ``FAISS.load_local`` searches with the tuned values; the chosen
+parameters and their measured recall are also saved next to the index.
+"""
+
+import json
+import math
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Index types accepted by the indexers' --faiss-index option
+INDEX_TYPES = ('Flat', 'IVFFlat', 'IVFPQ', 'HNSWFlat', 'SQ8')
+
+DEFAULT_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "Flat")
+
+# Recall@10 against exact search that nprobe/efSearch tuning aims for
+TARGET_RECALL = float(os.getenv("FAISS_TARGET_RECALL", 0.95))
+
+# File next to index.faiss that holds the chosen parameters
+PARAMS_FILE = 'index_params.json'
+
+# Fewer training points per centroid than this give poorly placed centroids
+_MIN_POINTS_PER_CENTROID = 39
+
+# Training points per centroid beyond which k-means gains nothing
+_MAX_POINTS_PER_CENTROID = 256
+
+
+class FaissIndexParams(NamedTuple):
+    """
+    Build and search parameters of a FAISS index.
+    """
+    index_type: str
+    dimension: int
+    nlist: int = 0
+    nprobe: int = 0
+    pq_m: int = 0
+    pq_bits: int = 0
+    hnsw_m: int = 0
+    ef_construction: int = 0
+    ef_search: int = 0
+    training_size: int = 0
+    recall: Optional[float] = None
+
+
+def _require_faiss():
+    if faiss is None:
+        raise ImportError("Please install faiss: pip install faiss-cpu")
+
+
+def choose_params(index_type: str, count: int, dimension: int, nlist: int = None,
+                  nprobe: int = None) -> FaissIndexParams:
+    """
+    Size the parameters of an index for a number of vectors.
+
+    Args:
+        index_type: One of ``INDEX_TYPES``
+        count: Number of vectors the index will hold
+        dimension: Dimension of the vectors
+        nlist: Number of IVF cells (defaults to about 4 * sqrt(count))
+        nprobe: Number of IVF cells searched (defaults to a starting point for tuning)
+
+    Returns:
+        FaissIndexParams: The parameters, with the size of the training sample
+
+    Raises:
+        ValueError: If the index type is unknown or there are too few vectors to train it
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'; choose from {', '.join(INDEX_TYPES)}")
+
+    params = FaissIndexParams(index_type=index_type, dimension=dimension)
+    if index_type == 'HNSWFlat':
+        return params._replace(hnsw_m=32, ef_construction=200, ef_search=64)
+    if index_type == 'SQ8':
+        # Only the per-dimension value range is learned
+        return params._replace(training_size=min(count, 65536))
+    if index_type == 'Flat':
+        return params
+
+    if nlist is None:
+        # A power of two near 4 * sqrt(count), with enough points to train every centroid
+        nlist = 2 ** round(math.log2(max(4 * math.sqrt(count), 1)))
+        nlist = max(1, min(nlist, count // _MIN_POINTS_PER_CENTROID))
+    if count < nlist:
+        raise ValueError(f"{index_type} with nlist={nlist} needs at least {nlist} vectors, got {count}")
+
+    params = params._replace(nlist=nlist, nprobe=nprobe or max(1, nlist // 16),
+                             training_size=min(count, nlist * _MAX_POINTS_PER_CENTROID))
+    if index_type == 'IVFPQ':
+        # Sub-vectors of at least 8 dimensions, and 8-bit codes once there are enough points to train them
+        pq_m = max(m for m in range(1, min(64, dimension // 8 or 1) + 1) if dimension % m == 0)
+        pq_bits = min(8, int(math.log2(max(count // _MIN_POINTS_PER_CENTROID, 1))))
+        if pq_bits < 4:
+            raise ValueError(f"IVFPQ needs at least {16 * _MIN_POINTS_PER_CENTROID} vectors to train, got {count}")
+        params = params._replace(pq_m=pq_m, pq_bits=pq_bits, training_size=min(
+            count, max(nlist, 2 ** pq_bits) * _MAX_POINTS_PER_CENTROID))
+    return params
+
+
+def factory_string(params: FaissIndexParams) -> str:
+    """
+    Return the ``faiss.index_factory`` description of an index.
+    """
+    if params.index_type == 'IVFFlat':
+        return f"IVF{params.nlist},Flat"
+    if params.index_type == 'IVFPQ':
+        return f"IVF{params.nlist},PQ{params.pq_m}x{params.pq_bits}"
+    if params.index_type == 'HNSWFlat':
+        return f"HNSW{params.hnsw_m}"
+    return params.index_type
+
+
+def sample_training_set(vectors: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    """
+    Draw a random sample of the vectors to train quantizers on.
+
+    Args:
+        vectors: Matrix of all vectors, one per row
+        size: Number of rows to sample
+        seed: Seed of the random generator, so rebuilds are reproducible
+
+    Returns:
+        np.ndarray: Contiguous float32 matrix of the sampled rows
+    """
+    if size >= len(vectors):
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rows = np.sort(np.random.default_rng(seed).choice(len(vectors), size=size, replace=False))
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int, block_size: int = 65536) -> np.ndarray:
+    """
+    Find the k nearest vectors of each query by L2 distance, block by block.
+
+    Returns:
+        np.ndarray: Row numbers of the neighbours, nearest first, one row per query
+    """
+    k = min(k, len(vectors))
+    query_norms = (queries ** 2).sum(axis=1)[:, None]
+    best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        distances = query_norms - 2 * queries @ block.T + (block ** 2).sum(axis=1)[None, :]
+        rows = np.broadcast_to(np.arange(start, start + len(block)), distances.shape)
+        best_distances = np.concatenate([best_distances, distances], axis=1)
+        best_rows = np.concatenate([best_rows, rows], axis=1)
+        keep = np.argsort(best_distances, axis=1, kind='stable')[:, :k]
+        best_distances = np.take_along_axis(best_distances, keep, axis=1)
+        best_rows = np.take_along_axis(best_rows, keep, axis=1)
+    return best_rows
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """
+    Return the fraction of the true neighbours that were found.
+    """
+    hits = sum(len(set(found_row) & set(truth_row)) for found_row, truth_row in zip(found, truth))
+    return hits / truth.size if truth.size else 1.0
+
+
+def apply_search_params(index, params: FaissIndexParams):
+    """
+    Set the search-time parameters (nprobe or efSearch) of an index.
+    """
+    _require_faiss()
+    space = faiss.ParameterSpace()
+    if params.nlist:
+        space.set_index_parameter(index, 'nprobe', params.nprobe)
+    if params.hnsw_m:
+        space.set_index_parameter(index, 'efSearch', params.ef_search)
+
+
+def build_index(vectors: np.ndarray, params: FaissIndexParams, seed: int = 0):
+    """
+    Train an index on a sample of the vectors and add all of them.
+
+    Args:
+        vectors: float32 matrix of the vectors, in docstore order
+        params: Parameters from ``choose_params``
+        seed: Seed of the training sample
+
+    Returns:
+        The filled FAISS index
+    """
+    _require_faiss()
+    index = faiss.index_factory(params.dimension, factory_string(params), faiss.METRIC_L2)
+    if params.hnsw_m:
+        index.hnsw.efConstruction = params.ef_construction
+    if not index.is_trained:
+        index.train(sample_training_set(vectors, params.training_size, seed))
+    for start in range(0, len(vectors), 65536):
+        index.add(np.ascontiguousarray(vectors[start:start + 65536], dtype=np.float32))
+    apply_search_params(index, params)
+    return index
+
+
+def tune_search(index, vectors: np.ndarray, params: FaissIndexParams, target_recall: float = TARGET_RECALL,
+                k: int = 10, queries: int = 200, seed: int = 0) -> FaissIndexParams:
+    """
+    Choose the smallest nprobe (or efSearch) whose recall@k reaches the target.
+
+    A sample of the indexed vectors is used as queries and compared with
+    exact search; the index is left set to the chosen value.
+
+    Args:
+        index: Index from ``build_index``
+        vectors: The vectors it holds
+        params: Its parameters
+        target_recall: Recall@k to reach
+        k: Number of neighbours compared
+        queries: Number of sample queries
+        seed: Seed of the query sample
+
+    Returns:
+        FaissIndexParams: The parameters with the chosen search setting and its recall
+    """
+    sample = sample_training_set(vectors, queries, seed + 1)
+    truth = exact_neighbors(np.asarray(vectors, dtype=np.float32), sample, k)
+
+    if params.nlist:
+        candidates = [params._replace(nprobe=2 ** i) for i in range(int(math.log2(params.nlist)) + 1)]
+        candidates.append(params._replace(nprobe=params.nlist))
+    elif params.hnsw_m:
+        candidates = [params._replace(ef_search=ef) for ef in (16, 32, 64, 128, 256, 512)]
+    else:
+        candidates = [params]
+
+    results = []
+    for candidate in candidates:
+        apply_search_params(index, candidate)
+        _, found = index.search(sample, truth.shape[1])
+        results.append((candidate, recall_at_k(found, truth)))
+        if results[-1][1] >= target_recall:
+            break
+
+    # Compressed vectors may cap the recall below the target; then searching
+    # more cells only costs time once the recall stops improving
+    best = max(recall for _, recall in results)
+    if best < target_recall:
+        print(f"Recall@{k} of {factory_string(params)} peaks at {best:.3f}, below the target of {target_recall}")
+    chosen, recall = next((candidate, recall) for candidate, recall in results
+                          if recall >= min(target_recall, best - 0.01))
+
+    apply_search_params(index, chosen)
+    return chosen._replace(recall=round(recall, 4))
+
+
+def compress_store(vector_store, index_type: str = DEFAULT_INDEX_TYPE, target_recall: float = TARGET_RECALL,
+                   nlist: int = None, nprobe: int = None) -> FaissIndexParams:
+    """
+    Replace the flat index of a LangChain FAISS store with another index type.
+
+    Vectors keep their positions, so the store's docstore mapping stays valid.
+
+    Args:
+        vector_store: LangChain FAISS store with a flat index
+        index_type: One of ``INDEX_TYPES``
+        target_recall: Recall@10 that nprobe/efSearch tuning aims for
+        nlist: Number of IVF cells (sized automatically if None)
+        nprobe: Fixed number of IVF cells searched (tuned if None)
+
+    Returns:
+        FaissIndexParams: The parameters of the new index
+    """
+    flat = vector_store.index
+    params = choose_params(index_type, flat.ntotal, flat.d, nlist=nlist, nprobe=nprobe)
+    if index_type == 'Flat':
+        return params
+
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+    index = build_index(vectors, params)
+    if nprobe is None:
+        params = tune_search(index, vectors, params, target_recall)
+    vector_store.index = index
+
+    print(f"Built {factory_string(params)} index over {flat.ntotal} vectors "
+          f"(nprobe={params.nprobe}, efSearch={params.ef_search}, recall@10={params.recall})")
+    return params
+
+
+def save_params(path: str, params: FaissIndexParams):
+    """
+    Write the parameters of an index next to it.
+    """
+    with open(os.path.join(path, PARAMS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(params._asdict(), f, indent=1)
+
+
+def load_params(path: str) -> Optional[FaissIndexParams]:
+    """
+    Read the parameters saved next to an index, or None for a plain flat index.
+    """
+    params_path = os.path.join(path, PARAMS_FILE)
+    if not os.path.exists(params_path):
+        return None
+    with open(params_path, 'r', encoding='utf-8') as f:
+        return FaissIndexParams(**json.load(f))
@@ -0,0 +1,105 @@
+"""
+Answer generation for the RAG API.
+
+The 'gemini' backend calls a Gemini model through google-generativeai. The
+'stub' backend answers without network access or an API key: it waits as
+long as a real model would (a time to the first token plus a time per
+generated token) and returns a deterministic answer, so the full request
+path can be profiled and load-tested offline.
+"""
+
+import os
+import time
+from typing import Callable, NamedTuple
+
+# Names accepted by get_generative_model, and the backend used when none is given
+GENERATION_BACKENDS = ('gemini', 'stub')
+GENERATION_BACKEND = os.getenv("GENERATION_BACKEND", "gemini")
+
+# Model answering RAG queries
+GENERATION_MODEL = os.getenv("GENERATION_MODEL", "gemini-pro")
+
+# Artificial latency of the stub in milliseconds: before the first token, and per token after it
+STUB_FIRST_TOKEN_MS = float(os.getenv("STUB_FIRST_TOKEN_MS", 400))
+STUB_TOKEN_MS = float(os.getenv("STUB_TOKEN_MS", 10))
+
+# Number of words in a stub answer
+STUB_ANSWER_TOKENS = int(os.getenv("STUB_ANSWER_TOKENS", 120))
+
+
+class StubResponse(NamedTuple):
+    """
+    Response of the stub model, with the ``text`` attribute of a Gemini response.
+    """
+    text: str
+
+
+class StubGenerativeModel:
+    """
+    Stand-in for ``genai.GenerativeModel`` with realistic timing and no network access.
+
+    The answer repeats the first words of the prompt after its 'Context'
+    heading, so it depends on what was retrieved, and the same prompt
+    always gets the same answer.
+    """
+
+    def __init__(self, model: str = GENERATION_MODEL, first_token_latency: float = STUB_FIRST_TOKEN_MS / 1000,
+                 token_latency: float = STUB_TOKEN_MS / 1000, answer_tokens: int = STUB_ANSWER_TOKENS,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the StubGenerativeModel.
+
+        Args:
+            model (str): Name of the model it stands in for, quoted in answers
+            first_token_latency (float): Seconds before the first token
+            token_latency (float): Seconds per generated token after the first
+            answer_tokens (int): Maximum number of words in an answer
+            sleep: Function used to wait
+        """
+        self.model = model
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        self._sleep = sleep
+
+    def generate_content(self, prompt: str) -> StubResponse:
+        """
+        Answer a prompt after the time a real model would take.
+
+        Args:
+            prompt (str): The prompt
+
+        Returns:
+            StubResponse: The answer
+        """
+        _, _, context = prompt.partition('Context')
+        words = (context or prompt).split()[:self.answer_tokens]
+        self._sleep(self.first_token_latency + self.token_latency * max(len(words) - 1, 0))
+        return StubResponse(f"[{self.model} stub] " + ' '.join(words))
+
+
+def get_generative_model(backend: str = GENERATION_BACKEND, model: str = GENERATION_MODEL, api_key: str = None):
+    """
+    Create the model generating answers.
+
+    Args:
+        backend (str): One of ``GENERATION_BACKENDS``
+        model (str): Name of the Gemini model
+        api_key (str): API key of the Gemini backend (defaults to GEMINI_API_KEY)
+
+    Returns:
+        A model whose ``generate_content(prompt)`` returns a response with ``text``
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend not in GENERATION_BACKENDS:
+        raise ValueError(f"Unknown generation backend '{backend}'; choose from {', '.join(GENERATION_BACKENDS)}")
+
+    if backend == 'stub':
+        return StubGenerativeModel(model)
+
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(model)
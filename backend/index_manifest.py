@@ -0,0 +1,238 @@
+"""
+Manifest of what has been indexed, for incremental re-indexing.
+
+This module provides the IndexManifest class which records, for every
+indexed file, its content hash and the point IDs and content hashes of its
+chunks. Diffing the manifest against the current documents tells the
+indexer which files to re-chunk and which points to upsert or delete.
+
+Point IDs are UUIDv5 values derived from the source path, the chunk hash and
+the chunker version, so uploading the same chunk twice (a retry, a resumed
+run or two indexers racing) overwrites one point instead of duplicating it.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from context7 import CHUNKER_VERSION
+
+# Version 1 manifests held sequential integer point IDs
+MANIFEST_VERSION = 2
+
+# Namespace of the UUIDv5 point IDs; changing it re-keys every point
+POINT_ID_NAMESPACE = uuid.UUID('5b0d4c8e-3f0a-5e7c-9a51-6c1d2e7f4a90')
+
+
+def chunk_hash(content: str) -> str:
+    """
+    Hash the content of a chunk.
+
+    Args:
+        content (str): The chunk text
+
+    Returns:
+        str: Hex SHA-256 digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def derive_point_ids(file_path: str, hashes: Sequence[str], chunker_version: str = CHUNKER_VERSION) -> List[str]:
+    """
+    Derive the point IDs of a file's chunks from their identity.
+
+    Args:
+        file_path (str): The file the chunks belong to
+        hashes (Sequence[str]): Content hash of each chunk, from ``chunk_hash``
+        chunker_version (str): Version of the chunker that produced them
+
+    Returns:
+        List[str]: One UUID per chunk; a hash repeated within the file gets a
+        distinct ID for each occurrence
+    """
+    seen = {}
+    ids = []
+    for digest in hashes:
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        name = f"{file_path}\0{digest}\0{chunker_version}"
+        if occurrence:
+            name += f"\0{occurrence}"
+        ids.append(str(uuid.uuid5(POINT_ID_NAMESPACE, name)))
+    return ids
+
+
+class ManifestDiff(NamedTuple):
+    """
+    Changes between the manifest and the documents found on disk.
+    """
+    added: List[Dict[str, Any]]
+    changed: List[Dict[str, Any]]
+    unchanged: List[Dict[str, Any]]
+    removed: List[str]
+
+
+class IndexManifest:
+    """
+    JSON record of indexed files and the points their chunks were stored as.
+
+    A manifest is only valid for the settings it was built with (chunking
+    parameters, embedding model, collection); ``load`` discards a manifest
+    whose settings differ, which turns the next run into a full rebuild.
+    """
+
+    def __init__(self, path: str, settings: Dict[str, Any] = None):
+        """
+        Initialize an empty IndexManifest.
+
+        Args:
+            path (str): File the manifest is saved to
+            settings (Dict[str, Any]): Settings the index is built with
+        """
+        self.path = path
+        self.settings = dict(settings or {})
+        self.files: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, path: str, settings: Dict[str, Any] = None) -> 'IndexManifest':
+        """
+        Load a manifest, or start an empty one if it is missing or stale.
+
+        Args:
+            path (str): File the manifest is saved to
+            settings (Dict[str, Any]): Settings the index is built with now
+
+        Returns:
+            IndexManifest: The saved manifest if it matches ``settings``,
+            otherwise an empty manifest for them
+        """
+        manifest = cls(path, settings)
+        if not os.path.exists(path):
+            return manifest
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        if data.get('version') != MANIFEST_VERSION or data.get('settings') != manifest.settings:
+            return manifest
+
+        manifest.files = data.get('files', {})
+        return manifest
+
+    def save(self):
+        """
+        Write the manifest atomically, so a crash never leaves a truncated file.
+        """
+        partial = self.path + '.tmp'
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'settings': self.settings, 'files': self.files}, f, indent=1)
+        os.replace(partial, self.path)
+
+    def diff(self, documents: Sequence[Dict[str, Any]]) -> ManifestDiff:
+        """
+        Compare the manifest with the documents currently on disk.
+
+        Args:
+            documents: Documents with ``file_path`` and a content hash in ``id``
+
+        Returns:
+            ManifestDiff: Documents that are new, changed or unchanged, and
+            the file paths that no longer exist
+        """
+        added, changed, unchanged = [], [], []
+        for doc in documents:
+            entry = self.files.get(doc['file_path'])
+            if entry is None:
+                added.append(doc)
+            elif entry['hash'] != doc['id']:
+                changed.append(doc)
+            else:
+                unchanged.append(doc)
+
+        present = {doc['file_path'] for doc in documents}
+        removed = [file_path for file_path in self.files if file_path not in present]
+
+        # Chunks deduplicated onto a changed or removed file lose their point with
+        # it, so the files they came from have to be re-indexed as well
+        affected = set()
+        for file_path in [doc['file_path'] for doc in changed] + removed:
+            affected.update(self.files[file_path].get('alias_files', ()))
+        changed.extend(doc for doc in unchanged if doc['file_path'] in affected)
+        unchanged = [doc for doc in unchanged if doc['file_path'] not in affected]
+
+        return ManifestDiff(added, changed, unchanged, removed)
+
+    def assign_ids(self, file_path: str, hashes: Sequence[str]) -> Tuple[List[str], List[str]]:
+        """
+        Choose point IDs for the new chunks of a file.
+
+        IDs are derived with ``derive_point_ids``, so a chunk that was already
+        indexed for this file maps to its existing point, which is
+        overwritten in place.
+
+        Args:
+            file_path (str): The file the chunks belong to
+            hashes (Sequence[str]): Content hash of each chunk, from ``chunk_hash``
+
+        Returns:
+            Tuple[List[str], List[str]]: The ID of each chunk, and the IDs of
+            the file's previous chunks that are no longer used
+        """
+        ids = derive_point_ids(file_path, hashes)
+        current = set(ids)
+        stale = [chunk['id'] for chunk in self.files.get(file_path, {}).get('chunks', [])
+                 if chunk['id'] not in current]
+        return ids, stale
+
+    def update_file(self, file_path: str, file_hash: Optional[str], ids: Sequence[str], hashes: Sequence[str],
+                    alias_files: Sequence[str] = ()):
+        """
+        Record the chunks now stored for a file.
+
+        Args:
+            file_path (str): The indexed file
+            file_hash (Optional[str]): Content hash of the file, or None if some
+                of its chunks could not be indexed (so the next run retries it)
+            ids (Sequence[str]): Point IDs of the stored chunks
+            hashes (Sequence[str]): Content hashes of the stored chunks
+            alias_files (Sequence[str]): Other files whose duplicate chunks are
+                only stored as aliases of this file's points
+        """
+        self.files[file_path] = {
+            'hash': file_hash,
+            'chunks': [{'id': point_id, 'hash': digest} for point_id, digest in zip(ids, hashes)],
+            'alias_files': list(alias_files)
+        }
+
+    def add_alias_files(self, file_path: str, alias_files: Iterable[str]):
+        """
+        Record more files whose duplicate chunks are stored as aliases of this file's points.
+
+        Args:
+            file_path (str): An indexed file
+            alias_files (Iterable[str]): The files with duplicates of its chunks
+        """
+        entry = self.files.get(file_path)
+        if entry is not None:
+            entry['alias_files'] = sorted(set(entry['alias_files']).union(alias_files) - {file_path})
+
+    def remove_file(self, file_path: str) -> List[str]:
+        """
+        Forget a file.
+
+        Args:
+            file_path (str): The file that no longer exists
+
+        Returns:
+            List[str]: The point IDs of its chunks, which should be deleted
+        """
+        entry = self.files.pop(file_path, {'chunks': []})
+        return [chunk['id'] for chunk in entry['chunks']]
+
+    def point_count(self) -> int:
+        """
+        Return the number of points the manifest knows about.
+        """
+        return sum(len(entry['chunks']) for entry in self.files.values())
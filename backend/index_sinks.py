@@ -0,0 +1,402 @@
+"""
+Destinations for embedded chunks.
+
+The indexer chunks and embeds the corpus once and hands every document's
+chunks to each selected sink: a Qdrant collection, a LangChain FAISS store
+or a NumPy/Parquet snapshot. Sinks receive chunks as ``ChunkTable`` rows
+with their vectors and point IDs, so the same pass can feed all of them.
+"""
+
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from qdrant_client.http import models
+
+from context7 import ChunkTable
+from faiss_indexes import DEFAULT_INDEX_TYPE, TARGET_RECALL, compress_store, save_params
+from index_manifest import chunk_hash, derive_point_ids
+from qdrant_collections import (create_versioned_collection, finish_bulk_load, garbage_collect_versions,
+                                switch_alias, verify_collection)
+from qdrant_profiles import DEFAULT_PROFILE
+from snapshot import PayloadWriter, write_snapshot
+
+# Names accepted by the indexer's --sinks option
+SINK_NAMES = ('qdrant', 'faiss', 'snapshot')
+
+
+def chunk_point_ids(chunked_docs: ChunkTable) -> List[str]:
+    """
+    Derive the point ID of every chunk from its file path and content.
+
+    Args:
+        chunked_docs: ChunkTable of chunked documents
+
+    Returns:
+        One UUID string per chunk, independent of the order of the chunks
+    """
+    rows_by_file = {}
+    for row, doc in enumerate(chunked_docs):
+        rows_by_file.setdefault(doc['file_path'], []).append(row)
+
+    point_ids = [None] * len(chunked_docs)
+    for file_path, rows in rows_by_file.items():
+        hashes = [chunk_hash(chunked_docs[row]['content']) for row in rows]
+        for row, point_id in zip(rows, derive_point_ids(file_path, hashes)):
+            point_ids[row] = point_id
+    return point_ids
+
+
+def chunk_payload(doc) -> Dict[str, Any]:
+    """
+    Build the payload stored with a chunk's vector.
+
+    Args:
+        doc: A ChunkTable row
+
+    Returns:
+        The chunk text, its position and the metadata of its document
+    """
+    return {
+        'content': doc['content'],
+        'original_id': doc['original_id'],
+        'start': doc['start'],
+        'end': doc['end'],
+        'heading_path': doc['heading_path'],
+        'token_count': doc['token_count'],
+        'aliases': doc['aliases'],
+        'file_path': doc['file_path'],
+        'title': doc['title'],
+        'source': doc['source']
+    }
+
+
+class IndexSink:
+    """
+    Base class of the indexer's destinations.
+
+    ``write`` may be called from several threads at once. Vectors arrive as
+    one contiguous, normalized float32 matrix per document. Sinks that are not
+    ``incremental`` are rebuilt from every document on each run; incremental
+    sinks keep their contents and only receive new and changed documents.
+    The snapshot sink saves ``projection``, if set, so that queries can be
+    reduced like the stored vectors.
+    """
+
+    name = 'sink'
+    incremental = False
+    projection = None
+
+    def write(self, chunks: ChunkTable, embeddings: np.ndarray, point_ids: Sequence[str]):
+        """
+        Store the chunks of one document.
+
+        Args:
+            chunks: The document's unique chunks
+            embeddings: float32 matrix with the vector of each chunk as a row
+            point_ids: ID of each chunk, from ``chunk_point_ids``
+        """
+        raise NotImplementedError
+
+    def add_aliases(self, aliases: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Set[str]]:
+        """
+        Add duplicates found after their representative was written to its 'aliases'.
+
+        Args:
+            aliases: Alias entries to add, by ID of the representative
+
+        Returns:
+            The files of the new aliases, by file of the representative
+        """
+        return {}
+
+    def finish(self) -> bool:
+        """
+        Make the written chunks available once every document has been written.
+
+        Returns:
+            bool: Whether the sink was completed successfully
+        """
+        return True
+
+
+class QdrantSink(IndexSink):
+    """
+    Upsert chunks into a Qdrant collection behind an alias.
+
+    Full rebuilds go into a new versioned collection that ``finish`` checks
+    and switches the alias to; incremental runs update the live collection
+    through the alias.
+    """
+
+    name = 'qdrant'
+    incremental = True
+
+    def __init__(self, client, alias: str, vector_size: int, batch_size: int = 64, profile: str = DEFAULT_PROFILE):
+        """
+        Initialize the QdrantSink.
+
+        Args:
+            client: Qdrant client instance
+            alias: Name of the alias searches use
+            vector_size: Dimension of the vectors
+            batch_size: Number of points per upload request
+            profile: Collection profile new versions are created with
+        """
+        self.client = client
+        self.alias = alias
+        self.vector_size = vector_size
+        self.batch_size = batch_size
+        self.profile = profile
+        self.collection_name = alias
+        self.rebuild = False
+        self.probe: Optional[Tuple[str, List[float]]] = None
+        self.expected_points: Optional[int] = None
+
+    def begin(self, rebuild: bool, collection_name: str = None):
+        """
+        Choose the collection to write to.
+
+        Args:
+            rebuild: Build a new collection version instead of updating the live one
+            collection_name: Collection of an interrupted run to continue writing to
+        """
+        self.rebuild = rebuild
+        if collection_name is not None:
+            self.collection_name = collection_name
+        elif rebuild:
+            self.collection_name = create_versioned_collection(self.client, self.alias, self.vector_size,
+                                                               profile=self.profile)
+        else:
+            # Incremental upserts and deletes go through the alias to the live collection
+            self.collection_name = self.alias
+
+    def write(self, chunks: ChunkTable, embeddings: np.ndarray, point_ids: Sequence[str]):
+        """
+        Upsert the chunks of one document.
+
+        Points are upserted under IDs derived from the chunks, so repeating an
+        upload (after a failure, or from a concurrent run) replaces the same
+        points instead of adding duplicates. The matrix is uploaded column-wise
+        (vectors, payloads and IDs side by side), sliced into batches without
+        building a point object per chunk. The upload waits until the points
+        are applied, so ``add_aliases`` can read them back right away.
+        """
+        print(f"Uploading {len(chunks)} documents to Qdrant collection: {self.collection_name}")
+        self.client.upload_collection(collection_name=self.collection_name, vectors=embeddings,
+                                      payload=(chunk_payload(doc) for doc in chunks), ids=list(point_ids),
+                                      batch_size=self.batch_size, wait=True)
+        print(f"Successfully uploaded {len(chunks)} documents to Qdrant")
+
+    def add_aliases(self, aliases: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Set[str]]:
+        alias_files = {}
+        if not aliases:
+            return alias_files
+
+        # Representatives that could not be embedded have no point; their duplicates are lost with them
+        for point in self.client.retrieve(collection_name=self.collection_name, ids=list(aliases), with_payload=True):
+            added = aliases[str(point.id)]
+            self.client.set_payload(collection_name=self.collection_name,
+                                    payload={'aliases': point.payload.get('aliases', []) + added},
+                                    points=[point.id])
+            alias_files.setdefault(point.payload['file_path'], set()).update(
+                alias['file_path'] for alias in added if alias.get('file_path'))
+        return alias_files
+
+    def delete(self, point_ids: List[str]):
+        """
+        Delete the points of chunks that no longer exist.
+
+        Args:
+            point_ids: IDs of the points to delete
+        """
+        if not point_ids:
+            return
+
+        self.client.delete(collection_name=self.collection_name,
+                           points_selector=models.PointIdsList(points=point_ids))
+        print(f"Deleted {len(point_ids)} stale documents from Qdrant")
+
+    def finish(self) -> bool:
+        """
+        Check a rebuilt collection and make it live.
+
+        Set ``expected_points`` (and optionally ``probe``, the ID and vector
+        of an uploaded point) before calling. A collection that fails the
+        check is deleted and the alias keeps pointing at the old version.
+        """
+        if not self.rebuild:
+            return True
+
+        try:
+            finish_bulk_load(self.client, self.collection_name)
+            verify_collection(self.client, self.collection_name, self.expected_points, *(self.probe or (None, None)))
+        except Exception as e:
+            print(f"Sanity check of '{self.collection_name}' failed, keeping the live index: {str(e)}")
+            self.client.delete_collection(self.collection_name)
+            return False
+
+        switch_alias(self.client, self.alias, self.collection_name)
+        garbage_collect_versions(self.client, self.alias)
+        return True
+
+
+class FaissSink(IndexSink):
+    """
+    Build a LangChain FAISS store, saved like the one from index_textbook.
+    """
+
+    name = 'faiss'
+
+    def __init__(self, path: str, embedder, index_type: str = DEFAULT_INDEX_TYPE,
+                 target_recall: float = TARGET_RECALL):
+        """
+        Initialize the FaissSink.
+
+        Args:
+            path: Directory the store is saved to
+            embedder: Embedder the store uses for queries
+            index_type: FAISS index the flat store is rebuilt as before saving
+            target_recall: Recall@10 that nprobe/efSearch tuning aims for
+        """
+        try:
+            from langchain_community.vectorstores import FAISS
+        except ImportError:
+            raise ImportError("The FAISS sink needs langchain-community and faiss-cpu: "
+                              "pip install langchain-community faiss-cpu")
+
+        self._faiss = FAISS
+        self.path = path
+        self.embedder = embedder
+        self.index_type = index_type
+        self.target_recall = target_recall
+        self.vector_store = None
+        self._lock = threading.Lock()
+
+    def write(self, chunks: ChunkTable, embeddings: np.ndarray, point_ids: Sequence[str]):
+        # Rows are views of the matrix, which LangChain stacks into the index again
+        text_embeddings = [(doc['content'], embedding) for doc, embedding in zip(chunks, embeddings)]
+        metadatas = [chunk_payload(doc) for doc in chunks]
+        for metadata in metadatas:
+            # LangChain keeps the text in page_content
+            del metadata['content']
+
+        with self._lock:
+            if self.vector_store is None:
+                self.vector_store = self._faiss.from_embeddings(text_embeddings, self.embedder,
+                                                                metadatas=metadatas, ids=list(point_ids))
+            else:
+                self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=list(point_ids))
+
+    def add_aliases(self, aliases: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Set[str]]:
+        with self._lock:
+            for point_id, added in aliases.items():
+                doc = self.vector_store.docstore.search(point_id) if self.vector_store else None
+                if doc is not None and not isinstance(doc, str):
+                    doc.metadata['aliases'] = doc.metadata.get('aliases', []) + added
+        return {}
+
+    def finish(self) -> bool:
+        if self.vector_store is None:
+            print("No chunks were written to the FAISS store")
+            return False
+
+        params = compress_store(self.vector_store, self.index_type, self.target_recall)
+        self.vector_store.save_local(self.path)
+        save_params(self.path, params)
+        print(f"FAISS index saved to '{self.path}'")
+        return True
+
+
+class SnapshotSink(IndexSink):
+    """
+    Write a portable snapshot: a NumPy ``.npy`` matrix of the vectors, a
+    Parquet table of the payloads and a manifest (see ``snapshot``).
+
+    Vectors are appended to a raw float32 file as documents arrive and only
+    copied into the ``.npy`` file at the end, and payloads are written to the
+    Parquet table in row groups, so neither is ever all held in memory. The
+    snapshot is built next to the previous one and replaces it once it is
+    complete.
+    """
+
+    name = 'snapshot'
+
+    def __init__(self, path: str, metadata: Dict[str, Any] = None):
+        """
+        Initialize the SnapshotSink.
+
+        Args:
+            path: Directory the snapshot is written to
+            metadata: Manifest entries describing how the index was built,
+                e.g. the embedding model and the index settings
+        """
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.dimension = None
+        # Row of each point ID, for add_aliases
+        self._rows: Dict[str, int] = {}
+        # One payload per document, for the corpus hash
+        self._documents: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        self._partial_path = path.rstrip(os.sep) + '.partial'
+        shutil.rmtree(self._partial_path, ignore_errors=True)
+        os.makedirs(self._partial_path)
+        self._raw_path = os.path.join(self._partial_path, 'vectors.f32')
+        self._raw = open(self._raw_path, 'wb')
+        self._payloads = PayloadWriter(self._partial_path)
+
+    def write(self, chunks: ChunkTable, embeddings: np.ndarray, point_ids: Sequence[str]):
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Got {vectors.shape[1]}-dimensional vectors, expected {self.dimension}")
+
+            self._raw.write(vectors.tobytes())
+            for row, point_id in enumerate(point_ids, self._payloads.count):
+                self._rows[point_id] = row
+            payloads = [chunk_payload(doc) for doc in chunks]
+            for payload in payloads:
+                self._documents.setdefault((payload['file_path'], str(payload['original_id'])),
+                                           {'file_path': payload['file_path'], 'original_id': payload['original_id']})
+            self._payloads.write(point_ids, payloads)
+
+    def add_aliases(self, aliases: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Set[str]]:
+        if not aliases:
+            return {}
+
+        with self._lock:
+            for point_id, added in aliases.items():
+                row = self._rows.get(point_id)
+                if row is not None:
+                    self._payloads.add_aliases(row, added)
+        return {}
+
+    def finish(self) -> bool:
+        self._raw.close()
+        self._payloads.close()
+        if not self._payloads.count:
+            shutil.rmtree(self._partial_path, ignore_errors=True)
+            print("No chunks were written to the snapshot")
+            return False
+
+        write_snapshot(self._partial_path, self._raw_path, self.dimension, self._payloads.count,
+                       list(self._documents.values()), self.metadata, self.projection)
+        os.remove(self._raw_path)
+
+        # Swap the directories, so readers never see a half-written snapshot under the final name
+        previous = self.path.rstrip(os.sep) + '.previous'
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.rename(self.path, previous)
+        os.rename(self._partial_path, self.path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        print(f"Snapshot of {self._payloads.count} chunks written to '{self.path}'")
+        return True
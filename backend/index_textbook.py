@@ -5,17 +5,24 @@ into a FAISS vector database for RAG functionality.
 This script:
 1. Finds all Markdown files in the 'docs/' directory
 2. Uses LangChain to load and chunk the Markdown documents
-3. Generates embeddings using Google Generative AI (Gemini) SDK
-4. Creates a FAISS vector store and saves it locally
+3. Generates embeddings using Google Generative AI (Gemini) SDK, or a
+   local CPU model with --embedding-backend local
+4. Creates a FAISS vector store, optionally rebuilt as a compressed or
+   approximate index (--index-type), and saves it locally
 5. Uploads all chunked, embedded documents to the FAISS store
+
+The partially built store is checkpointed while embedding; after a crash,
+run with --resume to continue from the last checkpoint.
+
+To build the FAISS store from the same Context7 chunks and embedding pass
+as the Qdrant collection, run ``index_book.py --sinks qdrant,faiss`` instead.
 """
 
 import os
 import glob
-from typing import List, Dict
-import hashlib
-from pathlib import Path
-import pickle
+import argparse
+from typing import List
+import shutil
 
 # Import required libraries
 try:
@@ -27,6 +34,15 @@ try:
 except ImportError:
     raise ImportError("Please install langchain libraries: pip install langchain langchain-community langchain-google-genai langchain-text-splitters")
 
+from checkpoint import Checkpoint
+from embedding_cache import CachedEmbedder
+from embeddings import DEFAULT_MODELS, EMBEDDING_BACKEND, EMBEDDING_BACKENDS, get_embedder
+from faiss_indexes import DEFAULT_INDEX_TYPE, INDEX_TYPES, TARGET_RECALL, compress_store, save_params
+from index_manifest import chunk_hash, derive_point_ids
+
+INDEX_PATH = "faiss_index_embodied_intelligence"
+CHECKPOINT_PATH = "faiss_index_checkpoint.json"
+
 def load_markdown_files(docs_dir: str) -> List[Document]:
     """
     Find and load all Markdown files in the specified directory.
@@ -51,8 +67,8 @@ def load_markdown_files(docs_dir: str) -> List[Document]:
     for pattern in markdown_patterns:
         all_files.extend(glob.glob(pattern, recursive=True))
     
-    # Remove duplicates
-    all_files = list(set(all_files))
+    # Remove duplicates; a stable order keeps chunk positions the same between runs
+    all_files = sorted(set(all_files))
     
     print(f"Found {len(all_files)} Markdown files")
     
@@ -107,38 +123,164 @@ def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_ove
     print(f"Created {len(chunked_docs)} chunks from {len(documents)} documents")
     return chunked_docs
 
-def create_faiss_index(chunked_docs: List[Document], embeddings_model: str = "embedding-001"):
+def chunk_ids(chunked_docs: List[Document]) -> List[str]:
     """
-    Create FAISS index from chunked documents using Google Generative AI embeddings.
-    
+    Derive a stable ID for every chunk from its file and content.
+
     Args:
         chunked_docs: List of chunked document pieces
-        embeddings_model: Name of the Google embeddings model to use
-        
+
+    Returns:
+        One UUID string per chunk, the same in every run over the same files
+    """
+    positions_by_file = {}
+    for position, doc in enumerate(chunked_docs):
+        positions_by_file.setdefault(doc.metadata['file_path'], []).append(position)
+
+    ids = [None] * len(chunked_docs)
+    for file_path, positions in positions_by_file.items():
+        hashes = [chunk_hash(chunked_docs[position].page_content) for position in positions]
+        for position, chunk_id in zip(positions, derive_point_ids(file_path, hashes)):
+            ids[position] = chunk_id
+    return ids
+
+def create_faiss_index(chunked_docs: List[Document], embeddings_model: str = "embedding-001",
+                       checkpoint: Checkpoint = None, resume: bool = False, batch_size: int = 256,
+                       backend: str = 'gemini'):
+    """
+    Create FAISS index from chunked documents using Google Generative AI or local embeddings.
+
+    Chunks are embedded and added in batches. With a checkpoint, the chunks
+    added since the last checkpoint are saved periodically, and when the run
+    is interrupted, as a new shard of the partial store; ``resume`` merges the
+    shards and continues from there instead of starting over.
+
+    Args:
+        chunked_docs: List of chunked document pieces
+        embeddings_model: Name of the embeddings model to use
+        checkpoint: Checkpoint to write progress to (None disables checkpointing)
+        resume: Continue from the last checkpoint, if there is one
+        batch_size: Number of chunks embedded and added at a time
+        backend: 'gemini' for Google Generative AI, 'local' for a CPU model or
+            'hash' for deterministic offline vectors
+
     Returns:
         FAISS vector store
     """
     print(f"Creating FAISS index with {len(chunked_docs)} chunks using {embeddings_model} embeddings...")
-    
-    # Get API key from environment variable
-    import os
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        raise ValueError("GEMINI_API_KEY environment variable is not set")
-    
-    # Initialize Google Generative AI embeddings
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model=embeddings_model,
-        google_api_key=gemini_api_key
-    )
-    
-    # Create FAISS vector store from documents and embeddings
-    vector_store = FAISS.from_documents(
-        chunked_docs,
-        embeddings
-    )
-    
-    print(f"FAISS index created successfully with {len(chunked_docs)} documents")
+
+    if backend != 'gemini':
+        # Local embedders need no API key; the cache hands them whole batches
+        embeddings = CachedEmbedder(get_embedder(backend, embeddings_model), batch_size=batch_size)
+    else:
+        # Get API key from environment variable
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is not set")
+
+        # Initialize Google Generative AI embeddings, served from the persistent
+        # embedding cache for chunks that were embedded before
+        embeddings = CachedEmbedder(
+            GoogleGenerativeAIEmbeddings(
+                model=embeddings_model,
+                google_api_key=gemini_api_key
+            ),
+            model=embeddings_model
+        )
+
+    vector_store = None
+    done = set()
+    shards = []
+    state = checkpoint.load() if checkpoint and resume else None
+    if state is not None:
+        shards = list(state['shards'])
+        vector_store = load_checkpoint(state, embeddings)
+        done = set(vector_store.index_to_docstore_id.values())
+        print(f"Resuming from checkpoint with {len(done)} chunks already indexed")
+
+    # Chunks added to the store since the last checkpoint
+    unsaved = []
+    pending = [(chunk_id, doc) for chunk_id, doc in zip(chunk_ids(chunked_docs), chunked_docs) if chunk_id not in done]
+    try:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            texts = [doc.page_content for _, doc in batch]
+            vectors, rows = embeddings.embed_array(texts)
+            added = [(batch[row][0], batch[row][1], texts[row], vector) for row, vector in zip(rows, vectors)]
+            if added:
+                text_embeddings = [(text, vector) for _, _, text, vector in added]
+                metadatas = [doc.metadata for _, doc, _, _ in added]
+                ids = [chunk_id for chunk_id, _, _, _ in added]
+                if vector_store is None:
+                    vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+                else:
+                    vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+                done.update(ids)
+                unsaved.extend(added)
+
+            print(f"Indexed {len(done)}/{len(chunked_docs)} chunks")
+            if checkpoint and checkpoint.due():
+                save_checkpoint(unsaved, embeddings, checkpoint, shards)
+                unsaved = []
+    except BaseException:
+        # Keep what was embedded before the interruption for --resume
+        if checkpoint:
+            save_checkpoint(unsaved, embeddings, checkpoint, shards)
+        raise
+
+    if vector_store is None:
+        raise ValueError("No chunks could be embedded")
+
+    print(f"FAISS index created successfully with {len(done)} documents "
+          f"({embeddings.hits} embeddings from cache, {embeddings.misses} computed)")
+    return vector_store
+
+def save_checkpoint(unsaved, embeddings, checkpoint: Checkpoint, shards: List[str]):
+    """
+    Save the chunks added since the last checkpoint as a new shard of the partial store.
+
+    Only the new vectors are written, so a checkpoint costs the same however
+    large the store has grown. The shard is listed in the checkpoint only
+    once its files are written, so a crash while saving leaves the previous
+    checkpoint valid.
+
+    Args:
+        unsaved: (chunk ID, document, text, vector) of the chunks added since the last checkpoint
+        embeddings: Embeddings of the store
+        checkpoint: Checkpoint to write
+        shards: Index names of the saved shards; the new shard is appended
+    """
+    if not unsaved:
+        return
+
+    path = checkpoint.path + '.d'
+    index_name = f"shard_{len(shards)}"
+    shard = FAISS.from_embeddings([(text, vector) for _, _, text, vector in unsaved], embeddings,
+                                  metadatas=[doc.metadata for _, doc, _, _ in unsaved],
+                                  ids=[chunk_id for chunk_id, _, _, _ in unsaved])
+    shard.save_local(path, index_name=index_name)
+    shards.append(index_name)
+    checkpoint.save({'path': path, 'shards': shards})
+
+def load_checkpoint(state, embeddings):
+    """
+    Merge the shards of a checkpoint back into one FAISS store.
+
+    Args:
+        state: State of the checkpoint
+        embeddings: Embeddings of the store
+
+    Returns:
+        FAISS vector store holding every checkpointed chunk
+    """
+    vector_store = None
+    for index_name in state['shards']:
+        shard = FAISS.load_local(state['path'], embeddings, index_name=index_name,
+                                 allow_dangerous_deserialization=True)
+        if vector_store is None:
+            vector_store = shard
+        else:
+            vector_store.merge_from(shard)
     return vector_store
 
 def save_faiss_index(vector_store, output_path: str = "faiss_index"):
@@ -157,6 +299,23 @@ def main():
     """
     Main function to orchestrate the indexing process.
     """
+    parser = argparse.ArgumentParser(description="Index the textbook into a local FAISS store")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its last checkpoint")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help="Path of the progress checkpoint")
+    parser.add_argument('--index-type', default=DEFAULT_INDEX_TYPE, choices=INDEX_TYPES,
+                        help="FAISS index type; all but Flat are approximate and trained on a sample")
+    parser.add_argument('--nlist', type=int, help="Number of IVF cells (sized from the corpus by default)")
+    parser.add_argument('--nprobe', type=int, help="Number of IVF cells searched (tuned by default)")
+    parser.add_argument('--target-recall', type=float, default=TARGET_RECALL,
+                        help="Recall@10 against exact search that nprobe/efSearch tuning aims for")
+    parser.add_argument('--embedding-backend', default=EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS,
+                        help="Embed with the Gemini API, a local CPU model or deterministic word hashing "
+                             "(the last two fully offline)")
+    parser.add_argument('--embedding-model', help="Embedding model (defaults to the backend's default model)")
+    args = parser.parse_args()
+    embeddings_model = args.embedding_model or DEFAULT_MODELS[args.embedding_backend]
+
     print("Starting Physical AI & Humanoid Robotics textbook indexing process...")
 
     # Define the docs directory
@@ -169,7 +328,7 @@ def main():
 
     # Get Gemini API key from environment variable or user input
     gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
+    if not gemini_api_key and args.embedding_backend == 'gemini':
         gemini_api_key = input("Please enter your Gemini API key: ").strip()
         if not gemini_api_key:
             print("Error: Gemini API key is required.")
@@ -190,22 +349,34 @@ def main():
         return
     
     # Step 3: Create FAISS index with embeddings
+    checkpoint = Checkpoint(args.checkpoint, {'index': INDEX_PATH, 'chunk_size': 1000, 'chunk_overlap': 100,
+                                              'embedding_backend': args.embedding_backend,
+                                              'embedding_model': embeddings_model})
     try:
-        vector_store = create_faiss_index(chunked_docs)
+        vector_store = create_faiss_index(chunked_docs, embeddings_model, checkpoint=checkpoint, resume=args.resume,
+                                          backend=args.embedding_backend)
     except Exception as e:
         print(f"Error creating FAISS index: {str(e)}")
         return
     
-    # Step 4: Save the index to disk
+    # Step 4: Compress the index, then save it to disk with its parameters
     try:
-        save_faiss_index(vector_store, "faiss_index_embodied_intelligence")
+        params = compress_store(vector_store, args.index_type, args.target_recall, args.nlist, args.nprobe)
+        save_faiss_index(vector_store, INDEX_PATH)
+        save_params(INDEX_PATH, params)
     except Exception as e:
         print(f"Error saving FAISS index: {str(e)}")
         return
+
+    # The finished index supersedes the partial one
+    state = checkpoint.load()
+    if state is not None:
+        shutil.rmtree(state['path'], ignore_errors=True)
+    checkpoint.clear()
     
     print("\nIndexing completed successfully!")
     print(f"Documents indexed: {len(chunked_docs)}")
-    print("FAISS index saved as 'faiss_index_embodied_intelligence'")
+    print(f"FAISS index saved as '{INDEX_PATH}'")
     print("The Physical AI & Humanoid Robotics textbook is now available for RAG queries.")
 
 if __name__ == "__main__":
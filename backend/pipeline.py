@@ -0,0 +1,219 @@
+"""
+Bounded-queue pipeline for the indexing scripts.
+
+This module provides the Pipeline class which runs a sequence of stages
+(e.g. load, chunk, embed, upload) concurrently. Each stage has its own
+worker threads and reads from a bounded queue, so a slow stage holds back
+the ones before it instead of letting work pile up in memory, and network
+I/O in one stage overlaps with CPU work in another. The total wall time
+approaches that of the slowest stage.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence
+
+# Marks the end of the input on a queue
+_DONE = object()
+
+# Seconds between checks for a stopped pipeline while blocked on a queue
+_POLL_INTERVAL = 0.1
+
+
+class Stage:
+    """
+    One step of a pipeline: a function applied to every item by a pool of threads.
+    """
+
+    def __init__(self, name: str, function: Callable[[Any], Any], workers: int = 1, queue_size: int = None):
+        """
+        Initialize the Stage.
+
+        Args:
+            name (str): Name used in statistics and error messages
+            function: Called with each item; its result is passed to the next stage
+            workers (int): Number of threads running ``function``
+            queue_size (int): Maximum number of items waiting for this stage
+                (defaults to twice the number of workers)
+        """
+        if workers <= 0:
+            raise ValueError("workers must be a positive integer")
+
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.queue_size = queue_size if queue_size is not None else 2 * workers
+
+
+class PipelineError(Exception):
+    """
+    A stage raised an exception; the original is chained as ``__cause__``.
+    """
+
+
+class Pipeline:
+    """
+    Run items through stages connected by bounded queues, preserving their order.
+
+    Every stage emits its results in input order, so a stage with a single
+    worker sees items in the order they were fed (which matters for stateful
+    stages such as de-duplication), and at most ``workers`` finished items
+    wait for a slower sibling at any time.
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        """
+        Initialize the Pipeline.
+
+        Args:
+            stages (Sequence[Stage]): The stages, in processing order
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+
+        self.stages = list(stages)
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.wall_seconds = 0.0
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        """
+        Feed items through the stages and yield the results of the last one.
+
+        Items are pulled from ``items`` lazily, only as fast as the stages
+        consume them.
+
+        Args:
+            items (Iterable[Any]): Input of the first stage
+
+        Yields:
+            Any: Output of the last stage for each item, in input order
+
+        Raises:
+            PipelineError: If a stage raises; the remaining work is abandoned
+        """
+        self.stats = {stage.name: {'items': 0, 'busy_seconds': 0.0} for stage in self.stages}
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        queues.append(queue.Queue(maxsize=self.stages[-1].workers))
+
+        stop = threading.Event()
+        errors = []
+        started = time.monotonic()
+
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], stop, errors), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            state = {'next': 0, 'running': stage.workers, 'turn': threading.Condition()}
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[index], queues[index + 1], state, stop, errors),
+                    daemon=True))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                try:
+                    item = queues[-1].get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    if errors:
+                        break
+                    continue
+                if item is _DONE:
+                    break
+                yield item[1]
+        finally:
+            # Also reached when the caller stops iterating early
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.wall_seconds = time.monotonic() - started
+
+        if errors:
+            name, error = errors[0]
+            raise PipelineError(f"Stage '{name}' failed: {error}") from error
+
+    def _feed(self, items: Iterable[Any], out: queue.Queue, stop: threading.Event, errors: List):
+        """
+        Number the input items and put them on the first queue.
+        """
+        try:
+            for seq, item in enumerate(items):
+                if not _put(out, (seq, item), stop):
+                    return
+        except Exception as e:
+            errors.append(('input', e))
+            stop.set()
+            return
+        _put(out, _DONE, stop)
+
+    def _work(self, stage: Stage, source: queue.Queue, out: queue.Queue, state: Dict[str, Any],
+              stop: threading.Event, errors: List):
+        """
+        Worker thread of a stage: process items and emit them in input order.
+        """
+        while not stop.is_set():
+            try:
+                item = source.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            if item is _DONE:
+                # Let sibling workers see the end as well; the last one passes it on
+                source.put(_DONE)
+                with state['turn']:
+                    state['running'] -= 1
+                    if state['running'] == 0:
+                        _put(out, _DONE, stop)
+                return
+
+            seq, value = item
+            began = time.monotonic()
+            try:
+                result = stage.function(value)
+            except Exception as e:
+                errors.append((stage.name, e))
+                stop.set()
+                return
+            busy = time.monotonic() - began
+
+            with state['turn']:
+                while state['next'] != seq:
+                    if stop.is_set():
+                        return
+                    state['turn'].wait(_POLL_INTERVAL)
+                if not _put(out, (seq, result), stop):
+                    return
+                state['next'] += 1
+                self.stats[stage.name]['items'] += 1
+                self.stats[stage.name]['busy_seconds'] += busy
+                state['turn'].notify_all()
+
+    def summary(self) -> str:
+        """
+        Describe where the time of the last run went.
+
+        Returns:
+            str: Busy time per worker of each stage and the total wall time
+        """
+        parts = []
+        for stage in self.stages:
+            stats = self.stats.get(stage.name, {'items': 0, 'busy_seconds': 0.0})
+            parts.append(f"{stage.name} {stats['busy_seconds'] / stage.workers:.1f}s")
+        return f"Stage time per worker: {', '.join(parts)} (wall time {self.wall_seconds:.1f}s)"
+
+
+def _put(out: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """
+    Put an item on a bounded queue, giving up if the pipeline is stopped.
+
+    Returns:
+        bool: Whether the item was queued
+    """
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
@@ -0,0 +1,240 @@
+"""
+Versioned Qdrant collections behind an alias, for zero-downtime reindexing.
+
+A full rebuild writes into a new collection named ``<alias>_v<N>`` while
+searches keep going to the alias. Once the new collection passes a sanity
+check the alias is switched to it in a single atomic operation, and old
+versions beyond the retention limit are deleted.
+"""
+
+import os
+import re
+import time
+from typing import List, Optional, Sequence
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from qdrant_profiles import DEFAULT_PROFILE, collection_config, get_profile
+
+# Number of collection versions kept, including the live one, so a bad
+# build can be rolled back by pointing the alias at the previous version
+DEFAULT_RETAINED_VERSIONS = int(os.getenv("QDRANT_RETAINED_VERSIONS", 2))
+
+# Segment size at which Qdrant builds the HNSW index once bulk loading is over
+INDEXING_THRESHOLD = 20000
+
+# In-process Qdrant instead of a server: ':memory:' for a store that lives
+# as long as the process, or a directory for one kept on disk
+QDRANT_LOCATION = os.getenv("QDRANT_LOCATION")
+
+
+def connect(location: Optional[str] = QDRANT_LOCATION, host: str = None, port: int = None) -> QdrantClient:
+    """
+    Open a Qdrant client, in-process if a location is given.
+
+    Args:
+        location: ':memory:', a directory for local on-disk storage, or None
+            for the server
+        host: Host of the server (defaults to QDRANT_HOST or localhost)
+        port: Port of the server (defaults to QDRANT_PORT or 6333)
+
+    Returns:
+        QdrantClient: The client
+    """
+    if location == ':memory:':
+        return QdrantClient(location=':memory:')
+    if location:
+        return QdrantClient(path=location)
+    return QdrantClient(host=host or os.getenv("QDRANT_HOST", "localhost"),
+                        port=port or int(os.getenv("QDRANT_PORT", 6333)))
+
+
+def versioned_name(alias: str, version: int) -> str:
+    """
+    Return the name of a collection version.
+    """
+    return f"{alias}_v{version}"
+
+
+def list_versions(client: QdrantClient, alias: str) -> List[int]:
+    """
+    List the existing versions of an aliased collection, oldest first.
+
+    Args:
+        client: Qdrant client instance
+        alias: Name of the alias
+
+    Returns:
+        Version numbers of the collections named ``<alias>_v<N>``
+    """
+    pattern = re.compile(re.escape(alias) + r'_v(\d+)$')
+    versions = []
+    for collection in client.get_collections().collections:
+        match = pattern.match(collection.name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def resolve_alias(client: QdrantClient, alias: str) -> Optional[str]:
+    """
+    Return the collection an alias points to, or None if the alias does not exist.
+    """
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def create_versioned_collection(client: QdrantClient, alias: str, vector_size: int,
+                                distance: models.Distance = models.Distance.COSINE,
+                                profile: str = DEFAULT_PROFILE) -> str:
+    """
+    Create the next version of an aliased collection, ready for bulk loading.
+
+    HNSW indexing is disabled while the collection is empty so that the
+    upload does not compete with live searches for CPU; ``finish_bulk_load``
+    turns it back on.
+
+    Args:
+        client: Qdrant client instance
+        alias: Name of the alias searches use
+        vector_size: Dimension of the vectors
+        distance: Distance metric
+        profile: Name of the collection profile (HNSW, quantization and on-disk storage)
+
+    Returns:
+        Name of the new collection
+    """
+    versions = list_versions(client, alias)
+    name = versioned_name(alias, versions[-1] + 1 if versions else 1)
+
+    client.create_collection(
+        collection_name=name,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0),
+        metadata={'qdrant_profile': profile},
+        **collection_config(get_profile(profile), vector_size, distance)
+    )
+
+    print(f"Created collection '{name}' for alias '{alias}' with the '{profile}' profile")
+    return name
+
+
+def collection_profile(client: QdrantClient, collection_name: str) -> str:
+    """
+    Return the name of the profile a collection was built with.
+
+    Args:
+        client: Qdrant client instance
+        collection_name: Name of the collection
+
+    Returns:
+        The profile recorded in the collection's metadata, or ``DEFAULT_PROFILE``
+        for collections created before the profile was recorded
+    """
+    metadata = client.get_collection(collection_name).config.metadata or {}
+    return metadata.get('qdrant_profile', DEFAULT_PROFILE)
+
+
+def finish_bulk_load(client: QdrantClient, collection_name: str, timeout: float = 600.0):
+    """
+    Re-enable indexing after a bulk load and wait until the collection is ready.
+
+    Args:
+        client: Qdrant client instance
+        collection_name: The freshly loaded collection
+        timeout: Seconds to wait for the optimizers to finish
+
+    Raises:
+        RuntimeError: If the collection does not become green in time
+    """
+    client.update_collection(
+        collection_name=collection_name,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD)
+    )
+
+    deadline = time.monotonic() + timeout
+    while client.get_collection(collection_name).status != models.CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Collection '{collection_name}' was not ready after {timeout} seconds")
+        time.sleep(1)
+
+
+def verify_collection(client: QdrantClient, collection_name: str, expected_points: int,
+                      probe_id=None, probe_vector: Sequence[float] = None):
+    """
+    Sanity-check a rebuilt collection before it goes live.
+
+    Args:
+        client: Qdrant client instance
+        collection_name: The collection to check
+        expected_points: Number of points that were uploaded
+        probe_id: ID of an uploaded point
+        probe_vector: Vector of that point; searching for it must return it
+
+    Raises:
+        RuntimeError: If the collection is empty, has the wrong number of
+            points or does not find the probe point
+    """
+    count = client.count(collection_name=collection_name, exact=True).count
+    if count == 0 or count != expected_points:
+        raise RuntimeError(f"Collection '{collection_name}' has {count} points, expected {expected_points}")
+
+    if probe_vector is not None:
+        # Points with (nearly) the same vector tie with the probe, so it only has to score as high as the best hit
+        hits = client.query_points(collection_name=collection_name, query=list(probe_vector), limit=10).points
+        if not any(hit.id == probe_id and hit.score >= hits[0].score - 1e-6 for hit in hits):
+            raise RuntimeError(f"Collection '{collection_name}' did not return point {probe_id} for its own vector")
+
+
+def switch_alias(client: QdrantClient, alias: str, collection_name: str):
+    """
+    Point an alias at a collection in a single atomic operation.
+
+    Args:
+        client: Qdrant client instance
+        alias: Name of the alias searches use
+        collection_name: The collection that goes live
+    """
+    operations = []
+    if resolve_alias(client, alias) is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    elif client.collection_exists(alias):
+        # A collection from before aliases were used holds the name; it has to
+        # go before the alias can be created, which is a one-time blip
+        print(f"Deleting legacy collection '{alias}' to replace it with an alias")
+        client.delete_collection(alias)
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)))
+
+    client.update_collection_aliases(change_aliases_operations=operations)
+    print(f"Alias '{alias}' now points to '{collection_name}'")
+
+
+def garbage_collect_versions(client: QdrantClient, alias: str,
+                             retain: int = DEFAULT_RETAINED_VERSIONS) -> List[str]:
+    """
+    Delete old collection versions, keeping the live one and the newest others.
+
+    Args:
+        client: Qdrant client instance
+        alias: Name of the alias searches use
+        retain: Number of versions to keep, including the live one
+
+    Returns:
+        Names of the deleted collections
+    """
+    live = resolve_alias(client, alias)
+    names = [versioned_name(alias, version) for version in list_versions(client, alias)]
+    kept = {live} | set([name for name in names if name != live][-(retain - 1):] if retain > 1 else [])
+
+    deleted = []
+    for name in names:
+        if name not in kept:
+            client.delete_collection(name)
+            deleted.append(name)
+
+    if deleted:
+        print(f"Deleted old collection versions: {', '.join(deleted)}")
+    return deleted
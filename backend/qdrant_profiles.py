@@ -0,0 +1,119 @@
+"""
+Named Qdrant collection profiles that trade memory for latency and recall.
+
+A profile fixes how a collection is built (HNSW graph density, vector
+quantization, which parts live on disk) and how it is searched (``hnsw_ef``,
+rescoring with the original vectors and oversampling of quantized hits).
+The indexer builds collections with a profile selected by name through
+``QDRANT_PROFILE`` and records its name in the collection's metadata, so the
+RAG API searches each collection with the profile it was built with.
+"""
+
+import os
+from typing import Any, Dict, NamedTuple, Optional
+
+from qdrant_client.http import models
+
+# Profile used by the indexer and the RAG API unless another one is chosen
+DEFAULT_PROFILE = os.getenv("QDRANT_PROFILE", "balanced")
+
+
+class CollectionProfile(NamedTuple):
+    """
+    Build and search settings of a Qdrant collection.
+    """
+    hnsw_m: int
+    hnsw_ef_construct: int
+    quantization: Optional[str]
+    vectors_on_disk: bool
+    payload_on_disk: bool
+    hnsw_on_disk: bool
+    hnsw_ef: int
+    rescore: bool
+    oversampling: float
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    # Everything in RAM, a dense graph and int8 vectors scanned before rescoring
+    'low-latency': CollectionProfile(hnsw_m=32, hnsw_ef_construct=256, quantization='int8',
+                                     vectors_on_disk=False, payload_on_disk=False, hnsw_on_disk=False,
+                                     hnsw_ef=64, rescore=True, oversampling=1.5),
+    # Only 1-bit vectors stay in RAM; full vectors are read from disk to rescore a larger candidate set
+    'low-memory': CollectionProfile(hnsw_m=16, hnsw_ef_construct=100, quantization='binary',
+                                    vectors_on_disk=True, payload_on_disk=True, hnsw_on_disk=True,
+                                    hnsw_ef=128, rescore=True, oversampling=3.0),
+    # int8 vectors in RAM with the originals and payloads on disk
+    'balanced': CollectionProfile(hnsw_m=16, hnsw_ef_construct=128, quantization='int8',
+                                  vectors_on_disk=True, payload_on_disk=True, hnsw_on_disk=False,
+                                  hnsw_ef=128, rescore=True, oversampling=2.0),
+}
+
+
+def get_profile(name: str = DEFAULT_PROFILE) -> CollectionProfile:
+    """
+    Look up a collection profile by name.
+
+    Args:
+        name: One of the keys of ``PROFILES``
+
+    Returns:
+        CollectionProfile: The profile's settings
+
+    Raises:
+        ValueError: If there is no profile of that name
+    """
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown Qdrant profile '{name}'; choose from {', '.join(PROFILES)}")
+
+
+def quantization_config(profile: CollectionProfile):
+    """
+    Return the quantization config of a profile, or None to store full vectors only.
+    """
+    if profile.quantization == 'int8':
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if profile.quantization == 'binary':
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def collection_config(profile: CollectionProfile, vector_size: int,
+                      distance: models.Distance = models.Distance.COSINE) -> Dict[str, Any]:
+    """
+    Build the arguments of ``create_collection`` for a profile.
+
+    Args:
+        profile: The collection profile
+        vector_size: Dimension of the vectors
+        distance: Distance metric
+
+    Returns:
+        Dict[str, Any]: Keyword arguments for ``QdrantClient.create_collection``
+    """
+    return {
+        'vectors_config': models.VectorParams(size=vector_size, distance=distance, on_disk=profile.vectors_on_disk),
+        'hnsw_config': models.HnswConfigDiff(m=profile.hnsw_m, ef_construct=profile.hnsw_ef_construct,
+                                             on_disk=profile.hnsw_on_disk),
+        'quantization_config': quantization_config(profile),
+        'on_disk_payload': profile.payload_on_disk
+    }
+
+
+def search_params(profile: CollectionProfile) -> models.SearchParams:
+    """
+    Build the search parameters that go with a profile.
+
+    Args:
+        profile: The profile the collection was built with
+
+    Returns:
+        models.SearchParams: ``hnsw_ef`` and, for quantized collections,
+        rescoring and oversampling of the quantized candidates
+    """
+    quantization = None
+    if profile.quantization is not None:
+        quantization = models.QuantizationSearchParams(rescore=profile.rescore, oversampling=profile.oversampling)
+    return models.SearchParams(hnsw_ef=profile.hnsw_ef, quantization=quantization)
@@ -1,15 +1,24 @@
 """
 RAG API for Physical AI & Humanoid Robotics Textbook Portal
 Implements a Retrieval-Augmented Generation API using Context7 and Google Generative AI.
-Connects to Qdrant for retrieval from the 'embodied_intelligence_rag' collection.
+Connects to Qdrant for retrieval through the 'embodied_intelligence_rag' collection alias.
+
+For offline runs, EMBEDDING_BACKEND=hash, GENERATION_BACKEND=stub and
+QDRANT_LOCATION=:memory: (with RAG_SNAPSHOT_PATH to load an index snapshot)
+need no API key, network access or Qdrant server.
 """
 
 import os
 import logging
+import threading
+import time
+from typing import Any, NamedTuple, Optional
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import uvicorn
 
+from embeddings import DEFAULT_MODELS, EMBEDDING_BACKEND
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,15 +35,103 @@ class RAGResponse(BaseModel):
     query: str
     response: str
 
-# Global Context7 client
+# Global Context7 client, embedding cache and Qdrant client
 ctx7 = None
+embedding_cache = None
+qdrant_client = None
+
+# Qdrant alias (or collection) searched; the indexer switches the alias to a
+# new collection version after a rebuild, so searches never see a partial index
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "embodied_intelligence_rag")
+
+# The embedding backend (EMBEDDING_BACKEND) and model must match what the
+# index was built with (the model defaults to the backend's); the search
+# parameters come from the profile recorded with the collection
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL") or DEFAULT_MODELS[EMBEDDING_BACKEND]
+
+# Seconds a resolved query setup is reused before the alias is checked again
+QUERY_SETUP_TTL = float(os.getenv("RAG_QUERY_SETUP_TTL", 30))
+
+# Index snapshot loaded into an in-process Qdrant (QDRANT_LOCATION) at
+# startup when the collection does not exist there yet
+RAG_SNAPSHOT_PATH = os.getenv("RAG_SNAPSHOT_PATH")
+
+# Token budget for the retrieved context in the prompt (0 disables packing)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", 1000))
+
+
+class QuerySetup(NamedTuple):
+    """
+    How queries against the collection behind the alias are embedded and searched.
+    """
+    collection_name: str
+    embedder: Any
+    projection: Optional[Any]
+    search_params: Any
+    checked_at: float
+
+
+query_setup = None
+query_setup_lock = threading.Lock()
+
+
+def get_query_setup(gemini_api_key: str = None) -> QuerySetup:
+    """
+    Return the collection behind the alias with the query embedder and the
+    search parameters of the profile it was built with.
+
+    Finding out how the collection's vectors were reduced costs Qdrant round
+    trips, so the result is reused for QUERY_SETUP_TTL seconds; after that
+    the alias is resolved again and the embedder is only rebuilt if the alias
+    now points to another collection.
+    """
+    global query_setup
+    from embeddings import get_embedder
+    from embedding_cache import CachedEmbedder
+    from dimension_reduction import query_reduction
+    from qdrant_collections import collection_profile, resolve_alias
+    from qdrant_profiles import get_profile, search_params
+
+    with query_setup_lock:
+        now = time.monotonic()
+        if query_setup is not None and now - query_setup.checked_at < QUERY_SETUP_TTL:
+            return query_setup
+
+        collection_name = resolve_alias(qdrant_client, QDRANT_COLLECTION) or QDRANT_COLLECTION
+        if query_setup is not None and query_setup.collection_name == collection_name:
+            query_setup = query_setup._replace(checked_at=now)
+            return query_setup
+
+        # Reduce queries like the vectors of the collection: a smaller output
+        # dimension from the model, or the index's PCA projection
+        full_dimension = (get_embedder(EMBEDDING_BACKEND, EMBEDDING_MODEL).dimension
+                          if EMBEDDING_BACKEND != 'gemini' else None)
+        output_dimensionality, projection = query_reduction(qdrant_client, collection_name, EMBEDDING_MODEL,
+                                                            full_dimension=full_dimension)
+        embedder = get_embedder(EMBEDDING_BACKEND, EMBEDDING_MODEL, output_dimensionality, api_key=gemini_api_key)
+        profile = collection_profile(qdrant_client, collection_name)
+        query_setup = QuerySetup(collection_name, CachedEmbedder(embedder, embedding_cache), projection,
+                                 search_params(get_profile(profile)), now)
+        logger.info(f"Queries go to '{collection_name}' (output dimension {output_dimensionality or 'full'}, "
+                    f"{'with' if projection is not None else 'without'} PCA projection, '{profile}' profile)")
+        return query_setup
+
+
+def invalidate_query_setup():
+    """
+    Make the next request resolve the alias again.
+    """
+    global query_setup
+    with query_setup_lock:
+        query_setup = None
 
 @app.on_event("startup")
 def startup_event():
     """
-    Initialize the Context7 client when the application starts.
+    Initialize the Context7 client, the embedding cache and the Qdrant
+    client when the application starts.
     """
-    global ctx7
+    global ctx7, embedding_cache, qdrant_client
     try:
         from context7 import Context7Client
         ctx7 = Context7Client()
@@ -43,6 +140,39 @@ def startup_event():
         logger.error(f"Failed to initialize Context7 client: {str(e)}")
         raise
 
+    try:
+        from embedding_cache import EmbeddingCache
+        embedding_cache = EmbeddingCache()
+        logger.info(f"Embedding cache opened at {embedding_cache.path}")
+    except Exception as e:
+        logger.error(f"Failed to open embedding cache: {str(e)}")
+        raise
+
+    if EMBEDDING_BACKEND == 'local':
+        # Load the model now, so the first query does not wait for it
+        try:
+            from embeddings import get_embedder
+            local_embedder = get_embedder('local', EMBEDDING_MODEL)
+            logger.info(f"Local embedding model {local_embedder.model} loaded "
+                        f"({local_embedder.dimension} dimensions)")
+        except Exception as e:
+            logger.error(f"Failed to load the local embedding model: {str(e)}")
+            raise
+
+    try:
+        # All requests share one client; an in-process Qdrant can only be opened once anyway
+        from qdrant_collections import QDRANT_LOCATION, connect, resolve_alias
+        qdrant_client = connect(QDRANT_LOCATION)
+        if QDRANT_LOCATION:
+            logger.info(f"Opened in-process Qdrant at {QDRANT_LOCATION}")
+            if RAG_SNAPSHOT_PATH and resolve_alias(qdrant_client, QDRANT_COLLECTION) is None:
+                from snapshot import Snapshot, restore_to_qdrant
+                from qdrant_profiles import DEFAULT_PROFILE
+                restore_to_qdrant(Snapshot(RAG_SNAPSHOT_PATH), qdrant_client, QDRANT_COLLECTION, DEFAULT_PROFILE)
+    except Exception as e:
+        logger.error(f"Failed to open the Qdrant client: {str(e)}")
+        raise
+
 @app.get("/")
 def read_root():
     return {"message": "Physical AI & Robotics RAG API",
@@ -55,58 +185,60 @@ def rag_chat(request: QueryRequest):
     """
     try:
         # Import required libraries inside the function to avoid import-time issues
-        from qdrant_client import QdrantClient
-        import google.generativeai as genai
+        from generation import GENERATION_BACKEND, get_generative_model
 
-        # Get API key from environment variable
+        # Get API key from environment variable; only the Gemini backends need it
         gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not gemini_api_key:
+        if not gemini_api_key and 'gemini' in (EMBEDDING_BACKEND, GENERATION_BACKEND):
             raise ValueError("GEMINI_API_KEY environment variable is not set")
 
-        # Configure the Gemini API
-        genai.configure(api_key=gemini_api_key)
-
-        # Initialize Qdrant client
-        qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-        qdrant_port = int(os.getenv("QDRANT_PORT", 6333))
-
-        qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port)
+        # Generate embedding for the query with Gemini, the local model or hashing,
+        # reduced like the vectors of the collection behind the alias; repeated
+        # queries are answered from the embedding cache
+        setup = get_query_setup(gemini_api_key)
+        query_embedding = setup.embedder.embed_query(request.query)
+        if setup.projection is not None:
+            query_embedding = setup.projection.apply([query_embedding])[0].tolist()
 
-        # Generate embedding for the query using Gemini
-        embedding_result = genai.embed_content(
-            model="embedding-001",
-            content=[request.query],
-            task_type="retrieval_query"
-        )
-
-        query_embedding = embedding_result['embedding']
-
-        # Search using the embedding in Qdrant
-        search_results = qdrant_client.search(
-            collection_name="embodied_intelligence_rag",
-            query_vector=query_embedding,
-            limit=4
-        )
+        # Search the collection the query was embedded for; a rebuild switches the
+        # alias meanwhile, but keeps the previous version until the next one
+        try:
+            search_results = qdrant_client.query_points(
+                collection_name=setup.collection_name,
+                query=query_embedding,
+                search_params=setup.search_params,
+                limit=4
+            ).points
+        except Exception:
+            # The collection may have been garbage-collected; resolve the alias again next time
+            invalidate_query_setup()
+            raise
 
         # Extract context from search results
         retrieved_docs = []
         for result in search_results:
             # Updated to use proper Qdrant result structure
-            if hasattr(result, 'payload') and result.payload and 'content' in result.payload:
-                retrieved_docs.append({
-                    'content': result.payload['content'],
-                    'source': result.payload.get('source', 'Unknown'),
-                    'title': result.payload.get('title', 'Untitled')
-                })
-            elif 'payload' in result and result['payload'] and 'content' in result['payload']:
+            if hasattr(result, 'payload'):
+                payload, score = result.payload, result.score
+            else:
+                payload, score = result.get('payload'), result.get('score')
+
+            if payload and 'content' in payload:
                 retrieved_docs.append({
-                    'content': result['payload']['content'],
-                    'source': result['payload'].get('source', 'Unknown'),
-                    'title': result['payload'].get('title', 'Untitled')
+                    'content': payload['content'],
+                    'source': payload.get('source', 'Unknown'),
+                    'title': payload.get('title', 'Untitled'),
+                    'heading_path': payload.get('heading_path', []),
+                    'start': payload.get('start'),
+                    'end': payload.get('end'),
+                    'token_count': payload.get('token_count'),
+                    'score': score
                 })
 
-        # Format the context using Context7's format_context method
-        context_str = ctx7.format_context(retrieved_docs) if retrieved_docs else "No relevant context found."
+        # Format the context using Context7's format_context method, merging
+        # neighbouring chunks and packing them into the prompt token budget
+        token_budget = CONTEXT_TOKEN_BUDGET or None
+        context_str = ctx7.format_context(retrieved_docs, token_budget=token_budget) if retrieved_docs else "No relevant context found."
 
         # Create a prompt for Gemini with the retrieved context
         prompt = f"""You are an AI assistant specializing in Physical AI & Humanoid Robotics.
@@ -120,8 +252,8 @@ def rag_chat(request: QueryRequest):
         Question: {request.query}
         Helpful Answer:"""
 
-        # Generate response using Gemini
-        model = genai.GenerativeModel('gemini-pro')
+        # Generate response using Gemini (or the offline stub)
+        model = get_generative_model(api_key=gemini_api_key)
         response = model.generate_content(prompt)
 
         # Extract text from response
@@ -20,6 +20,9 @@ QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 COLLECTION_NAME = "physical_ai_textbook"
+# "local" (a CPU model, EMBEDDING_MODEL) or "hash" embed queries instead of
+# Gemini; it must be what the collection was indexed with
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
 K = 3
 
 if not all([QDRANT_URL, QDRANT_API_KEY, GEMINI_API_KEY]):
@@ -35,11 +38,15 @@ qdrant_client = QdrantClient(
     api_key=QDRANT_API_KEY
 )
 
-embeddings_model = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    task_type="retrieval_query",
-    google_api_key=GEMINI_API_KEY
-)
+if EMBEDDING_BACKEND != "gemini":
+    from embeddings import get_embedder
+    embeddings_model = get_embedder(EMBEDDING_BACKEND, os.getenv("EMBEDDING_MODEL"))
+else:
+    embeddings_model = GoogleGenerativeAIEmbeddings(
+        model="models/text-embedding-004",
+        task_type="retrieval_query",
+        google_api_key=GEMINI_API_KEY
+    )
 
 # Correct VectorStore initialization (CLOUD)
 vectorstore = QdrantVectorStore(
@@ -0,0 +1,534 @@
+"""
+Portable index snapshots: build the index once and restore it anywhere.
+
+A snapshot is a directory written by the indexer's snapshot sink:
+
+- ``vectors.npy``: normalized float32 vectors, one row per chunk, which
+  loaders memory-map instead of reading into RAM
+- ``payloads.parquet``: the point ID and payload of each row, in the same
+  order (``payloads.jsonl`` when pyarrow is not installed)
+- ``manifest.json``: format version, embedding model, dimension, chunker
+  version, corpus hash and the index settings
+- ``projection.npz``: the PCA projection queries need, if the vectors were reduced
+
+The loaders below restore a snapshot into a Qdrant collection or a FAISS
+store without re-embedding anything. Run this module to restore from the
+command line.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from context7 import CHUNKER_VERSION
+from index_manifest import IndexManifest, chunk_hash
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Version of the directory layout; loaders refuse snapshots of other versions
+SNAPSHOT_VERSION = 1
+
+VECTORS_FILE = 'vectors.npy'
+PARQUET_FILE = 'payloads.parquet'
+JSONL_FILE = 'payloads.jsonl'
+MANIFEST_FILE = 'manifest.json'
+PROJECTION_FILE = 'projection.npz'
+
+# Payload fields that hold lists and are stored as JSON strings in the columnar table
+_JSON_FIELDS = ('aliases', 'heading_path')
+
+# Payload fields stored as 64-bit integers, even in a row group where they are all missing
+_INTEGER_FIELDS = ('start', 'end', 'token_count')
+
+# Number of payload rows buffered before they are written to the table as one row group
+ROW_GROUP_SIZE = 4096
+
+
+def corpus_hash(payloads: Sequence[Dict[str, Any]]) -> str:
+    """
+    Hash the documents a snapshot was built from.
+
+    Args:
+        payloads: Chunk payloads with ``file_path`` and the document hash in ``original_id``
+
+    Returns:
+        str: Hex SHA-256 digest of the sorted (file, document hash) pairs
+    """
+    digest = hashlib.sha256()
+    for file_path, document_hash in sorted({(payload['file_path'], str(payload['original_id']))
+                                            for payload in payloads}):
+        digest.update(f"{file_path}\0{document_hash}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PayloadWriter:
+    """
+    Append the point IDs and payloads of a snapshot to its payload table as they arrive.
+
+    Rows are buffered and written one row group at a time with a Parquet
+    writer (or appended to a JSON Lines file without pyarrow), so the
+    payloads are never all held in memory. Aliases added to rows that were
+    already written are kept in a small side table; ``close`` applies them by
+    rewriting the table one row group at a time.
+    """
+
+    def __init__(self, path: str, row_group_size: int = ROW_GROUP_SIZE):
+        """
+        Initialize the PayloadWriter.
+
+        Args:
+            path: Snapshot directory the table is written to
+            row_group_size: Number of rows buffered before they are written
+        """
+        self.path = os.path.join(path, PARQUET_FILE if pyarrow is not None else JSONL_FILE)
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._written = 0
+        self._late_aliases: Dict[int, List[Dict[str, Any]]] = {}
+        self._writer = None
+        self._file = None
+
+    def write(self, ids: Sequence[str], payloads: Sequence[Dict[str, Any]]):
+        """
+        Append rows.
+
+        Args:
+            ids: Point ID of each row
+            payloads: Payload of each row
+        """
+        self._buffer.extend(dict(payload, id=point_id) for point_id, payload in zip(ids, payloads))
+        self.count += len(ids)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def add_aliases(self, row: int, aliases: List[Dict[str, Any]]):
+        """
+        Add entries to the 'aliases' of a row appended earlier.
+
+        Args:
+            row: Position of the row in the table
+            aliases: Alias entries to add
+        """
+        if row >= self._written:
+            payload = self._buffer[row - self._written]
+            payload['aliases'] = payload['aliases'] + aliases
+        else:
+            self._late_aliases.setdefault(row, []).extend(aliases)
+
+    def close(self):
+        """
+        Write the buffered rows and apply the aliases of rows already written.
+        """
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        if self._late_aliases and self._written:
+            self._apply_late_aliases()
+
+    def _flush(self):
+        """
+        Write the buffered rows as one row group.
+        """
+        if not self._buffer:
+            return
+
+        rows = [dict(payload, **{field: json.dumps(payload[field]) for field in _JSON_FIELDS})
+                for payload in self._buffer]
+        if pyarrow is not None:
+            if self._writer is None:
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, _payload_schema(rows))
+            self._writer.write_table(pyarrow.Table.from_pylist(rows, schema=self._writer.schema))
+        else:
+            if self._file is None:
+                self._file = open(self.path, 'w', encoding='utf-8')
+            for row in rows:
+                self._file.write(json.dumps(row) + '\n')
+
+        self._written += len(self._buffer)
+        self._buffer = []
+
+    def _apply_late_aliases(self):
+        """
+        Rewrite the table with the aliases added after their rows were written.
+        """
+        def patch(start: int, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            for offset, row in enumerate(rows):
+                added = self._late_aliases.get(start + offset)
+                if added:
+                    row['aliases'] = json.dumps(json.loads(row['aliases']) + added)
+            return rows
+
+        partial = self.path + '.partial'
+        start = 0
+        if pyarrow is not None:
+            source = pyarrow.parquet.ParquetFile(self.path)
+            with pyarrow.parquet.ParquetWriter(partial, source.schema_arrow) as writer:
+                for group in range(source.num_row_groups):
+                    table = source.read_row_group(group)
+                    if any(start <= row < start + table.num_rows for row in self._late_aliases):
+                        table = pyarrow.Table.from_pylist(patch(start, table.to_pylist()), schema=table.schema)
+                    writer.write_table(table)
+                    start += table.num_rows
+            source.close()
+        else:
+            with open(self.path, 'r', encoding='utf-8') as f, open(partial, 'w', encoding='utf-8') as out:
+                for line in f:
+                    out.write(json.dumps(patch(start, [json.loads(line)])[0]) + '\n')
+                    start += 1
+        os.replace(partial, self.path)
+
+
+def _payload_schema(rows: List[Dict[str, Any]]):
+    """
+    Infer the schema of the payload table from its first row group.
+
+    Columns that are missing from every row of the group get a type that
+    later row groups can fill in: integers for the offsets and token counts,
+    strings otherwise.
+    """
+    schema = pyarrow.Table.from_pylist(rows).schema
+    for index, field in enumerate(schema):
+        if field.name in _INTEGER_FIELDS:
+            schema = schema.set(index, field.with_type(pyarrow.int64()))
+        elif pyarrow.types.is_null(field.type):
+            schema = schema.set(index, field.with_type(pyarrow.string()))
+    return schema
+
+
+def write_snapshot(path: str, raw_vectors_path: str, dimension: int, count: int,
+                   documents: Sequence[Dict[str, Any]], metadata: Dict[str, Any] = None, projection=None):
+    """
+    Complete a snapshot directory from vectors appended to a raw float32 file.
+
+    The payloads are already in the directory (see ``PayloadWriter``). The
+    vectors are copied into the ``.npy`` file block by block, so they are
+    never all held in memory.
+
+    Args:
+        path: Directory to write (created if missing)
+        raw_vectors_path: File of the vectors as consecutive float32 rows
+        dimension: Dimension of the vectors
+        count: Number of rows
+        documents: A payload of each document, for the corpus hash
+        metadata: More manifest entries, e.g. the embedding model and settings
+        projection: PCA projection of the vectors, if they were reduced
+    """
+    os.makedirs(path, exist_ok=True)
+
+    raw = np.memmap(raw_vectors_path, dtype=np.float32, mode='r', shape=(count, dimension))
+    vectors = np.lib.format.open_memmap(os.path.join(path, VECTORS_FILE), mode='w+',
+                                        dtype=np.float32, shape=(count, dimension))
+    for start in range(0, count, 65536):
+        vectors[start:start + 65536] = raw[start:start + 65536]
+    vectors.flush()
+    del raw, vectors
+
+    if projection is not None:
+        projection.save(os.path.join(path, PROJECTION_FILE))
+
+    manifest = dict(metadata or {})
+    manifest.update({
+        'version': SNAPSHOT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'count': count,
+        'dimension': dimension,
+        'normalized': True,
+        'chunker_version': CHUNKER_VERSION,
+        'corpus_hash': corpus_hash(documents)
+    })
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+
+
+class Snapshot:
+    """
+    Read access to a snapshot directory.
+
+    Attributes:
+        manifest: Contents of ``manifest.json``
+        vectors: Read-only memory map of the vectors
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a snapshot.
+
+        Args:
+            path (str): The snapshot directory
+
+        Raises:
+            ValueError: If the directory holds no snapshot of a supported version
+        """
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"'{path}' is not a snapshot: {MANIFEST_FILE} is missing")
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot '{path}' has format version {self.manifest.get('version')}, "
+                             f"expected {SNAPSHOT_VERSION}")
+
+        self.path = path
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r')
+        if self.vectors.shape != (self.manifest['count'], self.manifest['dimension']):
+            raise ValueError(f"Snapshot '{path}' has vectors of shape {self.vectors.shape}, expected "
+                             f"({self.manifest['count']}, {self.manifest['dimension']})")
+
+    def __len__(self) -> int:
+        return self.manifest['count']
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension of the vectors.
+        """
+        return self.manifest['dimension']
+
+    def projection(self):
+        """
+        Return the PCA projection saved with the snapshot, or None.
+        """
+        from dimension_reduction import PCAProjection
+
+        path = os.path.join(self.path, PROJECTION_FILE)
+        return PCAProjection.load(path) if os.path.exists(path) else None
+
+    def iter_batches(self, batch_size: int = 256) -> Iterator[Tuple[np.ndarray, List[str], List[Dict[str, Any]]]]:
+        """
+        Read the snapshot in batches of rows.
+
+        Args:
+            batch_size: Number of rows per batch
+
+        Yields:
+            The batch's vectors (copied out of the memory map), point IDs and payloads
+        """
+        start = 0
+        for rows in self._iter_payload_rows(batch_size):
+            ids = [row.pop('id') for row in rows]
+            for row in rows:
+                for field in _JSON_FIELDS:
+                    row[field] = json.loads(row[field])
+            yield np.array(self.vectors[start:start + len(rows)]), ids, rows
+            start += len(rows)
+
+    def _iter_payload_rows(self, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Read the payload table in batches of row dicts.
+        """
+        parquet_path = os.path.join(self.path, PARQUET_FILE)
+        if os.path.exists(parquet_path):
+            if pyarrow is None:
+                raise ImportError("Please install pyarrow to read Parquet snapshots: pip install pyarrow")
+            for batch in pyarrow.parquet.ParquetFile(parquet_path).iter_batches(batch_size=batch_size):
+                yield batch.to_pylist()
+            return
+
+        rows = []
+        with open(os.path.join(self.path, JSONL_FILE), 'r', encoding='utf-8') as f:
+            for line in f:
+                rows.append(json.loads(line))
+                if len(rows) == batch_size:
+                    yield rows
+                    rows = []
+        if rows:
+            yield rows
+
+
+def restore_to_qdrant(snapshot: Snapshot, client, alias: str, profile: str = None, batch_size: int = 256,
+                      manifest_path: str = None, settings: Dict[str, Any] = None) -> str:
+    """
+    Load a snapshot into a new collection version and switch the alias to it.
+
+    Args:
+        snapshot: The snapshot to restore
+        client: Qdrant client instance
+        alias: Name of the alias searches use
+        profile: Collection profile (defaults to the configured one)
+        batch_size: Number of points per upload request
+        manifest_path: Where to write the index manifest, so that later
+            indexer runs update the restored collection incrementally
+        settings: Index settings recorded in that manifest (defaults to
+            those the snapshot was built with, for this alias and profile)
+
+    Returns:
+        str: Name of the collection the alias now points to
+
+    Raises:
+        RuntimeError: If the restored collection fails its sanity check; it
+            is deleted and the alias keeps pointing at the old version
+    """
+    from dimension_reduction import projection_path
+    from qdrant_collections import (create_versioned_collection, finish_bulk_load, garbage_collect_versions,
+                                    switch_alias, verify_collection)
+    from qdrant_profiles import DEFAULT_PROFILE
+
+    profile = profile or DEFAULT_PROFILE
+    collection_name = create_versioned_collection(client, alias, snapshot.dimension, profile=profile)
+    manifest = IndexManifest(manifest_path, settings or dict(snapshot.manifest.get('settings', {}),
+                                                             collection=alias, qdrant_profile=profile))
+    chunks_by_file = {}
+    probe = None
+    try:
+        for vectors, ids, payloads in snapshot.iter_batches(batch_size):
+            client.upload_collection(collection_name=collection_name, vectors=vectors, payload=payloads, ids=ids,
+                                     batch_size=batch_size, wait=True)
+            if probe is None and ids:
+                probe = (ids[0], vectors[0].tolist())
+            for point_id, payload in zip(ids, payloads):
+                entry = chunks_by_file.setdefault(payload['file_path'], {
+                    'hash': payload['original_id'], 'ids': [], 'hashes': [], 'alias_files': set()})
+                entry['ids'].append(point_id)
+                entry['hashes'].append(chunk_hash(payload['content']))
+                entry['alias_files'].update(
+                    duplicate['file_path'] for duplicate in payload['aliases']
+                    if duplicate.get('file_path') and duplicate['file_path'] != payload['file_path'])
+
+        finish_bulk_load(client, collection_name)
+        verify_collection(client, collection_name, len(snapshot), *(probe or (None, None)))
+    except Exception:
+        client.delete_collection(collection_name)
+        raise
+
+    projection = snapshot.projection()
+    if projection is not None:
+        projection.save(projection_path(collection_name))
+
+    switch_alias(client, alias, collection_name)
+    garbage_collect_versions(client, alias)
+
+    if manifest_path:
+        for file_path, entry in chunks_by_file.items():
+            manifest.update_file(file_path, entry['hash'], entry['ids'], entry['hashes'], sorted(entry['alias_files']))
+        manifest.save()
+
+    print(f"Restored {len(snapshot)} points from '{snapshot.path}' into '{collection_name}'")
+    return collection_name
+
+
+def query_embedder(snapshot: Snapshot, cache=None, api_key: str = None):
+    """
+    Build the embedder for queries against the vectors of a snapshot.
+
+    Queries are reduced like the stored vectors, following the ``reduction``
+    setting of the snapshot: Matryoshka snapshots ask the model for the
+    smaller output dimension, PCA snapshots pass the full query vector
+    through the projection saved with them.
+
+    Args:
+        snapshot: The snapshot queried
+        cache: Embedding cache (defaults to the shared one)
+        api_key: API key of the Gemini backend (defaults to GEMINI_API_KEY)
+
+    Returns:
+        An embedder whose vectors have the dimension of the snapshot's
+    """
+    from dimension_reduction import ReducedEmbedder
+    from embedding_cache import CachedEmbedder
+    from embeddings import get_embedder
+
+    backend = snapshot.manifest.get('embedding_backend', 'gemini')
+    model = snapshot.manifest.get('embedding_model')
+    method, _, dimension = (snapshot.manifest.get('settings', {}).get('reduction') or '').partition(':')
+    if method == 'matryoshka':
+        return CachedEmbedder(get_embedder(backend, model, int(dimension), api_key=api_key), cache)
+
+    embedder = CachedEmbedder(get_embedder(backend, model, api_key=api_key), cache)
+    if method == 'pca':
+        projection = snapshot.projection()
+        if projection is None:
+            raise ValueError(f"Snapshot '{snapshot.path}' was reduced with PCA but has no {PROJECTION_FILE}")
+        return ReducedEmbedder(embedder, projection.apply)
+    return embedder
+
+
+def restore_to_faiss(snapshot: Snapshot, path: str, embeddings, index_type: str = None, batch_size: int = 4096):
+    """
+    Build a LangChain FAISS store from a snapshot and save it.
+
+    PCA-reduced snapshots cannot be restored: a FAISS store keeps no
+    projection to reduce its queries with.
+
+    Args:
+        snapshot: The snapshot to restore
+        path: Directory the store is saved to
+        embeddings: Embedder the store uses for queries (see ``query_embedder``)
+        index_type: FAISS index type (defaults to the configured one)
+        batch_size: Number of rows added at a time
+
+    Returns:
+        The FAISS vector store
+
+    Raises:
+        ValueError: If the snapshot is empty or was reduced with PCA
+    """
+    from langchain_community.vectorstores import FAISS
+
+    from faiss_indexes import DEFAULT_INDEX_TYPE, compress_store, save_params
+
+    if os.path.exists(os.path.join(snapshot.path, PROJECTION_FILE)):
+        raise ValueError(f"Snapshot '{snapshot.path}' was reduced with PCA; restore it into Qdrant instead")
+
+    vector_store = None
+    for vectors, ids, payloads in snapshot.iter_batches(batch_size):
+        text_embeddings = [(payload.pop('content'), vector) for payload, vector in zip(payloads, vectors)]
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=payloads, ids=ids)
+        else:
+            vector_store.add_embeddings(text_embeddings, metadatas=payloads, ids=ids)
+
+    if vector_store is None:
+        raise ValueError(f"Snapshot '{snapshot.path}' is empty")
+
+    params = compress_store(vector_store, index_type or DEFAULT_INDEX_TYPE)
+    vector_store.save_local(path)
+    save_params(path, params)
+
+    print(f"Restored {len(snapshot)} vectors from '{snapshot.path}' into the FAISS store '{path}'")
+    return vector_store
+
+
+def main():
+    """
+    Restore a snapshot into Qdrant or FAISS.
+    """
+    parser = argparse.ArgumentParser(description="Restore an index snapshot without re-embedding")
+    parser.add_argument('snapshot', help="Snapshot directory written by index_book.py --sinks snapshot")
+    parser.add_argument('--to', choices=('qdrant', 'faiss'), default='qdrant', help="Where to restore it")
+    parser.add_argument('--collection', default="embodied_intelligence_rag", help="Qdrant alias to restore under")
+    parser.add_argument('--profile', help="Qdrant collection profile")
+    parser.add_argument('--qdrant-location', help="In-process Qdrant to restore into: a directory (default: the server)")
+    parser.add_argument('--manifest', help="Index manifest to write for incremental updates afterwards")
+    parser.add_argument('--faiss-path', default="faiss_index_embodied_intelligence",
+                        help="Directory of the FAISS store")
+    parser.add_argument('--faiss-index', help="FAISS index type")
+    args = parser.parse_args()
+
+    snapshot = Snapshot(args.snapshot)
+    print(f"Snapshot of {len(snapshot)} {snapshot.dimension}-dimensional vectors "
+          f"({snapshot.manifest.get('embedding_model')}, corpus {snapshot.manifest['corpus_hash'][:12]})")
+
+    if args.to == 'qdrant':
+        from qdrant_collections import QDRANT_LOCATION, connect
+
+        client = connect(args.qdrant_location or QDRANT_LOCATION)
+        restore_to_qdrant(snapshot, client, args.collection, args.profile, manifest_path=args.manifest)
+    else:
+        # The store embeds queries reduced like the snapshot's vectors
+        restore_to_faiss(snapshot, args.faiss_path, query_embedder(snapshot), args.faiss_index)
+
+
+if __name__ == "__main__":
+    main()
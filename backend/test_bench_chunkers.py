@@ -0,0 +1,30 @@
+"""
+Tests for the chunker benchmark suite
+"""
+from bench_chunkers import compare_results, format_size, generate_corpus, parse_size, run_benchmarks
+
+
+def test_corpus_has_exact_size_and_docs_layout():
+    """Generated corpora are reproducible, exactly sized and shaped like the chapters"""
+    corpus = ''.join(generate_corpus(parse_size('100KB'), seed=1))
+
+    assert len(corpus.encode('utf-8')) == 100 * 1024
+    assert corpus == ''.join(generate_corpus(100 * 1024, seed=1))
+    assert corpus.startswith('---\ntitle: "Chapter 1')
+    assert '\n### ' in corpus and '\n```python\n' in corpus and '\n*   **' in corpus
+    assert format_size(parse_size('1GB')) == '1GB'
+
+
+def test_run_benchmarks_records_results_and_flags_regressions(tmp_path):
+    """A run reports throughput and chunk statistics that can be compared with a baseline"""
+    results = run_benchmarks([parse_size('16KB')], chunk_size=500, overlap=50, repeat=1,
+                             chunker_names=['context7.chunk_text'], cache_dir=str(tmp_path))
+
+    result = results['results'][0]
+    assert result['chunker'] == 'context7.chunk_text' and result['corpus_bytes'] == 16 * 1024
+    assert result['chunks']['count'] == sum(result['chunks']['histogram']) > 0
+    assert result['chunks']['max'] <= 500 + 50 and result['peak_memory_bytes'] > 0
+
+    faster = dict(results, results=[dict(result, mb_per_second=result['mb_per_second'] * 2)])
+    assert len(compare_results(results, faster)) == 1
+    assert compare_results(results, results) == []
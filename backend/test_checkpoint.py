@@ -0,0 +1,23 @@
+"""
+Tests for indexing checkpoints
+"""
+from checkpoint import Checkpoint
+
+
+def test_checkpoint_round_trip_and_interval(tmp_path):
+    """Progress survives a restart, is due after the interval and is tied to the run settings"""
+    now = [0.0]
+    path = str(tmp_path / 'checkpoint.json')
+    checkpoint = Checkpoint(path, {'chunk_size': 1000}, interval=30, clock=lambda: now[0])
+    assert checkpoint.load() is None and not checkpoint.due()
+
+    now[0] = 31.0
+    assert checkpoint.due()
+    checkpoint.save({'done': ['a', 'b']})
+    assert not checkpoint.due()
+
+    assert Checkpoint(path, {'chunk_size': 1000}).load() == {'done': ['a', 'b']}
+    assert Checkpoint(path, {'chunk_size': 500}).load() is None
+
+    checkpoint.clear()
+    assert checkpoint.load() is None
@@ -1,3 +1,5 @@
+import io
+import random
 import sys
 import context7
 
@@ -24,4 +26,179 @@ try:
     formatted_context = client.format_context(docs)
     print(f'Formatted context: {formatted_context}', file=sys.stdout)
 except Exception as e:
-    print(f"Error in format_context: {e}", file=sys.stderr)
\ No newline at end of file
+    print(f"Error in format_context: {e}", file=sys.stderr)
+
+def test_chunk_spans_slice_original_text():
+    """Chunks are verbatim slices of the input and respect chunk_size plus overlap"""
+    text = 'First sentence here. Second one follows! Is this the third? ' * 50
+    spans = client.chunk_spans(text, chunk_size=120, overlap=20)
+
+    assert spans
+    assert client.chunk_text(text, chunk_size=120, overlap=20) == [text[s:e] for s, e in spans]
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert start < next_start < end + 1
+    for start, end in spans:
+        assert end - start <= 120 + 20
+
+
+def test_chunk_spans_split_long_sentences_and_words():
+    """Sentences and words longer than chunk_size are split without exceeding it"""
+    text = 'word ' * 40 + 'x' * 75
+    spans = client.chunk_spans(text, chunk_size=30, overlap=0)
+
+    assert all(end - start <= 30 for start, end in spans)
+    assert ''.join(text[s:e] for s, e in spans).replace(' ', '') == text.replace(' ', '')
+
+
+def test_iter_chunks_matches_chunk_text_across_windows(tmp_path):
+    """Streaming a file through small windows yields the same chunks with byte offsets"""
+    text = 'Sensors fuse data. Actuators move the robot! Does the twin match reality? ' * 40 + 'Ünïcödé ✓. ' * 20
+    path = tmp_path / 'chapter.md'
+    path.write_text(text, encoding='utf-8')
+    raw = text.encode('utf-8')
+
+    chunks = list(client.iter_chunks(str(path), chunk_size=200, overlap=30, window_size=97))
+
+    assert [chunk['content'] for chunk in chunks] == client.chunk_text(text, chunk_size=200, overlap=30)
+    for chunk in chunks:
+        assert raw[chunk['start']:chunk['end']].decode('utf-8') == chunk['content']
+
+
+def test_chunk_markdown_keeps_code_fences_and_heading_paths():
+    """Code fences are not cut at '.' and every chunk carries its heading path"""
+    text = (
+        '---\ntitle: "Chapter 6"\nsidebar_position: 6\n---\n\n'
+        '# Chapter 6\n\n## Voice\n\nWhisper turns speech into text. It runs on the robot.\n\n'
+        '### Example\n\n```python\nimport rclpy\nrclpy.init()\nnode = rclpy.create_node("voice")\n'
+        'node.get_logger().info("ready")\n```\n\n'
+        '## Planning\n\n- Parse the goal.\n- Decompose it into actions.\n'
+    )
+    chunks = client.chunk_markdown(text, chunk_size=120)
+
+    assert chunks
+    assert all('sidebar_position' not in chunk['content'] for chunk in chunks)
+    for chunk in chunks:
+        assert chunk['content'] == text[chunk['start']:chunk['end']]
+        assert chunk['content'].count('```') % 2 == 0
+        assert len(chunk['content']) <= 120
+    assert any(chunk['heading_path'] == ['Chapter 6', 'Voice', 'Example'] for chunk in chunks)
+    assert context7.parse_front_matter(text)[0] == {'title': 'Chapter 6', 'sidebar_position': '6'}
+
+
+def test_token_budget_chunking_records_token_counts():
+    """In token mode chunks stay within the token budget and report their token count"""
+    token_client = context7.Context7Client(chunk_unit='tokens')
+    text = '# Kinematics\n\n' + 'Forward kinematics maps joint angles to the end-effector pose. ' * 60
+
+    chunks = token_client.chunk_markdown(text, chunk_size=80)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk['token_count'] == token_client.count_tokens(chunk['content'])
+        assert chunk['token_count'] <= 80
+    assert all(end - start for start, end in token_client.chunk_spans(text, chunk_size=80, overlap=10))
+
+
+def test_chunk_many_parallel_matches_serial():
+    """chunk_many returns the same chunks, in input order, with and without a process pool"""
+    documents = [f'# Chapter {i}\n\n' + f'Section {i} explains balance control. ' * (20 + i) for i in range(6)]
+
+    serial = client.chunk_many(documents, chunk_size=150, markdown=True, workers=1)
+    parallel = client.chunk_many(documents, chunk_size=150, markdown=True, workers=2, parallel_threshold=0)
+    with client.process_pool(2) as pool:
+        shared = [client.chunk_many([text], chunk_size=150, markdown=True, pool=pool)[0] for text in documents]
+
+    assert parallel == serial and shared == serial
+    assert [chunk['content'] for chunk in serial[3]] == [chunk['content'] for chunk in client.chunk_markdown(documents[3], 150)]
+    assert client.chunk_many(documents[:2], chunk_size=150, overlap=20)[1][0]['content'] == client.chunk_text(documents[1], 150, 20)[0]
+
+
+def test_format_context_packs_overlapping_chunks_into_budget():
+    """Overlapping chunks of one source are merged and the context respects the token budget"""
+    text = 'Bipedal robots balance with the zero moment point. ' * 30
+    chunks = [dict(chunk, source='chapter_5.md', title='Humanoids') for chunk in client.iter_chunks(
+        io.BytesIO(text.encode('utf-8')), chunk_size=300, overlap=60)]
+    docs = [dict(chunks[1], score=0.9), dict(chunks[0], score=0.8),
+            {'content': 'Unrelated filler text about simulation. ' * 40, 'source': 'chapter_3.md', 'score': 0.1}]
+
+    packed = client.pack_context(docs, token_budget=200)
+
+    assert len(packed) == 1
+    assert packed[0]['content'] == text[chunks[0]['start']:chunks[1]['end']]
+    assert client.count_tokens(client.format_context(docs, token_budget=200)) <= 200
+    assert client.format_context(docs).count('Document ') == 3
+
+
+def test_chunk_table_rows_view_shared_document_text():
+    """ChunkTable rows read like chunk dicts while storing each document once"""
+    text = 'Actuators convert energy into motion. Sensors close the loop. ' * 20
+    table = context7.ChunkTable()
+    table.add_document(text, {'id': 'doc', 'title': 'Actuators'}, client.chunk_markdown(text, 200))
+    table.add_stream({'id': 'stream', 'title': 'Actuators'},
+                     client.iter_chunks(io.BytesIO(text.encode('utf-8')), chunk_size=200, overlap=20))
+
+    assert [row['content'] for row in table][:len(table) // 2] == [chunk['content'] for chunk in client.chunk_markdown(text, 200)]
+    assert [row.content for row in table if row['original_id'] == 'stream'] == client.chunk_text(text, 200, 20)
+    assert table[1]['id'] == 'doc_chunk_1' and table[1]['title'] == 'Actuators'
+    assert len(table.texts) == 2 and table.starts.dtype.kind == 'i'
+
+    subset = table.take([0, 2], aliases={0: [{'source': 'copy.md'}]})
+    assert subset[0]['aliases'] == [{'source': 'copy.md'}] and subset[1]['aliases'] == []
+    assert subset[1]['content'] == table[2]['content'] and subset.texts is table.texts
+
+
+def test_content_defined_boundaries_resynchronize_after_edit():
+    """An edit near the top only changes the content-defined chunks around it"""
+    topics = ['balance', 'gait', 'torque', 'grasping', 'perception', 'locomotion', 'planning', 'control']
+    sentences = [f'Section {i} covers {topics[i % 8]} and {topics[i * 5 % 8]} for humanoid robot number {i * 7}.'
+                 for i in range(400)]
+    text = ' '.join(sentences)
+    edited = text.replace(sentences[3], sentences[3] + ' A new remark about actuators was added in this revision.')
+
+    cdc_client = context7.Context7Client(boundaries='content')
+    before = set(cdc_client.chunk_text(text, 600, 60))
+    after = cdc_client.chunk_text(edited, 600, 60)
+
+    assert sum(chunk not in before for chunk in after) <= 3
+    assert all(len(chunk) <= 600 for chunk in after)
+    streamed = cdc_client.iter_chunks(io.BytesIO(text.encode('utf-8')), chunk_size=600, overlap=60, window_size=2048)
+    assert [chunk['content'] for chunk in streamed] == cdc_client.chunk_text(text, 600, 60)
+
+
+def test_iter_chunks_matches_chunk_text_with_content_boundaries(tmp_path):
+    """Content-defined chunks streamed through windows smaller than a chunk match the in-memory ones"""
+    words = ['robot', 'gait', 'a', 'torque', 'sensorfusion', 'x' * 30, 'Ünï', '✓']
+    text = ' '.join(' '.join(words[(i * 7 + j * 3) % 8] for j in range(i % 23 + 1)) + '.!? ,'[i % 5]
+                    for i in range(300))
+    path = tmp_path / 'chapter.md'
+    path.write_text(text, encoding='utf-8')
+    raw = text.encode('utf-8')
+
+    cdc_client = context7.Context7Client(boundaries='content')
+    for chunk_size, window_size in ((20, 256), (50, 31), (100, 97)):
+        chunks = list(cdc_client.iter_chunks(str(path), chunk_size=chunk_size, overlap=chunk_size // 10,
+                                             window_size=window_size))
+
+        assert [chunk['content'] for chunk in chunks] == cdc_client.chunk_text(text, chunk_size, chunk_size // 10)
+        for chunk in chunks:
+            assert raw[chunk['start']:chunk['end']].decode('utf-8') == chunk['content']
+
+
+def test_iter_chunks_matches_chunk_spans_with_standalone_punctuation():
+    """Random texts with standalone terminators stream into the same chunks as chunk_spans, in both modes"""
+    words = ['alpha', 'delta', '!', '...', '?', '.', 'é', 'rclpy.', '\n', 'x' * 25, 'ros2', ',']
+    rng = random.Random(3)
+    for trial in range(60):
+        text = ' '.join(rng.choice(words) for _ in range(rng.randint(5, 120)))
+        chunk_client = context7.Context7Client(boundaries=('greedy', 'content')[trial % 2])
+        chunk_size = rng.choice([10, 20, 40])
+        overlap = rng.choice([0, chunk_size // 5])
+        raw = text.encode('utf-8')
+
+        chunks = list(chunk_client.iter_chunks(io.BytesIO(raw), chunk_size=chunk_size, overlap=overlap,
+                                               window_size=rng.choice([3, 7, 16])))
+
+        expected = [text[start:end] for start, end in chunk_client.chunk_spans(text, chunk_size, overlap)]
+        assert [chunk['content'] for chunk in chunks] == expected, (text, chunk_size, overlap)
+        for chunk in chunks:
+            assert raw[chunk['start']:chunk['end']].decode('utf-8') == chunk['content']
@@ -0,0 +1,61 @@
+"""
+Tests for exact and near-duplicate chunk elimination
+"""
+from context7 import ChunkTable
+from dedup import ChunkDeduplicator, deduplicate_table
+
+PARAGRAPH = ('A digital twin mirrors the physical robot in simulation so that controllers, '
+             'sensors and environments can be tested safely before deployment on real hardware. '
+             'Gazebo and Unity are commonly used to build these twins for humanoid platforms.')
+
+
+def test_exact_and_near_duplicates_map_to_first_chunk():
+    """Exact copies and lightly edited copies collapse onto the first occurrence"""
+    edited = PARAGRAPH.replace('hardware.', 'hardware!')
+    ros = 'ROS 2 nodes communicate over topics, services and actions.'
+    table = ChunkTable()
+    for source, text in (('docs/chapter_3.md', PARAGRAPH), ('docs/chapter_2.md', ros),
+                         ('docs/chapter_1.md', PARAGRAPH), ('docs/intro.md', edited)):
+        table.add_document(text, {'source': source}, [{'content': text, 'start': 0, 'end': len(text)}])
+
+    unique, earlier, removed = deduplicate_table(table, ChunkDeduplicator(threshold=0.8), range(len(table)))
+
+    assert [row['content'] for row in unique] == [PARAGRAPH, ros]
+    assert removed == {'exact': 1, 'near': 1} and earlier == {}
+    assert unique[0]['aliases'] == [
+        {'source': 'docs/chapter_1.md', 'start': 0, 'end': len(PARAGRAPH)},
+        {'source': 'docs/intro.md', 'start': 0, 'end': len(edited)},
+    ]
+    assert unique[1]['aliases'] == []
+
+
+def test_threshold_above_one_only_removes_exact_copies():
+    """Near-duplicate detection can be switched off"""
+    deduplicator = ChunkDeduplicator(threshold=1.1)
+
+    assert deduplicator.add('a', PARAGRAPH) == (None, '')
+    assert deduplicator.add('b', PARAGRAPH + ' Extra.') == (None, '')
+    assert deduplicator.add('c', PARAGRAPH) == ('a', 'exact')
+
+
+def test_tables_are_deduplicated_against_earlier_tables():
+    """Duplicates of chunks from an earlier table are reported by the key of their representative"""
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+    first = ChunkTable()
+    first.add_document(PARAGRAPH, {'file_path': 'ch3.md'}, [{'content': PARAGRAPH, 'start': 0, 'end': len(PARAGRAPH)}])
+    unique, earlier, removed = deduplicate_table(first, deduplicator, ['p1'])
+    assert len(unique) == 1 and earlier == {}
+
+    text = 'ROS 2 nodes communicate over topics. ' + PARAGRAPH
+    second = ChunkTable()
+    second.add_document(text, {'file_path': 'ch1.md'}, [
+        {'content': text[:37], 'start': 0, 'end': 37},
+        {'content': text[37:], 'start': 37, 'end': len(text)},
+        {'content': text[:37], 'start': 0, 'end': 37},
+    ])
+    unique, earlier, removed = deduplicate_table(second, deduplicator, ['q1', 'q2', 'q1'])
+
+    assert [row['content'] for row in unique] == [text[:37]]
+    assert unique[0]['aliases'] == [{'file_path': 'ch1.md', 'start': 0, 'end': 37}]
+    assert earlier == {'p1': [{'file_path': 'ch1.md', 'start': 37, 'end': len(text)}]}
+    assert removed == {'exact': 2, 'near': 0}
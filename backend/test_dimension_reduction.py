@@ -0,0 +1,39 @@
+"""
+Tests for reduced-dimension embeddings
+"""
+import numpy as np
+
+from dimension_reduction import PCAProjection, ReducedEmbedder, recall_report, truncate
+
+
+def low_rank_vectors(count=300, rank=8, dimension=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, rank)) @ rng.standard_normal((rank, dimension)) + 3.0
+
+
+def test_pca_keeps_neighbours_of_low_rank_vectors(tmp_path):
+    """A projection onto the spanned subspace preserves neighbours and survives a save/load round trip"""
+    vectors = low_rank_vectors()
+    projection = PCAProjection.fit(vectors, 16)
+    reduced = projection.apply(vectors)
+
+    assert reduced.shape == (300, 16) and np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+    assert recall_report(vectors, reduced, k=5) > 0.95
+
+    path = str(tmp_path / 'projections' / 'book_v1.npz')
+    projection.save(path)
+    assert np.allclose(PCAProjection.load(path).apply(vectors[:3]), reduced[:3], atol=1e-6)
+
+
+def test_reduced_embedder_and_truncation():
+    """Reduction applies to documents and queries alike and leaves failed chunks out"""
+    class Embedder:
+        def embed_documents(self, texts):
+            return [None if text == 'fail' else [3.0, 4.0, 12.0] for text in texts]
+
+        def embed_query(self, text):
+            return [3.0, 4.0, 12.0]
+
+    embedder = ReducedEmbedder(Embedder(), lambda vectors: truncate(vectors, 2))
+    assert embedder.embed_documents(['a', 'fail']) == [[0.6000000238418579, 0.800000011920929], None]
+    assert np.allclose(embedder.embed_query('q'), [0.6, 0.8])
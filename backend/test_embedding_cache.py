@@ -0,0 +1,82 @@
+"""
+Tests for the persistent embedding cache
+"""
+import numpy as np
+
+from embedding_cache import CachedEmbedder, EmbeddingCache, cache_key
+
+
+class CountingEmbedder:
+    """Deterministic fake embedder that records every text it is asked to embed"""
+    model = 'fake-embedding'
+    output_dimensionality = 4
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[len(text), text.count(' '), 0.5, -1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [len(text), 0.0, 0.0, 1.0]
+
+
+def test_rerun_on_unchanged_corpus_makes_no_embedding_calls(tmp_path):
+    """Vectors survive reopening the cache, and only new texts reach the embedder"""
+    path = str(tmp_path / 'cache.sqlite3')
+    texts = ['ROS 2 nodes publish topics.', 'URDF describes links and joints.', 'ROS 2 nodes publish topics.']
+
+    first = CountingEmbedder()
+    vectors = CachedEmbedder(first, EmbeddingCache(path), batch_size=1).embed_documents(texts)
+    assert first.calls == [[texts[0]], [texts[1]]]
+    assert vectors[0] == vectors[2] == [27.0, 4.0, 0.5, -1.0]
+
+    second = CountingEmbedder()
+    embedder = CachedEmbedder(second, EmbeddingCache(path))
+    assert embedder.embed_documents(texts) == vectors
+    assert embedder.embed_documents(texts + ['Gazebo simulates worlds.'])[:3] == vectors
+    assert second.calls == [['Gazebo simulates worlds.']]
+    assert (embedder.hits, embedder.misses) == (6, 1)
+
+    # Queries use their own task type, so the document vector is not reused
+    assert embedder.embed_query(texts[0]) == [27.0, 0.0, 0.0, 1.0]
+    assert embedder.embed_query(texts[0]) == [27.0, 0.0, 0.0, 1.0]
+    assert second.calls[-1] == [texts[0]] and len(second.calls) == 2
+
+
+def test_keys_separate_models_and_eviction_drops_least_recently_used():
+    """Keys depend on model, task and dimension; eviction keeps the cache under max_bytes"""
+    assert len({cache_key('a', 'retrieval_document', None, 'x'), cache_key('b', 'retrieval_document', None, 'x'),
+                cache_key('a', 'retrieval_query', None, 'x'), cache_key('a', 'retrieval_document', 256, 'x')}) == 4
+
+    cache = EmbeddingCache(':memory:', max_bytes=10 * 16)
+    keys = [cache_key('m', 't', 4, str(i)) for i in range(12)]
+    cache.put_many((key, 'm', 't', 4, [i, i, i, i]) for i, key in enumerate(keys[:8]))
+    cache.get_many(keys[:1])
+    cache.put_many((key, 'm', 't', 4, [i, i, i, i]) for i, key in enumerate(keys[8:], 8))
+
+    found = cache.get_many(keys)
+    assert cache.size_bytes() <= 10 * 16 and len(found) == len(cache) == 9
+    assert keys[0] in found and all(key in found for key in keys[8:])
+    assert found[keys[11]].dtype == np.float32 and found[keys[11]].tolist() == [11.0] * 4
+
+
+def test_embed_array_returns_one_float32_matrix(tmp_path):
+    """Cached and computed vectors land in one contiguous matrix; failed texts are left out"""
+    class FlakyEmbedder(CountingEmbedder):
+        def embed_documents(self, texts):
+            return [None if 'fail' in text else vector
+                    for text, vector in zip(texts, super().embed_documents(texts))]
+
+    embedder = CachedEmbedder(FlakyEmbedder(), EmbeddingCache(str(tmp_path / 'cache.sqlite3')))
+    embedder.embed_documents(['cached text'])
+
+    matrix, rows = embedder.embed_array(['new text here', 'please fail', 'cached text'])
+    assert rows == [0, 2]
+    assert matrix.dtype == np.float32 and matrix.flags['C_CONTIGUOUS']
+    assert matrix.tolist() == [[13.0, 2.0, 0.5, -1.0], [11.0, 1.0, 0.5, -1.0]]
+
+    empty, rows = embedder.embed_array([])
+    assert rows == [] and len(empty) == 0
@@ -0,0 +1,135 @@
+"""
+Tests for the batched, concurrent embedding engine against a local fake embedding server
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from embedding_engine import EmbeddingEngine, TokenBucket
+from embeddings import GeminiEmbedder
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    """Local stand-in for the Gemini batchEmbedContents endpoint"""
+    daemon_threads = True
+
+    def __init__(self, throttled_requests=0, delay=0.05):
+        super().__init__(('127.0.0.1', 0), FakeEmbeddingHandler)
+        self.throttled_requests = throttled_requests
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.batch_sizes = []
+        self.in_flight = self.max_in_flight = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body, headers=()):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        texts = [request['content']['parts'][0]['text'] for request in body.get('requests', [body])]
+
+        with server.lock:
+            throttled = server.throttled_requests > 0
+            server.throttled_requests -= throttled
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            if throttled:
+                return self._reply(429, {'error': {'message': 'quota exceeded'}}, [('Retry-After', '0')])
+            if any('POISON' in text for text in texts):
+                return self._reply(400, {'error': {'message': 'invalid content'}})
+            with server.lock:
+                server.batch_sizes.append(len(texts))
+            vectors = [{'values': [float(len(text)), float(text.count(' ')), 1.0]} for text in texts]
+            if ':embedContent' in self.path:
+                return self._reply(200, {'embedding': vectors[0]})
+            return self._reply(200, {'embeddings': vectors})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def server():
+    server = FakeEmbeddingServer(throttled_requests=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_engine_batches_concurrently_retries_and_dead_letters(server):
+    """Batches run in parallel, throttled requests are retried and bad chunks are dead-lettered"""
+    texts = [f'Chunk {i} about humanoid locomotion.' for i in range(40)]
+    texts[13] = 'POISON chunk that the API rejects.'
+    embedder = GeminiEmbedder(api_key='test', base_url=server.url)
+    engine = EmbeddingEngine(embedder, batch_size=8, max_workers=4, initial_backoff=0.01)
+
+    vectors = engine.embed_documents(texts)
+
+    assert vectors[13] is None
+    assert all(vector == [float(len(text)), float(text.count(' ')), 1.0]
+               for i, (text, vector) in enumerate(zip(texts, vectors)) if i != 13)
+    assert [(entry.index, entry.text) for entry in engine.dead_letter] == [(13, texts[13])]
+    assert engine.retries >= 2 and server.max_in_flight > 1
+    assert max(server.batch_sizes) == 8 and sum(server.batch_sizes) == 39
+    assert engine.embed_query('What is a ZMP?') == [14.0, 3.0, 1.0]
+
+
+def test_engine_dead_letters_whole_batches_when_retries_run_out():
+    """Batches that keep hitting the quota are dead-lettered whole instead of being split"""
+    server = FakeEmbeddingServer(throttled_requests=1000, delay=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        embedder = GeminiEmbedder(api_key='test', base_url=server.url)
+        engine = EmbeddingEngine(embedder, batch_size=8, max_workers=2, max_retries=2, initial_backoff=0.001)
+
+        vectors = engine.embed_documents([f'Chunk {i}' for i in range(16)])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert vectors == [None] * 16
+    assert sorted(entry.index for entry in engine.dead_letter) == list(range(16))
+    assert all(entry.attempts == 3 for entry in engine.dead_letter)
+    assert engine.requests == 2 * 3
+
+
+def test_token_bucket_waits_for_quota():
+    """Requests beyond the per-minute quota wait for the bucket to refill"""
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(per_minute=60, clock=lambda: now[0], sleep=sleep)
+
+    assert bucket.acquire(60) == 0
+    assert bucket.acquire(3) == pytest.approx(3.0)
+    assert bucket.acquire(600) == pytest.approx(60.0)
+    assert sum(waits) == pytest.approx(63.0)
@@ -0,0 +1,63 @@
+"""
+Tests for the local embedding backend
+"""
+import numpy as np
+import pytest
+
+import embeddings
+from embeddings import HashEmbedder, LocalEmbedder, get_embedder, length_batches
+
+
+class FakeSentenceTransformer:
+    """Stand-in for a sentence-transformers model that embeds a text as its word count"""
+    max_seq_length = 128
+    prompts = {'query': 'query: '}
+
+    def __init__(self):
+        self.calls = []
+
+    def tokenizer(self, texts, truncation=True, max_length=None):
+        return {'input_ids': [text.split()[:max_length] for text in texts]}
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, batch_size, prompt_name=None, truncate_dim=None, normalize_embeddings=True,
+               convert_to_numpy=True):
+        self.calls.append((list(texts), prompt_name))
+        return np.array([[len(text.split()), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_local_embedder_batches_by_length_and_keeps_input_order(monkeypatch):
+    """Texts of similar length share a forward pass, vectors come back in input order, queries use the prompt"""
+    assert length_batches([5, 100, 3, 50, 7, 100], max_tokens=200, max_size=4) == [[2, 0, 4, 3], [1, 5]]
+    assert length_batches([500], max_tokens=200) == [[0]]
+
+    model = FakeSentenceTransformer()
+    monkeypatch.setattr(embeddings, '_load_local_model', lambda *args: model)
+    embedder = LocalEmbedder('fake-model', runtime='torch', max_batch_tokens=8)
+    assert embedder.dimension == 2
+
+    texts = ['a b c d', 'a', 'a b c d e f g h', 'a b']
+    assert [vector[0] for vector in embedder.embed_documents(texts)] == [4, 1, 8, 2]
+    assert [call[0] for call in model.calls] == [['a', 'a b'], ['a b c d'], ['a b c d e f g h']]
+
+    assert embedder.embed_query('what is ZMP') == [3.0, 1.0]
+    assert model.calls[-1] == (['what is ZMP'], 'query')
+
+    with pytest.raises(ValueError):
+        get_embedder('remote')
+
+
+def test_hash_embedder_is_deterministic_and_lexical():
+    """Hash vectors are normalized, identical across instances and closer for texts sharing words"""
+    embedder = get_embedder('hash')
+    balance, control, ros = np.array(embedder.embed_documents([
+        'Humanoid robots balance with whole-body control',
+        'Whole-body control keeps humanoid robots balanced',
+        'ROS 2 nodes publish messages on topics']))
+
+    assert balance.shape == (768,) and np.isclose(np.linalg.norm(balance), 1.0)
+    assert balance @ control > balance @ ros
+    assert HashEmbedder().embed_query('Humanoid robots balance with whole-body control') == balance.tolist()
+    assert len(HashEmbedder(output_dimensionality=64).embed_query('torque sensing')) == 64
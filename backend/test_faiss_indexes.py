@@ -0,0 +1,64 @@
+"""
+Tests for FAISS index type selection
+"""
+import numpy as np
+import pytest
+
+from faiss_indexes import (choose_params, compress_store, exact_neighbors, factory_string, load_params, recall_at_k,
+                           sample_training_set, save_params)
+
+
+def test_params_are_sized_from_the_corpus():
+    """nlist grows with the corpus, PQ codes fit the dimension and small corpora are rejected"""
+    small = choose_params('IVFFlat', 10000, 768)
+    large = choose_params('IVFFlat', 1000000, 768)
+    assert small.nlist == 256 and large.nlist == 4096
+    assert 1 <= small.nprobe < small.nlist and small.training_size == 10000
+
+    pq = choose_params('IVFPQ', 1000000, 768)
+    assert factory_string(pq) == 'IVF4096,PQ64x8' and 768 % pq.pq_m == 0
+    assert factory_string(choose_params('HNSWFlat', 100, 768)) == 'HNSW32'
+
+    with pytest.raises(ValueError):
+        choose_params('IVFPQ', 52, 768)
+    with pytest.raises(ValueError):
+        choose_params('LSH', 1000, 768)
+
+
+def test_exact_neighbors_and_recall():
+    """Blockwise exact search matches brute force, and training samples are reproducible"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 16)).astype(np.float32)
+    queries = vectors[:20]
+
+    truth = exact_neighbors(vectors, queries, k=5, block_size=64)
+    distances = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    assert (truth[:, 0] == np.arange(20)).all()
+    assert recall_at_k(truth, np.argsort(distances, axis=1)[:, :5]) == 1.0
+    assert recall_at_k(truth[:, :1], truth[:, 1:2]) == 0.0
+
+    assert np.array_equal(sample_training_set(vectors, 100, seed=3), sample_training_set(vectors, 100, seed=3))
+    assert len(sample_training_set(vectors, 1000)) == 500
+
+
+def test_compressed_store_keeps_vector_positions(tmp_path):
+    """A flat store rebuilt as IVFFlat finds the same rows and reloads its tuned nprobe"""
+    faiss = pytest.importorskip('faiss')
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32)).astype(np.float32)
+    vectors = (centers[rng.integers(0, 20, 4000)] + 0.1 * rng.standard_normal((4000, 32))).astype(np.float32)
+
+    class Store:
+        index = faiss.IndexFlatL2(32)
+
+    store = Store()
+    store.index.add(vectors)
+    params = compress_store(store, 'IVFFlat', target_recall=0.9)
+
+    assert store.index.ntotal == 4000 and params.recall >= 0.9 and params.nprobe <= params.nlist
+    _, rows = store.index.search(vectors[:5], 1)
+    assert rows[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+    save_params(str(tmp_path), params)
+    assert load_params(str(tmp_path)) == params
@@ -0,0 +1,22 @@
+"""
+Tests for answer generation backends
+"""
+import pytest
+
+from generation import StubGenerativeModel, get_generative_model
+
+
+def test_stub_model_answers_from_the_context_with_simulated_latency():
+    """The stub answers deterministically from the prompt's context and waits like a real model"""
+    waits = []
+    model = StubGenerativeModel('gemini-pro', first_token_latency=0.4, token_latency=0.01, answer_tokens=5,
+                                sleep=waits.append)
+    prompt = "Answer the question.\nContext from the textbook:\nZero moment point keeps humanoids upright when walking"
+
+    response = model.generate_content(prompt)
+    assert response.text == "[gemini-pro stub] from the textbook: Zero moment"
+    assert waits == [pytest.approx(0.44)]
+    assert model.generate_content(prompt) == response
+
+    with pytest.raises(ValueError):
+        get_generative_model('gpt')
@@ -0,0 +1,36 @@
+"""
+Tests for the indexer's command line
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index_book
+
+
+def test_matryoshka_reduction_is_rejected_for_the_default_gemini_model(monkeypatch, capsys):
+    """--reduce matryoshka fails up front instead of sending outputDimensionality to embedding-001"""
+    monkeypatch.setattr(index_book, 'load_markdown_files', lambda docs_dir: pytest.fail("documents were loaded"))
+    monkeypatch.setattr(sys, 'argv', ['index_book.py', '--reduce', 'matryoshka', '--dimension', '256'])
+
+    with pytest.raises(SystemExit) as exit_info:
+        index_book.main()
+
+    assert exit_info.value.code == 2
+    assert 'embedding-001 cannot return Matryoshka vectors' in capsys.readouterr().err
+
+
+def test_pca_reduction_is_rejected_for_the_faiss_sink(monkeypatch, capsys):
+    """--reduce pca fails up front for FAISS stores, which cannot keep the projection queries need"""
+    monkeypatch.setattr(index_book, 'load_markdown_files', lambda docs_dir: pytest.fail("documents were loaded"))
+    monkeypatch.setattr(sys, 'argv', ['index_book.py', '--sinks', 'snapshot,faiss', '--embedding-backend', 'hash',
+                                      '--reduce', 'pca', '--dimension', '64'])
+
+    with pytest.raises(SystemExit) as exit_info:
+        index_book.main()
+
+    assert exit_info.value.code == 2
+    assert 'FAISS stores do not keep' in capsys.readouterr().err
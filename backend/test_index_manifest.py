@@ -0,0 +1,58 @@
+"""
+Tests for the incremental indexing manifest
+"""
+import uuid
+
+from index_manifest import IndexManifest, chunk_hash, derive_point_ids
+
+SETTINGS = {'chunk_size': 1000, 'embedding_model': 'embedding-001'}
+
+
+def test_diff_and_id_reuse_after_an_edit(tmp_path):
+    """Only edited files are re-indexed, and unchanged chunks keep their point IDs"""
+    path = str(tmp_path / 'manifest.json')
+    manifest = IndexManifest(path, SETTINGS)
+    first = [chunk_hash(text) for text in ('Nodes.', 'Topics.', 'Services.')]
+    ids, stale = manifest.assign_ids('ch2.md', first)
+    manifest.update_file('ch2.md', 'hash-a', ids, first)
+    twin_ids, _ = manifest.assign_ids('ch3.md', [chunk_hash('Twins.')])
+    manifest.update_file('ch3.md', 'hash-b', twin_ids, [chunk_hash('Twins.')])
+    manifest.update_file('old.md', 'hash-c', [99], ['x'])
+    manifest.save()
+
+    reloaded = IndexManifest.load(path, SETTINGS)
+    diff = reloaded.diff([{'file_path': 'ch2.md', 'id': 'hash-a2'}, {'file_path': 'ch3.md', 'id': 'hash-b'},
+                          {'file_path': 'ch4.md', 'id': 'hash-d'}])
+    assert [doc['file_path'] for doc in diff.added] == ['ch4.md']
+    assert [doc['file_path'] for doc in diff.changed] == ['ch2.md']
+    assert [doc['file_path'] for doc in diff.unchanged] == ['ch3.md']
+    assert diff.removed == ['old.md'] and reloaded.remove_file('old.md') == [99]
+
+    edited = [first[0], chunk_hash('Topics, edited.'), first[2]]
+    new_ids, stale = reloaded.assign_ids('ch2.md', edited)
+    assert new_ids[0] == ids[0] and new_ids[2] == ids[2] and new_ids[1] not in ids
+    assert stale == [ids[1]]
+
+    assert IndexManifest.load(path, dict(SETTINGS, chunk_size=500)).files == {}
+
+
+def test_files_aliased_onto_a_changed_file_are_reindexed(tmp_path):
+    """A duplicate stored only as an alias is re-indexed when its representative changes"""
+    manifest = IndexManifest(str(tmp_path / 'manifest.json'), SETTINGS)
+    manifest.update_file('intro.md', 'hash-a', [0], ['h'], alias_files=['copy.md'])
+    manifest.update_file('copy.md', 'hash-b', [], [])
+
+    diff = manifest.diff([{'file_path': 'intro.md', 'id': 'hash-a2'}, {'file_path': 'copy.md', 'id': 'hash-b'}])
+
+    assert sorted(doc['file_path'] for doc in diff.changed) == ['copy.md', 'intro.md'] and diff.unchanged == []
+
+
+def test_point_ids_are_derived_from_chunk_identity():
+    """IDs depend on file, content, occurrence and chunker version, not on chunk order"""
+    hashes = [chunk_hash(text) for text in ('Nodes.', 'Topics.', 'Nodes.')]
+    ids = derive_point_ids('ch2.md', hashes)
+
+    assert len(set(ids)) == 3 and all(uuid.UUID(point_id).version == 5 for point_id in ids)
+    assert derive_point_ids('ch2.md', hashes[1:2]) == ids[1:2]
+    assert derive_point_ids('ch3.md', hashes)[0] != ids[0]
+    assert derive_point_ids('ch2.md', hashes, chunker_version='2')[0] != ids[0]
@@ -0,0 +1,40 @@
+"""
+Tests for the indexer's sinks
+"""
+import json
+
+import numpy as np
+
+from context7 import ChunkTable
+from index_sinks import SnapshotSink, chunk_point_ids
+
+TEXT = 'Humanoid robots balance with whole-body control. Actuators need torque sensing.'
+
+
+def test_snapshot_sink_writes_vectors_and_payloads(tmp_path):
+    """Chunks written per document end up as one vector matrix with a payload row each"""
+    table = ChunkTable()
+    table.add_document(TEXT, {'file_path': 'ch5.md', 'title': 'Chapter 5', 'source': 'docs/ch5.md'}, [
+        {'content': TEXT[:48], 'start': 0, 'end': 48},
+        {'content': TEXT[49:], 'start': 49, 'end': len(TEXT)},
+    ])
+    point_ids = chunk_point_ids(table)
+
+    sink = SnapshotSink(str(tmp_path))
+    sink.write(table.take([0]), [[1.0, 0.0, 0.0]], point_ids[:1])
+    sink.write(table.take([1]), [[0.0, 1.0, 0.0]], point_ids[1:])
+    sink.add_aliases({point_ids[0]: [{'file_path': 'ch1.md', 'start': 0, 'end': 48}]})
+    assert sink.finish()
+
+    vectors = np.load(tmp_path / 'vectors.npy', mmap_mode='r')
+    assert vectors.dtype == np.float32 and vectors.tolist() == [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+    assert not (tmp_path / 'vectors.f32.partial').exists()
+
+    if (tmp_path / 'payloads.parquet').exists():
+        import pyarrow.parquet
+        rows = pyarrow.parquet.read_table(tmp_path / 'payloads.parquet').to_pylist()
+    else:
+        rows = [json.loads(line) for line in open(tmp_path / 'payloads.jsonl', encoding='utf-8')]
+    assert [row['id'] for row in rows] == point_ids
+    assert [row['content'] for row in rows] == [TEXT[:48], TEXT[49:]]
+    assert json.loads(rows[0]['aliases']) == [{'file_path': 'ch1.md', 'start': 0, 'end': 48}]
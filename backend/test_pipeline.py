@@ -0,0 +1,50 @@
+"""
+Tests for the bounded-queue indexing pipeline
+"""
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, PipelineError, Stage
+
+
+def test_stages_overlap_and_preserve_order():
+    """Concurrent workers keep the input order, and in-flight items stay bounded"""
+    in_flight = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def source():
+        for i in range(40):
+            with lock:
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            yield i
+
+    def slow(i):
+        # Later items finish first, so results have to be reordered
+        time.sleep(0.001 * (i % 4))
+        return i * 2
+
+    pipeline = Pipeline([Stage('double', slow, workers=4), Stage('inc', lambda i: i + 1, workers=2)])
+    results = []
+    for result in pipeline.run(source()):
+        results.append(result)
+        with lock:
+            in_flight['now'] -= 1
+
+    assert results == [i * 2 + 1 for i in range(40)]
+    assert in_flight['max'] < 25
+    assert pipeline.stats['double']['items'] == 40
+
+
+def test_stage_errors_stop_the_pipeline():
+    """An exception in a stage surfaces in the caller instead of hanging the threads"""
+    def fail(i):
+        if i == 3:
+            raise ValueError("bad item")
+        return i
+
+    pipeline = Pipeline([Stage('check', fail, workers=2)])
+    with pytest.raises(PipelineError, match="check"):
+        list(pipeline.run(range(100)))
@@ -0,0 +1,60 @@
+"""
+Tests for blue/green reindexing through Qdrant collection aliases
+"""
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from qdrant_collections import (collection_profile, create_versioned_collection, finish_bulk_load,
+                                garbage_collect_versions, list_versions, resolve_alias, switch_alias, verify_collection)
+from qdrant_profiles import DEFAULT_PROFILE
+
+ALIAS = 'book'
+
+
+def build_version(client, vectors):
+    """Load a new collection version the way the indexer does"""
+    name = create_versioned_collection(client, ALIAS, 2)
+    client.upsert(collection_name=name, points=[models.PointStruct(id=i, vector=v, payload={'name': name})
+                                                for i, v in enumerate(vectors)])
+    finish_bulk_load(client, name, timeout=10)
+    verify_collection(client, name, len(vectors), probe_id=0, probe_vector=vectors[0])
+    return name
+
+
+def test_switch_alias_and_garbage_collect():
+    """Each rebuild gets a new version, the alias follows it and old versions are dropped"""
+    client = QdrantClient(':memory:')
+    first = build_version(client, [[1.0, 0.0], [0.0, 1.0]])
+    switch_alias(client, ALIAS, first)
+    assert first == 'book_v1' and resolve_alias(client, ALIAS) == first
+
+    for _ in range(2):
+        name = build_version(client, [[1.0, 0.5], [0.5, 1.0], [1.0, 1.0]])
+        switch_alias(client, ALIAS, name)
+
+    # Searches through the alias see the newest version
+    hit = client.query_points(collection_name=ALIAS, query=[1.0, 0.5], limit=1).points[0]
+    assert hit.payload['name'] == 'book_v3'
+    assert client.count(collection_name=ALIAS, exact=True).count == 3
+
+    assert garbage_collect_versions(client, ALIAS, retain=2) == ['book_v1']
+    assert list_versions(client, ALIAS) == [2, 3] and resolve_alias(client, ALIAS) == 'book_v3'
+
+    # The profile a version was built with is recorded for the search side
+    low_memory = create_versioned_collection(client, ALIAS, 2, profile='low-memory')
+    assert collection_profile(client, low_memory) == 'low-memory'
+    assert collection_profile(client, 'book_v3') == DEFAULT_PROFILE
+
+
+def test_verification_rejects_incomplete_collections():
+    """A version with missing points never goes live"""
+    client = QdrantClient(':memory:')
+    name = create_versioned_collection(client, ALIAS, 2)
+    client.upsert(collection_name=name, points=[models.PointStruct(id=0, vector=[1.0, 0.0])])
+
+    with pytest.raises(RuntimeError):
+        verify_collection(client, name, 2)
+    with pytest.raises(RuntimeError):
+        verify_collection(client, name, 1, probe_id=5, probe_vector=[1.0, 0.0])
+    verify_collection(client, name, 1, probe_id=0, probe_vector=[1.0, 0.0])
@@ -0,0 +1,28 @@
+"""
+Tests for Qdrant collection profiles
+"""
+import pytest
+from qdrant_client.http import models
+
+from qdrant_profiles import PROFILES, collection_config, get_profile, search_params
+
+
+def test_profiles_configure_quantization_storage_and_search():
+    """Each profile builds a matching collection config and searches quantized vectors with rescoring"""
+    low_memory = collection_config(get_profile('low-memory'), 768)
+    assert isinstance(low_memory['quantization_config'], models.BinaryQuantization)
+    assert low_memory['vectors_config'].size == 768 and low_memory['vectors_config'].on_disk
+    assert low_memory['on_disk_payload']
+
+    low_latency = collection_config(get_profile('low-latency'), 768)
+    assert low_latency['quantization_config'].scalar.type == models.ScalarType.INT8
+    assert not low_latency['vectors_config'].on_disk
+    assert low_latency['hnsw_config'].m > low_memory['hnsw_config'].m
+
+    for profile in PROFILES.values():
+        params = search_params(profile)
+        assert params.hnsw_ef == profile.hnsw_ef
+        assert params.quantization.rescore and params.quantization.oversampling >= 1.0
+
+    with pytest.raises(ValueError):
+        get_profile('fastest')
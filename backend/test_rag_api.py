@@ -67,6 +67,39 @@ def test_environment():
 
     return True
 
+def test_query_setup_is_reused_until_the_alias_moves(tmp_path, monkeypatch):
+    """Queries reuse the resolved collection and embedder, and rebuild them only for a new collection"""
+    import pytest
+    pytest.importorskip('uvicorn')
+    from qdrant_client import QdrantClient
+
+    import rag_api
+    from embedding_cache import EmbeddingCache
+    from qdrant_collections import create_versioned_collection, switch_alias
+    from qdrant_profiles import get_profile, search_params
+
+    client = QdrantClient(':memory:')
+    first = create_versioned_collection(client, 'book', 768)
+    switch_alias(client, 'book', first)
+    monkeypatch.setattr(rag_api, 'qdrant_client', client)
+    monkeypatch.setattr(rag_api, 'embedding_cache', EmbeddingCache(str(tmp_path / 'cache.sqlite3')))
+    monkeypatch.setattr(rag_api, 'QDRANT_COLLECTION', 'book')
+    monkeypatch.setattr(rag_api, 'QUERY_SETUP_TTL', 60)
+    monkeypatch.setattr(rag_api, 'query_setup', None)
+
+    setup = rag_api.get_query_setup('key')
+    assert setup.collection_name == first and rag_api.get_query_setup('key') is setup
+
+    monkeypatch.setattr(rag_api, 'QUERY_SETUP_TTL', 0)
+    assert rag_api.get_query_setup('key').embedder is setup.embedder
+
+    second = create_versioned_collection(client, 'book', 768, profile='low-memory')
+    switch_alias(client, 'book', second)
+    moved = rag_api.get_query_setup('key')
+    assert moved.collection_name == second and moved.embedder is not setup.embedder
+    assert moved.search_params == search_params(get_profile('low-memory')) != setup.search_params
+
+
 if __name__ == "__main__":
     print("RAG API Environment Test")
     print("="*40)
@@ -0,0 +1,100 @@
+"""
+Tests for portable index snapshots
+"""
+import json
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+from context7 import CHUNKER_VERSION, ChunkTable
+from dimension_reduction import PCAProjection
+from embedding_cache import EmbeddingCache
+from embeddings import get_embedder
+from index_sinks import SnapshotSink, chunk_payload, chunk_point_ids
+from snapshot import PayloadWriter, Snapshot, corpus_hash, query_embedder, restore_to_qdrant
+
+TEXT = 'Humanoid robots balance with whole-body control. Actuators need torque sensing.'
+
+
+def test_snapshot_restores_into_qdrant_without_embedding(tmp_path):
+    """A snapshot records its corpus and loads into a new collection version with an index manifest"""
+    table = ChunkTable()
+    table.add_document(TEXT, {'file_path': 'ch5.md', 'title': 'Chapter 5', 'source': 'docs/ch5.md'}, [
+        {'content': TEXT[:48], 'start': 0, 'end': 48},
+        {'content': TEXT[49:], 'start': 49, 'end': len(TEXT)},
+    ])
+    point_ids = chunk_point_ids(table)
+
+    sink = SnapshotSink(str(tmp_path / 'snapshot'), {'embedding_model': 'models/embedding-001'})
+    sink.write(table, np.eye(3, dtype=np.float32)[:2], point_ids)
+    assert sink.finish()
+    assert not (tmp_path / 'snapshot.partial').exists()
+
+    snapshot = Snapshot(str(tmp_path / 'snapshot'))
+    assert len(snapshot) == 2 and snapshot.dimension == 3
+    assert snapshot.manifest['chunker_version'] == CHUNKER_VERSION
+    assert snapshot.manifest['embedding_model'] == 'models/embedding-001'
+    assert snapshot.manifest['corpus_hash'] == corpus_hash([chunk_payload(doc) for doc in table])
+
+    client = QdrantClient(':memory:')
+    manifest_path = str(tmp_path / 'manifest.json')
+    collection_name = restore_to_qdrant(snapshot, client, 'book', manifest_path=manifest_path)
+
+    assert client.get_aliases().aliases[0].collection_name == collection_name
+    assert client.count(collection_name).count == 2
+    point = client.retrieve(collection_name, [point_ids[1]], with_vectors=True)[0]
+    assert point.payload['content'] == TEXT[49:] and np.allclose(point.vector, [0.0, 1.0, 0.0])
+    with open(manifest_path, encoding='utf-8') as f:
+        assert [chunk['id'] for chunk in json.load(f)['files']['ch5.md']['chunks']] == point_ids
+
+
+def test_payload_writer_streams_row_groups_and_applies_late_aliases(tmp_path):
+    """Payloads are written a row group at a time; aliases of written rows are applied on close"""
+    payloads = [{'content': f'chunk {i}', 'original_id': 'doc', 'start': i, 'end': i + 1,
+                 'token_count': None if i < 2 else i, 'heading_path': [], 'aliases': [],
+                 'file_path': 'ch5.md', 'title': 'Chapter 5', 'source': 'docs/ch5.md'} for i in range(5)]
+    writer = PayloadWriter(str(tmp_path), row_group_size=2)
+    writer.write(['a', 'b'], payloads[:2])
+    writer.write(['c', 'd', 'e'], payloads[2:])
+    writer.add_aliases(0, [{'file_path': 'ch1.md'}])
+    writer.close()
+
+    (tmp_path / 'manifest.json').write_text(json.dumps({'version': 1, 'count': 5, 'dimension': 1}))
+    np.save(tmp_path / 'vectors.npy', np.ones((5, 1), dtype=np.float32))
+    rows = [row for _, ids, batch in Snapshot(str(tmp_path)).iter_batches(2) for row in zip(ids, batch)]
+
+    assert [point_id for point_id, _ in rows] == ['a', 'b', 'c', 'd', 'e']
+    assert [row['token_count'] for _, row in rows] == [None, None, 2, 3, 4]
+    assert rows[0][1]['aliases'] == [{'file_path': 'ch1.md'}] and rows[1][1]['aliases'] == []
+
+
+def test_reduced_snapshots_embed_queries_like_their_vectors(tmp_path):
+    """Queries against Matryoshka and PCA snapshots are reduced exactly like the stored vectors"""
+    topics = ['balance', 'gait', 'torque', 'grasping', 'perception', 'locomotion', 'planning', 'control']
+    texts = [f'Chapter {i} covers {topics[i % 8]} and {topics[i * 3 % 8]} of humanoid robot {i}.' for i in range(24)]
+    table = ChunkTable()
+    for i, text in enumerate(texts):
+        table.add_document(text, {'file_path': f'ch{i}.md', 'title': f'Chapter {i}', 'source': f'docs/ch{i}.md'},
+                           [{'content': text, 'start': 0, 'end': len(text)}])
+    full = get_embedder('hash')
+    projection = PCAProjection.fit(full.embed_documents(texts), 16)
+
+    for reduction, reduced in (('matryoshka:64', get_embedder('hash', output_dimensionality=64)),
+                               ('pca:16', None)):
+        vectors = (np.asarray(reduced.embed_documents(texts), dtype=np.float32) if reduced is not None
+                   else projection.apply(full.embed_documents(texts)).astype(np.float32))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        path = str(tmp_path / reduction.replace(':', '_'))
+        sink = SnapshotSink(path, {'embedding_backend': 'hash', 'embedding_model': full.model,
+                                   'settings': {'reduction': reduction}})
+        if reduced is None:
+            sink.projection = projection
+        sink.write(table, vectors, chunk_point_ids(table))
+        assert sink.finish()
+
+        snapshot = Snapshot(path)
+        embedder = query_embedder(snapshot, EmbeddingCache(str(tmp_path / 'cache.sqlite3')))
+        queries = np.asarray([embedder.embed_query(text) for text in texts])
+        assert queries.shape == (len(texts), snapshot.dimension)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        assert np.allclose(np.sum(queries * snapshot.vectors, axis=1), 1.0, atol=1e-5)
@@ -2,39 +2,99 @@
 Script to index the Physical AI & Humanoid Robotics textbook documents
 into a Qdrant vector database for RAG functionality.
 
+This is the single indexer entry point: one load/chunk/embed pass can also
+write a LangChain FAISS store and a NumPy/Parquet snapshot (--sinks), and
+--collection/--embedding-model build the collection other clients expect.
+A snapshot can later be loaded into Qdrant or FAISS without re-embedding
+(backend/snapshot.py).
+
 This script:
 1. Finds all "Regenerate 'index.md" files in the '../docs' or 'docs/' directory
-2. Uses Context7 to load and chunk the Markdown documents
-3. Generates embeddings using Google Generative AI (Gemini) SDK
-4. Initializes a local Qdrant client connection
-5. Creates a new Qdrant collection named 'embodied_intelligence_rag'
-6. Uploads all chunked, embedded documents to the Qdrant collection
+2. Compares them with the index manifest to find new, changed and removed files
+3. Initializes a local Qdrant client connection (or an in-process Qdrant,
+   in memory or on disk, with --qdrant-location)
+4. Streams the changed documents through a pipeline of concurrent stages
+   connected by bounded queues: Context7 chunking with duplicate removal,
+   embedding with Google Generative AI (Gemini) or a local CPU model
+   (--embedding-backend local, no network needed) and writing to every sink
+   (FAISS and snapshot sinks are rebuilt from all documents, with unchanged
+   chunks served from the embedding cache)
+5. Deletes points of chunks that no longer exist from the collection behind
+   the 'embodied_intelligence_rag' alias
+
+A full rebuild (with --full, or when there is no usable manifest) is loaded
+into a new versioned collection, checked, and then made live by switching
+the alias, so the RAG API keeps answering from the old version meanwhile.
+
+Progress is checkpointed while the documents are processed; after a crash,
+run with --resume to continue where the last checkpoint left off.
 """
 
 import os
 import sys
 import glob
-from typing import List, Dict
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Set, Tuple
 import hashlib
-from pathlib import Path
+
+import numpy as np
 
 # Add the backend directory to the Python path to import context7
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
 # Import required libraries
-from context7 import Context7Client
-
-try:
-    import qdrant_client
-    from qdrant_client import QdrantClient
-    from qdrant_client.http import models
-except ImportError:
-    raise ImportError("Please install qdrant-client: pip install qdrant-client")
-
-try:
-    import google.generativeai as genai
-except ImportError:
-    raise ImportError("Please install google-generativeai: pip install google-generativeai")
+from checkpoint import Checkpoint
+from context7 import CHUNKER_VERSION, Context7Client, ChunkTable
+from dedup import ChunkDeduplicator, deduplicate_table
+from dimension_reduction import (PCA_SAMPLE_SIZE, REDUCTION_METHODS, PCAProjection, ReducedEmbedder, normalize,
+                                 projection_path, prune_projections, recall_report, supports_matryoshka, truncate)
+from embeddings import DEFAULT_MODELS, EMBEDDING_BACKEND, EMBEDDING_BACKENDS, get_embedder
+from embedding_cache import CachedEmbedder, EmbeddingCache
+from embedding_engine import EmbeddingEngine
+from faiss_indexes import DEFAULT_INDEX_TYPE, INDEX_TYPES
+from index_manifest import IndexManifest, chunk_hash, derive_point_ids
+from index_sinks import SINK_NAMES, FaissSink, IndexSink, QdrantSink, SnapshotSink, chunk_point_ids
+from pipeline import Pipeline, Stage
+from qdrant_collections import QDRANT_LOCATION, connect, resolve_alias
+from qdrant_profiles import DEFAULT_PROFILE, PROFILES
+
+# Alias the RAG API searches; full rebuilds go to versioned collections behind it
+COLLECTION_NAME = "embodied_intelligence_rag"
+VECTOR_SIZE = 768  # Gemini embedding-001 produces 768-dimensional vectors
+MANIFEST_PATH = "index_manifest.json"
+CHECKPOINT_PATH = "index_checkpoint.json"
+EMBEDDING_MODEL = "embedding-001"
+FAISS_PATH = "faiss_index_embodied_intelligence"
+SNAPSHOT_PATH = "index_snapshot"
+
+# Texts handed to a local embedding model at a time, sorted by length into forward passes
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 512))
+
+# Everything that changes the stored points; a different value invalidates the manifest
+INDEX_SETTINGS = {
+    'collection': COLLECTION_NAME,
+    'markdown': True,
+    'chunk_size': 1000,
+    'chunk_unit': 'chars',
+    'boundaries': 'greedy',
+    'dedup_threshold': 0.9,
+    'chunker_version': CHUNKER_VERSION,
+    'embedding_model': EMBEDDING_MODEL,
+    'qdrant_profile': DEFAULT_PROFILE
+}
+
+# Worker threads per pipeline stage. Chunking threads hand Markdown documents
+# to a pool of as many processes, so chunking scales with the cores;
+# de-duplication is stateful and runs on one thread; embedding and writing
+# wait on the network or disk and overlap well.
+PIPELINE_WORKERS = {
+    'chunk': os.cpu_count() or 1,
+    'dedup': 1,
+    'embed': 2,
+    'write': 2
+}
 
 def load_markdown_files(docs_dir: str) -> List[Dict]:
     """
@@ -44,7 +104,7 @@ def load_markdown_files(docs_dir: str) -> List[Dict]:
         docs_dir: Path to the directory containing Markdown files
 
     Returns:
-        List of dictionaries with file content and metadata
+        List of dictionaries with file metadata (content is not read into memory)
     """
     print(f"Searching for 'Regenerate 'index.md' files in '{docs_dir}'...")
 
@@ -61,16 +121,18 @@ def load_markdown_files(docs_dir: str) -> List[Dict]:
     documents = []
     for file_path in all_files:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # Hash the file in blocks; the content itself is streamed later by the chunker
+            digest = hashlib.md5()
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b''):
+                    digest.update(block)
 
             # Create document metadata
             rel_path = os.path.relpath(file_path, docs_dir)
-            doc_id = hashlib.md5(content.encode()).hexdigest()
+            doc_id = digest.hexdigest()
 
             documents.append({
                 'id': doc_id,
-                'content': content,
                 'file_path': rel_path,
                 'title': os.path.basename(file_path),
                 'source': file_path
@@ -81,164 +143,407 @@ def load_markdown_files(docs_dir: str) -> List[Dict]:
 
     return documents
 
-def chunk_documents(documents: List[Dict]) -> List[Dict]:
+def chunk_document(ctx7: Context7Client, doc: Dict, markdown: bool = True, chunk_size: int = 1000,
+                   pool: ProcessPoolExecutor = None) -> ChunkTable:
     """
-    Use Context7 to chunk the loaded documents.
+    Chunk a single document, for the streaming pipeline.
 
     Args:
-        documents: List of documents loaded from Markdown files
+        ctx7: Context7 client configured with the chunk unit and boundaries
+        doc: Document metadata from load_markdown_files
+        markdown: Chunk along the Markdown structure instead of streaming sentence-based chunks
+        chunk_size: Target size of each chunk
+        pool: Process pool from ``ctx7.process_pool`` that chunks Markdown
+            documents outside this process (None chunks them here)
 
     Returns:
-        List of chunked document pieces
+        ChunkTable of the document's chunks (empty if it cannot be read)
     """
-    print("Chunking documents using Context7...")
-
-    # Initialize Context7Client
-    ctx7 = Context7Client()
+    table = ChunkTable()
+    try:
+        if markdown:
+            with open(doc['source'], 'r', encoding='utf-8') as f:
+                text = f.read()
+            if pool is not None:
+                chunks = ctx7.chunk_many([text], chunk_size=chunk_size, markdown=True, pool=pool)[0]
+            else:
+                chunks = ctx7.chunk_markdown(text, chunk_size=chunk_size)
+            table.add_document(text, doc, chunks)
+        else:
+            table.add_stream(doc, ctx7.iter_chunks(doc['source'], chunk_size=chunk_size))
+    except Exception as e:
+        print(f"Error chunking document {doc['id']}: {str(e)}")
+    return table
 
-    chunked_docs = []
-    for doc in documents:
-        try:
-            # Use Context7 to split content into chunks
-            chunks = ctx7.chunk_text(doc['content'])
+def sample_chunk_texts(documents: List[Dict], settings: Dict = INDEX_SETTINGS, size: int = PCA_SAMPLE_SIZE,
+                       seed: int = 0) -> List[str]:
+    """
+    Chunk the documents and draw a random sample of the chunk texts.
 
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{doc['id']}_chunk_{i}"
+    Args:
+        documents: The documents to sample from
+        settings: Chunking settings
+        size: Number of chunk texts to draw
+        seed: Seed of the sample
 
-                chunked_docs.append({
-                    'id': chunk_id,
-                    'content': chunk,
-                    'original_id': doc['id'],
-                    'file_path': doc['file_path'],
-                    'title': doc['title'],
-                    'source': doc['source']
-                })
+    Returns:
+        Up to ``size`` chunk texts, sampled uniformly without holding every chunk in memory
+    """
+    ctx7 = Context7Client(chunk_unit=settings['chunk_unit'], boundaries=settings['boundaries'])
+    rng = np.random.default_rng(seed)
+    sample = []
+    seen = 0
+    for doc in documents:
+        for row in chunk_document(ctx7, doc, markdown=settings['markdown'], chunk_size=settings['chunk_size']):
+            # Reservoir sampling
+            if len(sample) < size:
+                sample.append(row['content'])
+            else:
+                slot = rng.integers(0, seen + 1)
+                if slot < size:
+                    sample[slot] = row['content']
+            seen += 1
+    return sample
+
+def fit_projection(documents: List[Dict], embedder: CachedEmbedder, dimension: int,
+                   settings: Dict = INDEX_SETTINGS) -> PCAProjection:
+    """
+    Fit a PCA projection on the full vectors of a sample of the corpus and report its recall.
 
-        except Exception as e:
-            print(f"Error chunking document {doc['id']}: {str(e)}")
+    The sample is embedded through the cache, so the indexing pass that
+    follows reuses those vectors.
 
-    print(f"Created {len(chunked_docs)} chunks from {len(documents)} documents")
-    return chunked_docs
+    Args:
+        documents: The documents being indexed
+        embedder: Embedder of full-dimensional vectors
+        dimension: Output dimension of the projection
+        settings: Chunking settings
 
-def generate_embeddings(texts: List[str], gemini_api_key: str) -> List[List[float]]:
+    Returns:
+        The fitted projection
+    """
+    texts = sample_chunk_texts(documents, settings)
+    print(f"Fitting a {dimension}-dimensional PCA projection on {len(texts)} sample chunks...")
+    vectors = [vector for vector in embedder.embed_documents(texts) if vector is not None]
+    projection = PCAProjection.fit(vectors, dimension)
+    recall_report(vectors, projection.apply(vectors))
+    return projection
+
+def report_truncation(documents: List[Dict], embedder: CachedEmbedder, dimension: int,
+                      settings: Dict = INDEX_SETTINGS) -> float:
     """
-    Generate embeddings for the given texts using Gemini.
+    Report the recall of Matryoshka vectors truncated to ``dimension`` on a sample of the corpus.
 
     Args:
-        texts: List of text chunks to embed
-        gemini_api_key: API key for Google Generative AI
+        documents: The documents being indexed
+        embedder: Embedder of full-dimensional vectors
+        dimension: Requested output dimension
+        settings: Chunking settings
 
     Returns:
-        List of embeddings (vectors)
+        Recall@10 of the truncated vectors against the full ones
     """
-    print(f"Generating embeddings for {len(texts)} text chunks using Gemini...")
-
-    # Configure the Gemini API
-    genai.configure(api_key=gemini_api_key)
+    vectors = [vector for vector in embedder.embed_documents(sample_chunk_texts(documents, settings))
+               if vector is not None]
+    return recall_report(vectors, truncate(vectors, dimension))
 
-    # Select the embedding model
-    embedding_model = "embedding-001"  # Gemini embedding model
+def create_embedder(gemini_api_key: str, cache: EmbeddingCache = None, model: str = EMBEDDING_MODEL,
+                    output_dimensionality: int = None,
+                    backend: str = 'gemini') -> Tuple[CachedEmbedder, Optional[EmbeddingEngine]]:
+    """
+    Build the embedder used for indexing.
 
-    embeddings = []
-    for i, text in enumerate(texts):
-        try:
-            # Generate embedding for the text
-            result = genai.embed_content(
-                model=embedding_model,
-                content=text,
-                task_type="retrieval_document",  # Appropriate task type for RAG
-                title=None  # We can add title if needed
-            )
+    Args:
+        gemini_api_key: API key for Google Generative AI (unused by the local backend)
+        cache: Embedding cache to use (defaults to the shared on-disk cache)
+        model: Name of the embedding model
+        output_dimensionality: Reduced vector size to request from the model
+            (None for its full size)
+        backend: 'gemini' for the Gemini API, 'local' for a CPU model or
+            'hash' for deterministic offline vectors
 
-            embedding = result['embedding']
-            embeddings.append(embedding)
+    Returns:
+        The cached embedder to call, and the engine behind it (for its
+        statistics and dead-letter list; None for the other backends)
+    """
+    if backend != 'gemini':
+        # Local embedders have no quota or transient failures to manage; a
+        # local model gets large batches and regroups them by length itself
+        local = get_embedder(backend, model, output_dimensionality)
+        return CachedEmbedder(local, cache, batch_size=LOCAL_BATCH_SIZE), None
+
+    # Gemini embedding model behind the batching engine and the persistent cache
+    engine = EmbeddingEngine(get_embedder('gemini', model, output_dimensionality, api_key=gemini_api_key))
+    embedder = CachedEmbedder(engine, cache, batch_size=engine.batch_size * engine.max_workers)
+    return embedder, engine
+
+def report_embeddings(embedder: CachedEmbedder, engine: Optional[EmbeddingEngine],
+                      dead_letter_path: str = "embedding_dead_letter.json"):
+    """
+    Print embedding statistics and write the chunks that could not be embedded to a file.
 
-            # Progress indicator
-            if (i + 1) % 10 == 0 or (i + 1) == len(texts):
-                print(f"Generated embeddings for {i + 1}/{len(texts)} chunks")
+    Args:
+        embedder: The cached embedder from create_embedder
+        engine: The engine behind it (None for the local backends)
+        dead_letter_path: JSON file listing the chunks that could not be embedded
+    """
+    if engine is None:
+        print(f"Embedding cache: {embedder.hits} hits, {embedder.misses} chunks embedded locally")
+        return
 
-        except Exception as e:
-            print(f"Error generating embedding for chunk {i}: {str(e)}")
-            # Add a zero vector in case of error to maintain alignment
-            embeddings.append([0.0] * 768)  # Assuming 768-dim vector
+    print(f"Embedding cache: {embedder.hits} hits, {embedder.misses} chunks embedded "
+          f"in {engine.requests} requests ({engine.retries} retries)")
 
-    return embeddings
+    if engine.dead_letter:
+        # The engine numbers its entries within each batch, which means nothing across batches
+        with open(dead_letter_path, 'w', encoding='utf-8') as f:
+            json.dump([{'text': entry.text, 'error': entry.error, 'attempts': entry.attempts}
+                       for entry in engine.dead_letter], f, indent=2)
+        print(f"Could not embed {len(engine.dead_letter)} chunks; they are listed in '{dead_letter_path}'")
 
-def setup_qdrant_collection(client: QdrantClient, collection_name: str):
+def assign_point_ids(manifest: IndexManifest, documents: List[Dict], chunked_docs: ChunkTable,
+                     incomplete: Set[str] = frozenset()) -> Tuple[List[str], List[str]]:
     """
-    Create or reset a Qdrant collection for storing embeddings.
+    Give every chunk a point ID and record the re-indexed files in the manifest.
+
+    Point IDs are derived from the file path, chunk hash and chunker version,
+    so chunks whose content was already indexed for the same file map to
+    their existing points, which are overwritten in place.
 
     Args:
-        client: Qdrant client instance
-        collection_name: Name of the collection to create
+        manifest: The index manifest
+        documents: The documents that were re-chunked
+        chunked_docs: ChunkTable of their chunks that are about to be uploaded
+        incomplete: File paths with chunks that could not be embedded; they
+            are recorded without a hash so the next run retries them
+
+    Returns:
+        Point ID of each chunk, and the IDs of previous chunks that are gone
     """
-    print(f"Setting up Qdrant collection: {collection_name}")
+    rows_by_file = {}
+    alias_files = {}
+    for row, doc in enumerate(chunked_docs):
+        rows_by_file.setdefault(doc['file_path'], []).append(row)
+        for alias in doc['aliases']:
+            if alias.get('file_path') and alias['file_path'] != doc['file_path']:
+                alias_files.setdefault(doc['file_path'], set()).add(alias['file_path'])
+
+    point_ids = [None] * len(chunked_docs)
+    stale_ids = []
+    for doc in documents:
+        file_path = doc['file_path']
+        rows = rows_by_file.get(file_path, [])
+        hashes = [chunk_hash(chunked_docs[row]['content']) for row in rows]
 
-    # Check if collection exists and delete if it does
-    try:
-        client.get_collection(collection_name)
-        print(f"Collection '{collection_name}' exists, deleting it...")
-        client.delete_collection(collection_name)
-        print("Old collection deleted")
-    except:
-        print("Collection does not exist yet")
-
-    # Create new collection with appropriate vector size (assuming Gemini embedding-001)
-    # Note: Gemini embedding-001 typically produces 768-dimensional vectors
-    vector_size = 768
-
-    client.create_collection(
-        collection_name=collection_name,
-        vectors_config=models.VectorParams(
-            size=vector_size,
-            distance=models.Distance.COSINE
-        )
-    )
-
-    print(f"Collection '{collection_name}' created successfully")
-
-def upload_to_qdrant(client: QdrantClient, collection_name: str,
-                    chunked_docs: List[Dict], embeddings: List[List[float]]):
+        ids, stale = manifest.assign_ids(file_path, hashes)
+        for row, point_id in zip(rows, ids):
+            point_ids[row] = point_id
+        stale_ids.extend(stale)
+
+        manifest.update_file(file_path, None if file_path in incomplete else doc['id'], ids, hashes,
+                             sorted(alias_files.get(file_path, ())))
+
+    return point_ids, stale_ids
+
+def index_documents(documents: List[Dict], sinks: List[IndexSink], embedder: CachedEmbedder,
+                    settings: Dict = INDEX_SETTINGS, manifest: IndexManifest = None, changed: Set[str] = None,
+                    on_document: Callable[[List[str]], None] = None) -> Tuple[List[str], Optional[Tuple]]:
     """
-    Upload chunked documents and their embeddings to Qdrant.
+    Chunk, embed and write documents one at a time through a pipeline of concurrent stages.
+
+    Only a few documents are in flight at once, so memory does not grow with
+    the corpus, and embedding and write requests overlap with chunking.
+    Markdown documents are chunked in a process pool, several at a time. Each
+    document is written to all sinks concurrently. Incremental sinks only
+    get the documents in ``changed``, which are recorded in the manifest
+    once their points (and the aliases of their duplicates) are stored.
 
     Args:
-        client: Qdrant client instance
-        collection_name: Name of the collection to upload to
-        chunked_docs: List of chunked document dictionaries
-        embeddings: List of embeddings corresponding to the documents
+        documents: The documents to index
+        sinks: Destinations of the chunks
+        embedder: Embedder from create_embedder
+        settings: Chunking and de-duplication settings
+        manifest: The index manifest of the incremental sinks
+        changed: File paths of the new and changed documents (defaults to all)
+        on_document: Called with the stale point IDs found so far after each
+            changed document is recorded, e.g. to write a checkpoint
+
+    Returns:
+        IDs of previous points that are no longer used, and the ID and vector
+        of one written point for a sanity check (None if nothing was written)
     """
-    print(f"Uploading {len(chunked_docs)} documents to Qdrant collection: {collection_name}")
-
-    # Prepare points for Qdrant
-    points = []
-    for i, (doc, embedding) in enumerate(zip(chunked_docs, embeddings)):
-        point = models.PointStruct(
-            id=i,
-            vector=embedding,
-            payload={
-                'content': doc['content'],
-                'original_id': doc['original_id'],
-                'file_path': doc['file_path'],
-                'title': doc['title'],
-                'source': doc['source']
-            }
-        )
-        points.append(point)
-
-    # Upload points to Qdrant
-    client.upload_points(
-        collection_name=collection_name,
-        points=points,
-        batch_size=64
-    )
-
-    print(f"Successfully uploaded {len(points)} documents to Qdrant")
+    ctx7 = Context7Client(chunk_unit=settings['chunk_unit'], boundaries=settings['boundaries'])
+    deduplicator = ChunkDeduplicator(threshold=settings['dedup_threshold'])
+    if changed is None:
+        changed = {doc['file_path'] for doc in documents}
+    chunkers = None
+    if settings['markdown'] and PIPELINE_WORKERS['chunk'] > 1:
+        # The first task forks all workers; do that before the writer and
+        # pipeline threads exist, since forking a threaded process can deadlock
+        chunkers = ctx7.process_pool(PIPELINE_WORKERS['chunk'])
+        chunkers.submit(int).result()
+    writers = ThreadPoolExecutor(max_workers=len(sinks) * PIPELINE_WORKERS['write'])
+    counts = {'chunks': 0, 'exact': 0, 'near': 0}
+
+    def chunk(doc):
+        table = chunk_document(ctx7, doc, markdown=settings['markdown'], chunk_size=settings['chunk_size'],
+                               pool=chunkers)
+        return {'doc': doc, 'chunks': table, 'changed': doc['file_path'] in changed}
+
+    def dedup(unit):
+        # Repeated boilerplate is embedded only once, also across documents;
+        # chunks are keyed by the point ID they get if they are kept
+        table = unit['chunks']
+        keys = [derive_point_ids(row['file_path'], [chunk_hash(row['content'])])[0] for row in table]
+        unit['chunks'], unit['late_aliases'], removed = deduplicate_table(table, deduplicator, keys)
+        counts['chunks'] += len(table)
+        counts['exact'] += removed['exact']
+        counts['near'] += removed['near']
+        return unit
+
+    def embed(unit):
+        # Chunks that could not be embedded are left out rather than indexed with a fake vector
+        table = unit['chunks']
+        embeddings, embedded_rows = embedder.embed_array([row['content'] for row in table])
+        unit['incomplete'] = len(embedded_rows) < len(table)
+        if unit['incomplete']:
+            unit['chunks'] = table.take(embedded_rows)
+        # One contiguous float32 matrix per document, normalized in place for cosine distance
+        unit['embeddings'] = normalize(embeddings, out=embeddings) if len(embedded_rows) else embeddings
+        return unit
+
+    def targets(unit):
+        return [sink for sink in sinks if unit['changed'] or not sink.incremental]
+
+    def write(unit):
+        # Every sink gets the document at the same time; Qdrant upserts are idempotent
+        if len(unit['embeddings']):
+            point_ids = chunk_point_ids(unit['chunks'])
+            futures = [writers.submit(sink.write, unit['chunks'], unit['embeddings'], point_ids)
+                       for sink in targets(unit)]
+            for future in futures:
+                future.result()
+        return unit
+
+    pipeline = Pipeline([
+        Stage('chunk', chunk, PIPELINE_WORKERS['chunk']),
+        Stage('dedup', dedup, PIPELINE_WORKERS['dedup']),
+        Stage('embed', embed, PIPELINE_WORKERS['embed']),
+        Stage('write', write, PIPELINE_WORKERS['write'])
+    ])
+
+    print(f"Indexing {len(documents)} documents into {', '.join(sink.name for sink in sinks)}...")
+    stale_ids = []
+    probe = None
+    try:
+        for unit in pipeline.run(documents):
+            doc = unit['doc']
+            if probe is None and unit['changed'] and len(unit['embeddings']):
+                probe = (chunk_point_ids(unit['chunks'])[0], unit['embeddings'][0].tolist())
+
+            # Representatives from earlier documents are already stored, since results arrive in order
+            alias_files = {}
+            for sink in targets(unit):
+                for file_path, files in sink.add_aliases(unit['late_aliases']).items():
+                    alias_files.setdefault(file_path, set()).update(files)
+
+            if manifest is not None and unit['changed']:
+                incomplete = {doc['file_path']} if unit['incomplete'] else set()
+                _, replaced_ids = assign_point_ids(manifest, [doc], unit['chunks'], incomplete)
+                stale_ids.extend(replaced_ids)
+                for file_path, files in alias_files.items():
+                    manifest.add_alias_files(file_path, files)
+
+                if on_document:
+                    on_document(stale_ids)
+    finally:
+        writers.shutdown()
+        if chunkers is not None:
+            chunkers.shutdown()
+
+    print(f"Kept {counts['chunks'] - counts['exact'] - counts['near']} of {counts['chunks']} chunks "
+          f"({counts['exact']} exact and {counts['near']} near-duplicates removed)")
+    print(pipeline.summary())
+    return stale_ids, probe
 
 def main():
     """
     Main function to orchestrate the indexing process.
     """
+    parser = argparse.ArgumentParser(description="Index the textbook into the Qdrant collection used by the RAG API "
+                                                 "and, optionally, a FAISS store and a NumPy/Parquet snapshot")
+    parser.add_argument('--sinks', default='qdrant',
+                        help=f"Comma-separated destinations of the index: {', '.join(SINK_NAMES)}")
+    parser.add_argument('--collection', default=COLLECTION_NAME, help="Qdrant alias the index is served under")
+    parser.add_argument('--embedding-backend', default=EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS,
+                        help="Embed with the Gemini API, a local CPU model or deterministic word hashing "
+                             "(the last two fully offline)")
+    parser.add_argument('--embedding-model',
+                        help=f"Embedding model (defaults to {DEFAULT_MODELS['gemini']} for gemini "
+                             f"and {DEFAULT_MODELS['local']} for local)")
+    parser.add_argument('--qdrant-location', default=QDRANT_LOCATION,
+                        help="Use an in-process Qdrant instead of the server: ':memory:' (gone when the "
+                             "run ends) or a directory to keep it in")
+    parser.add_argument('--faiss-path', default=FAISS_PATH, help="Directory of the FAISS store")
+    parser.add_argument('--faiss-index', default=DEFAULT_INDEX_TYPE, choices=INDEX_TYPES,
+                        help="Index type of the FAISS store; all but Flat are approximate and trained on a sample")
+    parser.add_argument('--snapshot-path', default=SNAPSHOT_PATH, help="Directory of the NumPy/Parquet snapshot")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=list(PROFILES),
+                        help="Qdrant collection profile (HNSW, quantization and on-disk storage); "
+                             "changing it rebuilds the collection")
+    parser.add_argument('--reduce', default='none', choices=REDUCTION_METHODS,
+                        help="Store reduced vectors: request a smaller output dimension from the model "
+                             "(matryoshka) or fit a PCA projection saved with the index (pca; qdrant and "
+                             "snapshot sinks only)")
+    parser.add_argument('--dimension', type=int, help="Dimension of the reduced vectors, e.g. 384")
+    parser.add_argument('--full', action='store_true',
+                        help="Rebuild every file into a new collection version instead of updating the live one")
+    parser.add_argument('--manifest', help="Path of the index manifest (defaults to one per collection)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its last checkpoint")
+    parser.add_argument('--checkpoint', help="Path of the progress checkpoint (defaults to one per collection)")
+    args = parser.parse_args()
+
+    sink_names = [name.strip() for name in args.sinks.split(',') if name.strip()]
+    unknown = [name for name in sink_names if name not in SINK_NAMES]
+    if unknown or not sink_names:
+        parser.error(f"Unknown sinks '{args.sinks}'; choose from {', '.join(SINK_NAMES)}")
+    args.embedding_model = args.embedding_model or DEFAULT_MODELS[args.embedding_backend]
+    full_size = VECTOR_SIZE
+    if args.embedding_backend != 'gemini':
+        try:
+            full_size = get_embedder(args.embedding_backend, args.embedding_model).dimension
+        except ImportError as e:
+            parser.error(str(e))
+    if args.reduce != 'none' and not 0 < (args.dimension or 0) < full_size:
+        parser.error(f"--reduce {args.reduce} needs a --dimension below {full_size}")
+    if args.reduce == 'matryoshka' and not supports_matryoshka(args.embedding_backend, args.embedding_model):
+        parser.error(f"{args.embedding_model} cannot return Matryoshka vectors; use --reduce pca "
+                     f"or a model such as text-embedding-004")
+    if args.reduce == 'pca' and 'faiss' in sink_names:
+        # A FAISS store keeps no projection, so its queries could not be reduced like its vectors
+        parser.error("--reduce pca needs the projection at query time, which FAISS stores do not keep; "
+                     "use the qdrant or snapshot sinks, or --reduce matryoshka")
+
+    # Each collection has its own manifest and checkpoint
+    settings = dict(INDEX_SETTINGS, collection=args.collection, embedding_model=args.embedding_model,
+                    qdrant_profile=args.profile)
+    vector_size = full_size
+    if args.reduce != 'none':
+        # Vectors of different reductions cannot share a collection
+        settings['reduction'] = f"{args.reduce}:{args.dimension}"
+        vector_size = args.dimension
+    suffix = '' if args.collection == COLLECTION_NAME else f"_{args.collection}"
+    if args.qdrant_location == ':memory:':
+        # An in-memory index never outlives the run, so its manifest must not pass for the server's
+        suffix += '_memory'
+    manifest_path = args.manifest or MANIFEST_PATH.replace('.json', f"{suffix}.json")
+    checkpoint_path = args.checkpoint or CHECKPOINT_PATH.replace('.json', f"{suffix}.json")
+    if args.qdrant_location and args.qdrant_location != ':memory:':
+        # An on-disk store keeps its manifest and checkpoint with it
+        manifest_path = args.manifest or os.path.join(args.qdrant_location, manifest_path)
+        checkpoint_path = args.checkpoint or os.path.join(args.qdrant_location, checkpoint_path)
+
     print("Starting Physical AI & Humanoid Robotics textbook indexing process...")
 
     # Define the docs directory - try both possible locations
@@ -261,7 +566,7 @@ def main():
 
     # Get Gemini API key from environment variable or user input
     gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
+    if not gemini_api_key and args.embedding_backend == 'gemini':
         gemini_api_key = input("Please enter your Gemini API key: ").strip()
         if not gemini_api_key:
             print("Error: Gemini API key is required.")
@@ -273,42 +578,152 @@ def main():
         print("No 'Regenerate 'index.md' documents found to index.")
         return
 
-    # Step 2: Chunk the documents
-    chunked_docs = chunk_documents(documents)
-    if not chunked_docs:
-        print("No chunks created from documents.")
-        return
-
-    # Extract text content for embedding
-    texts_to_embed = [doc['content'] for doc in chunked_docs]
+    embedder, engine = create_embedder(gemini_api_key, model=args.embedding_model, backend=args.embedding_backend)
+    full_embedder = embedder
+    if args.reduce == 'matryoshka':
+        embedder, engine = create_embedder(gemini_api_key, model=args.embedding_model,
+                                           output_dimensionality=args.dimension, backend=args.embedding_backend)
+
+    sinks = []
+    qdrant = None
+    projection_file = None
+    checkpoint = None
+    manifest = None
+    changed_docs = documents
+    stale_ids = []
+    if 'qdrant' in sink_names:
+        # Step 2: Initialize Qdrant client
+        print("Initializing Qdrant client...")
+        client = connect(args.qdrant_location, host="localhost", port=6333)  # Default Qdrant settings
+
+        # Test the connection
+        try:
+            client.get_collections()
+            print("Connected to Qdrant successfully")
+        except Exception as e:
+            print(f"Could not connect to Qdrant: {str(e)}")
+            if not args.qdrant_location:
+                print("Make sure Qdrant is running locally on port 6333")
+            return
 
-    # Step 3: Generate embeddings using Gemini
-    embeddings = generate_embeddings(texts_to_embed, gemini_api_key)
-    if not embeddings:
-        print("No embeddings generated.")
+        # Step 3: Diff the documents against the manifest of the existing index
+        alias = args.collection
+        qdrant = QdrantSink(client, alias, vector_size, profile=args.profile)
+        checkpoint = Checkpoint(checkpoint_path, settings)
+        state = checkpoint.load()
+        if state is not None and not client.collection_exists(state['collection']):
+            state = None
+
+        if args.resume and state is not None:
+            # Documents recorded in the checkpointed manifest are already stored
+            print(f"Resuming into '{state['collection']}' from the last checkpoint")
+            manifest = IndexManifest(manifest_path, settings)
+            manifest.files = state['files']
+            qdrant.begin(state['rebuild'], state['collection'])
+            stale_ids.extend(state['stale_ids'])
+        else:
+            if args.resume:
+                print("No checkpoint to resume from, starting a new run")
+            elif state is not None and state['rebuild'] and state['collection'] != resolve_alias(client, alias):
+                # A rebuild that crashed and is not resumed must not become a rollback target
+                client.delete_collection(state['collection'])
+
+            manifest = IndexManifest(manifest_path, settings)
+            if not args.full:
+                manifest = IndexManifest.load(manifest_path, settings)
+
+            live = resolve_alias(client, alias)
+            rebuild = not manifest.files or live is None
+            if args.reduce == 'pca' and not rebuild and not os.path.exists(projection_path(live)):
+                print(f"No PCA projection saved for '{live}'")
+                rebuild = True
+            if rebuild:
+                # Nothing reliable to update incrementally; build a new version next to the live one
+                print("Rebuilding the whole index into a new collection version")
+                manifest = IndexManifest(manifest_path, settings)
+            qdrant.begin(rebuild)
+
+        diff = manifest.diff(documents)
+        print(f"{len(diff.added)} new, {len(diff.changed)} changed, {len(diff.unchanged)} unchanged "
+              f"and {len(diff.removed)} removed files")
+
+        for file_path in diff.removed:
+            stale_ids.extend(manifest.remove_file(file_path))
+
+        changed_docs = diff.added + diff.changed
+        sinks.append(qdrant)
+        projection_file = projection_path(qdrant.collection_name if qdrant.rebuild
+                                          else resolve_alias(client, alias) or alias)
+
+    # Step 4: Reduce the vectors; a collection keeps the PCA projection it was built with
+    if args.reduce == 'pca':
+        if projection_file and os.path.exists(projection_file):
+            projection = PCAProjection.load(projection_file)
+        else:
+            projection = fit_projection(documents, full_embedder, args.dimension, settings)
+            if projection_file:
+                projection.save(projection_file)
+        embedder = ReducedEmbedder(full_embedder, projection.apply)
+    elif args.reduce == 'matryoshka':
+        report_truncation(documents, full_embedder, args.dimension, settings)
+
+    if 'faiss' in sink_names:
+        sinks.append(FaissSink(args.faiss_path, embedder, index_type=args.faiss_index))
+    if 'snapshot' in sink_names:
+        sinks.append(SnapshotSink(args.snapshot_path, {'embedding_backend': args.embedding_backend,
+                                                        'embedding_model': args.embedding_model,
+                                                        'settings': settings}))
+    if args.reduce == 'pca':
+        for sink in sinks:
+            if sink is not qdrant:
+                # The snapshot is rebuilt every run, so its projection is always the current one
+                sink.projection = projection
+
+    def save_checkpoint(replaced_ids: List[str], force: bool = False):
+        if force or checkpoint.due():
+            checkpoint.save({'collection': qdrant.collection_name, 'rebuild': qdrant.rebuild,
+                             'files': manifest.files, 'stale_ids': stale_ids + replaced_ids})
+
+    # Step 5: Chunk, embed and write the documents; the Qdrant sink only gets the
+    # new and changed ones, while the file sinks are rebuilt from all of them
+    to_index = documents if any(not sink.incremental for sink in sinks) else changed_docs
+    probe = None
+    if to_index:
+        if qdrant and changed_docs:
+            save_checkpoint([], force=True)
+        replaced_ids, probe = index_documents(to_index, sinks, embedder, settings, manifest,
+                                              {doc['file_path'] for doc in changed_docs},
+                                              on_document=save_checkpoint if qdrant else None)
+        stale_ids.extend(replaced_ids)
+        report_embeddings(full_embedder if args.reduce == 'pca' else embedder, engine)
+
+    for sink in sinks:
+        if sink is not qdrant:
+            sink.finish()
+
+    if qdrant is None:
+        print(f"\nIndex complete! {len(documents)} documents indexed.")
         return
 
-    # Step 4: Initialize Qdrant client
-    print("Initializing Qdrant client...")
-    client = QdrantClient(host="localhost", port=6333)  # Default Qdrant settings
+    # Step 6: Delete points of chunks that no longer exist, after their replacements are in place
+    qdrant.delete(stale_ids)
 
-    # Test the connection
-    try:
-        client.get_collections()
-        print("Connected to Qdrant successfully")
-    except Exception as e:
-        print(f"Could not connect to Qdrant: {str(e)}")
-        print("Make sure Qdrant is running locally on port 6333")
+    # Step 7: Check a rebuilt collection and make it live
+    qdrant.expected_points = manifest.point_count()
+    qdrant.probe = probe
+    finished = qdrant.finish()
+    prune_projections(client)
+    if not finished:
+        checkpoint.clear()
         return
 
-    # Step 5: Create Qdrant collection
-    collection_name = "embodied_intelligence_rag"
-    setup_qdrant_collection(client, collection_name)
-
-    # Step 6: Upload documents and embeddings to Qdrant
-    upload_to_qdrant(client, collection_name, chunked_docs, embeddings)
+    manifest.save()
+    checkpoint.clear()
 
-    print("\nIndex complete!")
+    if not changed_docs and not stale_ids:
+        print("\nIndex is already up to date.")
+    else:
+        print(f"\nIndex complete! {manifest.point_count()} documents indexed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()